@@ -3,14 +3,16 @@ import datetime as datetime
 import numpy as np
 import os
 import utils
+import assets
+import league_store
+import forecast
+import optimiser
 from league_data import (
     LeagueData,
     hex_plotly_colour_list,
     combined_plotly_colour_list,
 )
 
-root_dir_path = os.path.dirname(os.path.realpath(__file__))
-
 
 ###################
 ### Page Config ###
@@ -24,34 +26,20 @@ st.set_page_config(
     initial_sidebar_state="auto",
 )
 
-sidebar_img = utils.get_img_as_base64(
-    root_dir_path + "/data/app/wp11906650-fantasy-premier-league-wallpapers.jpg"
-)
-
-background_img = utils.get_img_as_base64(
-    root_dir_path + "/data/app/wp2598920-white-wallpaper.jpg"
-)
-
 
 #################
 ### Constants ###
 #################
 
 
-standings_url_template = (
-    "https://fantasy.premierleague.com/api/leagues-classic/{leagueID}/standings/"
-)
-history_url_template = (
-    "https://fantasy.premierleague.com/api/entry/{manager_id}/history/"
-)
-picks_url_template = (
-    "https://fantasy.premierleague.com/api/entry/{manager_id}/event/{gw}/picks/"
-)
-transfers_url_template = (
-    "https://fantasy.premierleague.com/api/entry/{manager_id}/transfers/"
-)
-bootstrap_static_url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-live_url_template = "https://fantasy.premierleague.com/api/event/{gw}/live/"
+### Point at a stand-in server (benchmarks/standin_server.py) to run offline
+fpl_api_url = os.environ.get("FPL_API_URL", "https://fantasy.premierleague.com/api")
+standings_url_template = fpl_api_url + "/leagues-classic/{leagueID}/standings/"
+history_url_template = fpl_api_url + "/entry/{manager_id}/history/"
+picks_url_template = fpl_api_url + "/entry/{manager_id}/event/{gw}/picks/"
+transfers_url_template = fpl_api_url + "/entry/{manager_id}/transfers/"
+bootstrap_static_url = fpl_api_url + "/bootstrap-static/"
+live_url_template = fpl_api_url + "/event/{gw}/live/"
 
 
 #################
@@ -60,17 +48,35 @@ live_url_template = "https://fantasy.premierleague.com/api/event/{gw}/live/"
 
 
 def inject_custom_css():
-    with open(root_dir_path + "/data/app/CSS/styles.txt") as f:
-        css_sheet = str(f.read()).format(
-            sidebar_img=sidebar_img, background_img=background_img
-        )
-        st.markdown(
-            """<style>{}</style>""".format(css_sheet),
-            unsafe_allow_html=True,
-        )
+    ### Wallpapers are encoded into the CSS once per process, see assets.py
+    st.markdown(assets.get_custom_css(), unsafe_allow_html=True)
     return None
 
 
+def get_league_data(leagueID):
+    ### One build per league and data version, shared by every session
+    def build_league_data():
+        return LeagueData(  # league data object
+            leagueID=leagueID,
+            standings_url_template=standings_url_template,
+            history_url_template=history_url_template,
+            picks_url_template=picks_url_template,
+            transfers_url_template=transfers_url_template,
+            bootstrap_static_url=bootstrap_static_url,
+            live_url_template=live_url_template,
+            incremental=True,
+        )
+
+    store = league_store.get_default_store()
+    data_version = league_store.get_data_version(bootstrap_static_url)
+    if store.is_building(leagueID, data_version):
+        with st.spinner(text="Another user is loading this league, hang tight..."):
+            ldo = store.get(leagueID, data_version, build_league_data)
+    else:
+        ldo = store.get(leagueID, data_version, build_league_data)
+    return ldo.view()
+
+
 ##################
 ### App proper ###
 ##################
@@ -106,15 +112,7 @@ def main():
 
     if render_elements:
 
-        ldo = LeagueData(  # league data object
-            leagueID=leagueID,  # type: ignore
-            standings_url_template=standings_url_template,
-            history_url_template=history_url_template,
-            picks_url_template=picks_url_template,
-            transfers_url_template=transfers_url_template,
-            bootstrap_static_url=bootstrap_static_url,
-            live_url_template=live_url_template,
-        )
+        ldo = get_league_data(int(leagueID))  # type: ignore
 
         ### "What if" logic
         what_if_col, gw_select_col, buffer_cols = st.columns([5, 3, 12])
@@ -135,6 +133,12 @@ def main():
                     max_value=ldo.max_gw - 1,
                 )
             ldo.add_what_if_managers(what_if_gw)
+            with st.expander("Best and worst gameweeks to have stopped transferring"):
+                st.dataframe(
+                    ldo.get_what_if_summary_df(),
+                    use_container_width=True,
+                    hide_index=True,
+                )
 
         ### Side bar
         with st.sidebar:
@@ -144,12 +148,14 @@ def main():
                 "tab3": "Team Similarity",
                 "tab4": "Team Comparison",
                 "tab5": "Transfers",
+                "tab6": "Squad Optimiser",
             }
             st.header("Info...")
             with st.expander(tab_headers["tab1"]):
                 st.write(
                     "A convenient summary table of league standings for the current season. "
-                    "Not too dissimilar to the summary table on the official app/website."
+                    "Not too dissimilar to the summary table on the official app/website. "
+                    "Switch on the simulation to see each manager's chances of finishing in each position."
                 )
             with st.expander(tab_headers["tab2"]):
                 st.write(
@@ -172,28 +178,53 @@ def main():
                     "Then this graph is for you! Zoom in to see multiple tranfers in a single transaction. "
                     "NOTE: Can only see transfers *after* the gameweek deadline. "
                 )
+            with st.expander(tab_headers["tab6"]):
+                st.write(
+                    "The 15-man squad with the most expected points over the coming gameweeks. "
+                    "Pick a horizon and budget; the squad respects positions, three players per club "
+                    "and a valid starting formation. Captain (c) and bench (b) are marked. "
+                    "The transfer planner finds the best transfers for a manager over the same horizon, "
+                    "rolling over free transfers and taking -4 hits where they pay off."
+                )
 
         ### Tabs
-        tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
             [tab_headers[k] for k, v in tab_headers.items()]
         )
 
         with tab1:
             st.header(f"{ldo.league_name}")
-            ldo.standings_df = ldo.standings_df.merge(
-                ldo.season_stats_df.loc[
-                    ldo.season_stats_df["GW"] == ldo.max_gw, ["Manager", "Form"]
-                ],
-                how="inner",
-                on="Manager",
-            )
+            standings_df = ldo.get_standings_view()
             st.dataframe(
-                ldo.standings_df[
+                standings_df[
                     ["Rank", "Manager", "Team Name", "GW Total", "Total Points", "Form"]
                 ].style.format({"Form": "{:.2f}"}, thousands=","),
                 use_container_width=True,
                 hide_index=True,
             )
+            n_remaining_gws = ldo.player_gw_store.n_gws - ldo.max_gw
+            if n_remaining_gws > 0 and st.toggle(
+                "Simulate final standings",
+                value=False,
+                help="Play out the rest of the season thousands of times, "
+                "each manager keeping their current team.",
+            ):
+                simulation_result = ldo.simulate_league()
+                position_df = simulation_result.position_df
+                st.dataframe(
+                    position_df.style.format(
+                        {"Expected Total Points": "{:.0f}"}
+                        | {col: "{:.1%}" for col in position_df.columns[3:]},
+                        thousands=",",
+                    ),
+                    use_container_width=True,
+                    hide_index=True,
+                )
+                st.caption(
+                    f"{simulation_result.stats['n_sims']:,} simulations in "
+                    f"{simulation_result.stats['seconds']:.2f} s "
+                    f"({simulation_result.stats['sims_per_second']:,.0f} per second)"
+                )
         with tab2:
             st.header(f"{ldo.league_name}")
             with st.container(border=True):
@@ -221,11 +252,10 @@ def main():
                 gw_range = st.slider(
                     "Select Gameweek Range", 1, ldo.max_gw, (1, ldo.max_gw)
                 )
+                ### Rank axes come reversed
                 fig = ldo.make_season_stats_chart(
                     gw_range=gw_range, y_axis_option=y_axis_option
                 )
-                if y_axis_option in ["Rank", "Overall Rank"]:
-                    fig.update_yaxes(autorange="reversed")
                 st.plotly_chart(fig, theme="streamlit", use_container_width=True)
         with tab3:
             st.header(f"{ldo.league_name}")
@@ -249,7 +279,6 @@ def main():
                         ldo.max_gw,
                         key="single_gw",
                     )
-                    gw_select_indx = list(range((gw_range - 1) * 15, gw_range * 15))
                 elif gw_type == "Multiple Gameweeks":
                     gw_range = st.slider(
                         "Select Gameweek Range",
@@ -258,24 +287,14 @@ def main():
                         (1, ldo.max_gw),
                         key="multi_gw",
                     )
-                    gw_select_indx = list(
-                        range((gw_range[0] - 1) * 15, gw_range[1] * 15)
-                    )
-                else:
-                    gw_select_indx = []
 
-                league_picks_df = ldo.league_teams_df.assign(
-                    idx=ldo.league_teams_df.groupby("Manager").cumcount()
-                ).pivot(index="idx", columns="Manager", values="player_pick_full")
-
-                sim_df = utils.jaccard_sim(league_picks_df.iloc[gw_select_indx])
-                fig = ldo.make_similarity_heatmap(sim_df=sim_df)
+                fig = ldo.make_similarity_heatmap(gw_range=gw_range)
                 st.plotly_chart(fig, theme="streamlit", use_container_width=True)
         with tab4:
             st.header(f"{ldo.league_name}")
             with st.container(border=True):
                 if gw_type == "Single Gameweek":
-                    managers = np.sort(ldo.league_teams_df["Manager"].unique())
+                    managers = np.array(ldo.get_managers())
                     if any("what if" in manager for manager in managers):
                         colour_list = list(np.repeat(hex_plotly_colour_list, 2))
                         alpha_list = [1.0, 0.33] * int((len(managers) / 2))
@@ -294,32 +313,11 @@ def main():
                         manager1 = st.selectbox("Select Manager 1", managers)
                     with col2:
                         manager2 = st.selectbox("Select Manager 2", managers)
-                    manager1_set = set(
-                        ldo.league_teams_df.loc[
-                            (ldo.league_teams_df["Manager"] == str(manager1))
-                            & (ldo.league_teams_df["gw"] == int(gw_range)),
-                            "player_pick",
-                        ]
-                    )
-                    manager2_set = set(
-                        ldo.league_teams_df.loc[
-                            (ldo.league_teams_df["Manager"] == str(manager2))
-                            & (ldo.league_teams_df["gw"] == int(gw_range)),
-                            "player_pick",
-                        ]
+                    manager1_players, intersection_players, manager2_players = (
+                        ldo.get_venn_word_lists(
+                            str(manager1), str(manager2), int(gw_range)
+                        )
                     )
-                    manager1_players = [
-                        s.replace(" (p)", "")
-                        for s in manager1_set.difference(manager2_set)
-                    ]
-                    intersection_players = [
-                        s.replace(" (p)", "")
-                        for s in manager1_set.intersection(manager2_set)
-                    ]
-                    manager2_players = [
-                        s.replace(" (p)", "")
-                        for s in manager2_set.difference(manager1_set)
-                    ]
                     words = manager1_players + intersection_players + manager2_players
                     colour1_idx = np.where(managers == manager1)[0][0] % len(
                         colour_list
@@ -327,7 +325,8 @@ def main():
                     colour2_idx = np.where(managers == manager2)[0][0] % len(
                         colour_list
                     )
-                    venn = utils.word_list_venn_diagram(
+                    ### Drawn once per pair of pick sets, then reused
+                    venn_png = utils.get_word_list_venn_png(
                         words=words,
                         fontsizes=[10] * len(words),
                         polarities=[-1] * len(manager1_players)
@@ -339,13 +338,79 @@ def main():
                         alpha2=alpha_list[colour2_idx],
                         scale=1.5,
                     )
-                    venn_fig = venn.fig
-                    st.pyplot(venn_fig)
+                    st.image(venn_png, use_column_width=True)
         with tab5:
             st.header(f"{ldo.league_name}")
             with st.container(border=True):
                 fig = ldo.make_transfers_fig()
                 st.plotly_chart(fig, theme="streamlit", use_container_width=True)
+        with tab6:
+            st.header(f"{ldo.league_name}")
+            n_remaining_gws = ldo.player_gw_store.n_gws - ldo.max_gw
+            if n_remaining_gws < 1:
+                st.info("No gameweeks left to optimise for this season.")
+            else:
+                horizon_col, budget_col, buffer_cols = st.columns([5, 3, 12])
+                with horizon_col:
+                    horizon = st.number_input(
+                        "Gameweek horizon",
+                        value=min(forecast.DEFAULT_HORIZON, n_remaining_gws),
+                        step=1,
+                        min_value=1,
+                        max_value=n_remaining_gws,
+                    )
+                with budget_col:
+                    budget = st.number_input(
+                        "Budget (£m)",
+                        value=optimiser.BUDGET / 10,
+                        step=0.5,
+                        min_value=80.0,
+                        max_value=120.0,
+                    )
+                if st.toggle(
+                    "Optimise squad",
+                    value=False,
+                    help="Pick the 15 players with the most expected points "
+                    "over the horizon within the budget.",
+                ):
+                    squad_solution = ldo.optimise_squad(horizon, round(budget * 10))
+                    st.dataframe(
+                        squad_solution.squad_df.style.format(
+                            {"price": "{:.1f}", "Expected Points": "{:.1f}"}
+                        ),
+                        use_container_width=True,
+                    )
+                    st.caption(
+                        f"Expected points: {squad_solution.expected_points:.1f}, "
+                        f"cost: £{squad_solution.cost / 10:.1f}m, "
+                        f"solved in {squad_solution.solve_time:.2f} s"
+                    )
+                st.subheader("Transfer planner")
+                manager = st.selectbox(
+                    "Select Manager", ldo.season_stats_df["Manager"].unique()
+                )
+                if st.toggle(
+                    "Plan transfers",
+                    value=False,
+                    help="Search transfers for the manager over the horizon, "
+                    "banking free transfers or taking hits where they pay off.",
+                ):
+                    transfer_plan = ldo.plan_transfers(manager, horizon)
+                    st.dataframe(
+                        transfer_plan.plan_df.style.format(
+                            {"Expected Points": "{:.1f}", "Bank": "{:.1f}"}
+                        ),
+                        use_container_width=True,
+                        hide_index=True,
+                    )
+                    st.caption(
+                        f"Expected points: {transfer_plan.expected_points:.1f} "
+                        f"(without transfers: "
+                        f"{transfer_plan.hold_expected_points:.1f}), "
+                        f"{transfer_plan.stats['squads_evaluated']:,} squads "
+                        f"evaluated in {transfer_plan.stats['seconds']:.2f} s "
+                        f"({transfer_plan.stats['squads_per_second']:,.0f} per second)"
+                    )
 
 
 if __name__ == "__main__":
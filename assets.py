@@ -0,0 +1,51 @@
+import os
+import threading
+import utils
+
+
+#################
+### Constants ###
+#################
+
+
+root_dir_path = os.path.dirname(os.path.realpath(__file__))
+css_path = root_dir_path + "/data/app/CSS/styles.txt"
+### styles.txt placeholder: image embedded in its place
+css_image_path_dict = {
+    "sidebar_img": root_dir_path
+    + "/data/app/wp11906650-fantasy-premier-league-wallpapers.jpg",
+    "background_img": root_dir_path + "/data/app/wp2598920-white-wallpaper.jpg",
+}
+
+
+#################
+### Functions ###
+#################
+
+
+_custom_css = None
+_custom_css_lock = threading.Lock()
+
+
+def get_custom_css() -> str:
+    """
+    The app's <style> block: styles.txt with its wallpapers embedded as
+    base64. Read, encoded and formatted once per process, every rerun of
+    every session reuses the string.
+    """
+    global _custom_css
+    with _custom_css_lock:
+        if _custom_css is None:
+            _custom_css = build_custom_css()
+    return _custom_css
+
+
+def build_custom_css() -> str:
+    with open(css_path) as f:
+        css_sheet = f.read().format(
+            **{
+                name: utils.get_img_as_base64(image_path)
+                for name, image_path in css_image_path_dict.items()
+            }
+        )
+    return "<style>{}</style>".format(css_sheet)
@@ -0,0 +1,124 @@
+import numpy as np
+
+
+#################
+### Constants ###
+#################
+
+
+GKP, DEF, MID, FWD = 1, 2, 3, 4
+MIN_DEF = 3
+MIN_FWD = 1
+XI_SIZE = 11
+BENCH_GKP_SLOT = 11  # pick position 12
+bench_outfield_slot_list = [12, 13, 14]  # pick positions 13-15, in bench order
+
+
+#################
+### Functions ###
+#################
+
+
+def get_autosub_multipliers(
+    element_type, multiplier, is_vice_captain, played
+) -> np.ndarray:
+    """
+    Multipliers after FPL's automatic substitutions, for any number of
+    teams at once. Every argument broadcasts to (..., 15), the last axis
+    being the picks in pick position order (1-11 starting, 12-15 bench).
+
+    A starting goalkeeper who did not play is replaced by the bench
+    goalkeeper, if the bench goalkeeper played. Then each bench outfield
+    player who played, in bench order, replaces the first starting outfield
+    player who did not, as long as the XI keeps MIN_DEF defenders and
+    MIN_FWD forwards. Substitutes score once. If the captain did not play,
+    the vice-captain takes the captain's multiplier. A bench boost (any
+    bench multiplier above 0) makes no substitutions.
+    """
+    ### One row per team
+    arrays = np.broadcast_arrays(element_type, multiplier, is_vice_captain, played)
+    shape = arrays[0].shape
+    element_type, multiplier, is_vice_captain, played = (
+        array.reshape(-1, shape[-1]) for array in arrays
+    )
+    element_type = element_type.astype(np.int8)
+    played = played.astype(np.bool_)
+    in_xi = np.zeros(multiplier.shape, dtype=np.bool_)
+    in_xi[:, :XI_SIZE] = True
+    bench_boost = (multiplier[:, XI_SIZE:] > 0).any(axis=1)
+
+    ### Only teams with a starter who did not play and no bench boost have subs
+    sub_rows = np.nonzero(~bench_boost & ~played[:, :XI_SIZE].all(axis=1))[0]
+    in_xi[sub_rows] = _get_autosub_xi(element_type[sub_rows], played[sub_rows])
+
+    ### Substitutes score once, everyone else as picked
+    autosub_multiplier = np.where(
+        in_xi,
+        np.maximum(multiplier, 1),
+        np.where(bench_boost[:, None], multiplier, 0),
+    ).astype(multiplier.dtype)
+
+    ### Vice-captain promotion
+    rows = np.arange(len(multiplier))
+    captain_slot = multiplier[:, :XI_SIZE].argmax(axis=1)
+    captain_multiplier = multiplier[rows, captain_slot]
+    vice_captain_plays = is_vice_captain & played & in_xi
+    promote = (
+        (captain_multiplier > 1)
+        & ~played[rows, captain_slot]
+        & vice_captain_plays.any(axis=1)
+    )
+    autosub_multiplier = np.where(
+        promote[:, None] & vice_captain_plays,
+        captain_multiplier[:, None],
+        autosub_multiplier,
+    )
+    return autosub_multiplier.reshape(shape)
+
+
+def _get_autosub_xi(element_type, played) -> np.ndarray:
+    """
+    (team, 15) mask of the picks in each team's XI after substitutions.
+    """
+    rows = np.arange(len(played))
+    in_xi = np.zeros(played.shape, dtype=np.bool_)
+    in_xi[:, :XI_SIZE] = True
+
+    ### Goalkeeper
+    gkp_sub = (
+        ~played[:, 0]
+        & played[:, BENCH_GKP_SLOT]
+        & (element_type[:, BENCH_GKP_SLOT] == GKP)
+    )
+    in_xi[:, 0] = ~gkp_sub
+    in_xi[:, BENCH_GKP_SLOT] = gkp_sub
+
+    ### Outfield, one bench slot at a time across every team
+    starter_type = element_type[:, 1:XI_SIZE]
+    starter_is_def = starter_type == DEF
+    starter_is_fwd = starter_type == FWD
+    n_def = starter_is_def.sum(axis=1)
+    n_fwd = starter_is_fwd.sum(axis=1)
+    for slot in bench_outfield_slot_list:
+        sub_is_def = element_type[:, slot] == DEF
+        sub_is_fwd = element_type[:, slot] == FWD
+        replaceable = (
+            in_xi[:, 1:XI_SIZE]
+            & ~played[:, 1:XI_SIZE]
+            ### Taking out a defender or forward must leave enough of them
+            & (~starter_is_def | (n_def + sub_is_def > MIN_DEF)[:, None])
+            & (~starter_is_fwd | (n_fwd + sub_is_fwd > MIN_FWD)[:, None])
+        )
+        has_sub = (
+            played[:, slot] & (element_type[:, slot] != GKP) & replaceable.any(axis=1)
+        )
+        ### First replaceable starter
+        out_idx = replaceable.argmax(axis=1)
+        sub_rows = rows[has_sub]
+        in_xi[sub_rows, out_idx[has_sub] + 1] = False
+        in_xi[sub_rows, slot] = True
+        n_def += has_sub & sub_is_def
+        n_def -= has_sub & starter_is_def[rows, out_idx]
+        n_fwd += has_sub & sub_is_fwd
+        n_fwd -= has_sub & starter_is_fwd[rows, out_idx]
+    return in_xi
@@ -0,0 +1,132 @@
+"""
+Compare the batched picks builder with the previous per-gameweek DataFrame path
+of string picks.
+
+    python -m benchmarks.bench_picks_builder --managers 1000 --gws 38
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import picks_builder
+from benchmarks import synthetic
+
+
+#################
+### Functions ###
+#################
+
+
+def build_per_gameweek(selections, player_id_name_dict) -> pd.DataFrame:
+    ### Previous implementation of LeagueData._get_teams_dfs, kept as the reference
+    league_teams_df_list = []
+    for manager_name, gw, picks in selections:
+        picks_df = pd.DataFrame(picks)
+        picks_df["player_name"] = picks_df["element"].map(player_id_name_dict)
+        picks_df["Manager"] = manager_name
+        picks_df["gw"] = gw
+        picks_df["status"] = np.where(
+            (picks_df["is_captain"] == True) & (picks_df["multiplier"] == 2),
+            "c",
+            np.where(
+                (picks_df["is_captain"] == True) & (picks_df["multiplier"] == 3),
+                "tc",
+                np.where(
+                    picks_df["is_vice_captain"] == True,
+                    "v",
+                    np.where(
+                        (picks_df["multiplier"] == 0)
+                        | (picks_df["position"].isin([12, 13, 14, 15])),
+                        "b",
+                        "p",
+                    ),
+                ),
+            ),
+        )
+        picks_df["player_pick"] = list(
+            (
+                picks_df["player_name"] + " (" + picks_df["status"].astype(str) + ")"
+            ).values
+        )
+        picks_df["player_pick_full"] = list(
+            (picks_df["player_pick"] + picks_df["gw"].astype(str)).values
+        )
+        league_teams_df_list.append(picks_df)
+    return pd.concat(league_teams_df_list).reset_index(drop=True)
+
+
+def build_batched(selections, player_id_name_dict) -> pd.DataFrame:
+    builder = picks_builder.PicksBatchBuilder(n_teams=len(selections))
+    for manager_name, gw, picks in selections:
+        builder.add(manager_name, gw, picks)
+    return builder.build()
+
+
+def make_selections(n_managers, n_gws, seed=0) -> list:
+    rng = np.random.default_rng(seed)
+    element_types = synthetic.make_element_types(seed=seed)
+    chips = [None] * 30 + ["3xc", "bboost"]
+    return [
+        (
+            "Manager {0}".format(i),
+            gw,
+            synthetic.make_picks_json(rng, element_types, chip=rng.choice(chips))[
+                "picks"
+            ],
+        )
+        for i in range(n_managers)
+        for gw in range(1, n_gws + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--managers", type=int, default=1000)
+    parser.add_argument("--gws", type=int, default=38)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    selections = make_selections(args.managers, args.gws)
+    player_id_name_dict = {
+        i: "Player {0}".format(i) for i in range(1, synthetic.N_PLAYERS + 1)
+    }
+    print(
+        "{0} managers x {1} GWs = {2:,} selections".format(
+            args.managers, args.gws, len(selections)
+        )
+    )
+
+    results = {}
+    for name, build_fn in [
+        ("per-gameweek", build_per_gameweek),
+        ("batched", build_batched),
+    ]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            league_teams_df = build_fn(selections, player_id_name_dict)
+            timings.append(time.perf_counter() - start)
+        results[name] = league_teams_df
+        print(
+            "{0:>13}: best {1:.3f} s, {2:.1f} MB".format(
+                name,
+                min(timings),
+                league_teams_df.memory_usage(deep=True).sum() / 1024**2,
+            )
+        )
+
+    ### The batched frame keeps integer pick codes in place of the strings
+    reference_df, batched_df = results["per-gameweek"], results["batched"]
+    common_columns = picks_builder.PICK_COLUMNS + ["Manager", "gw"]
+    pd.testing.assert_frame_equal(
+        reference_df[common_columns], batched_df[common_columns]
+    )
+    assert reference_df["player_pick"].tolist() == picks_builder.get_pick_labels(
+        batched_df["pick"], player_id_name_dict
+    )
+    print("outputs identical")
+
+
+if __name__ == "__main__":
+    main()
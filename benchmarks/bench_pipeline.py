@@ -0,0 +1,302 @@
+"""
+Time each stage of the LeagueData build pipeline against synthetic leagues.
+
+    python -m benchmarks.bench_pipeline --managers 10 100 --gws 10 25
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/pipeline_<old>.json
+
+Every (managers, gw) case runs against an in-process stand-in server with a
+cold response cache. Wall time comes from a plain run and peak memory
+from a second, tracemalloc-instrumented run. Request counts are
+the server-side requests received during the stage. Results are written to
+a JSON file named after the current commit so runs can be compared.
+"""
+
+import os
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import functools
+import subprocess
+import contextlib
+import tracemalloc
+import collections
+import utils
+import bootstrap
+import http_client
+import league_data
+import league_snapshot
+import picks_builder
+import similarity
+import response_cache
+from benchmarks import synthetic, standin_server
+
+
+#################
+### Constants ###
+#################
+
+
+root_dir_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+DEFAULT_RESULTS_DIR = os.path.join(root_dir_path, "benchmarks", "results")
+DEFAULT_MANAGERS = [10, 100, 1000]
+DEFAULT_GWS = [10, 25, 38]
+
+### (class, method name, stage) instrumented during the LeagueData build
+instrumented_method_list = [
+    (league_data.LeagueData, "_get_league_name_and_standings", "standings"),
+    (league_data.LeagueData, "_get_season_stats_df", "season stats"),
+    (bootstrap.BootstrapRegistry, "refresh", "player lookup"),
+    (league_data.LeagueData, "_get_teams_dfs", "teams"),
+    (similarity.SimilarityTensor, "update", "similarity"),
+    (league_data.LeagueData, "_get_transfers_df", "transfers"),
+    (league_data.LeagueData, "_update_player_gw_store", "players"),
+    (league_data.LeagueData, "_get_players_df", "players"),
+    (league_data.LeagueData, "_save_snapshot", "snapshot"),
+]
+
+
+###############
+### Classes ###
+###############
+
+
+class StageRecorder(object):
+    def __init__(self, server, trace_memory=False):
+        """
+        Arguments:
+        ----------
+            server: standin_server.StandinServer
+                server whose request counts are attributed to stages
+            trace_memory: bool
+                record peak traced memory per stage (slows everything down)
+
+        Returns:
+        --------
+            None
+
+        """
+        self.server = server
+        self.trace_memory = trace_memory
+        self.wall_s = collections.defaultdict(float)
+        self.peak_mb = collections.defaultdict(float)
+        self.requests = collections.defaultdict(int)
+        self._active = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        ### Stages don't nest, inner calls count towards the outer stage
+        if self._active:
+            yield
+            return
+        self._active = True
+        n_requests_start = sum(self.server.request_counts.values())
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wall_s[name] += time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - memory_start
+                self.peak_mb[name] = max(self.peak_mb[name], peak / 1024**2)
+            self.requests[name] += (
+                sum(self.server.request_counts.values()) - n_requests_start
+            )
+            self._active = False
+
+    @contextlib.contextmanager
+    def instrument(self):
+        originals = []
+        for cls, method_name, stage_name in instrumented_method_list:
+            method = getattr(cls, method_name)
+            originals.append((cls, method_name, method))
+            setattr(cls, method_name, self._wrap(method, stage_name))
+        try:
+            yield self
+        finally:
+            for cls, method_name, method in originals:
+                setattr(cls, method_name, method)
+
+    def _wrap(self, method, stage_name):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.stage(stage_name):
+                return method(*args, **kwargs)
+
+        return wrapper
+
+
+#################
+### Functions ###
+#################
+
+
+def run_case(n_managers, gw, trace_memory, latency_ms=0.0, max_concurrency=None):
+    league = synthetic.SyntheticLeague(
+        leagueID=1, n_managers=n_managers, current_gw=gw, seed=n_managers * 100 + gw
+    )
+    with standin_server.StandinServer(
+        league=league, faults=standin_server.FaultConfig(latency_ms=latency_ms)
+    ) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        ### Cold caches, nothing may leak between cases
+        response_cache._default_cache = response_cache.ResponseCache(
+            cache_dir=os.path.join(tmp_dir, "responses")
+        )
+        http_client._default_client = http_client.HTTPClient()
+        bootstrap._registry_dict.clear()
+        league_snapshot.DEFAULT_SNAPSHOT_DIR = os.path.join(tmp_dir, "snapshots")
+
+        recorder = StageRecorder(server, trace_memory=trace_memory)
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            kwargs = dict(server.url_templates)
+            if max_concurrency is not None:
+                kwargs["max_concurrency"] = max_concurrency
+            with recorder.instrument():
+                ldo = league_data.LeagueData(leagueID=league.leagueID, **kwargs)
+
+            ### Interactive paths of the app
+            with recorder.stage("what if"):
+                ldo.view().add_what_if_managers(max(1, ldo.max_gw // 2))
+            with recorder.stage("tab3 pivot"):
+                league_picks_df = ldo.league_teams_df.assign(
+                    idx=ldo.league_teams_df.groupby("Manager").cumcount(),
+                    pick_gw=picks_builder.get_pick_gw_codes(
+                        ldo.league_teams_df["pick"], ldo.league_teams_df["gw"]
+                    ),
+                ).pivot(index="idx", columns="Manager", values="pick_gw")
+            with recorder.stage("jaccard_sim"):
+                utils.jaccard_sim(league_picks_df)
+            with recorder.stage("similarity slice"):
+                ldo.similarity_tensor.jaccard_sim((1, ldo.max_gw))
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+    return recorder
+
+
+def get_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=root_dir_path,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_results, new_results):
+    old_dict = {(r["managers"], r["gw"], r["stage"]): r for r in old_results["results"]}
+    print(
+        "\n{0:>8} {1:>4} {2:>16} {3:>10} {4:>10} {5:>8}".format(
+            "managers", "gw", "stage", "old s", "new s", "ratio"
+        )
+    )
+    for r in new_results["results"]:
+        old = old_dict.get((r["managers"], r["gw"], r["stage"]))
+        if old is None:
+            continue
+        print(
+            "{0:>8} {1:>4} {2:>16} {3:>10.3f} {4:>10.3f} {5:>7.2f}x".format(
+                r["managers"],
+                r["gw"],
+                r["stage"],
+                old["wall_s"],
+                r["wall_s"],
+                r["wall_s"] / old["wall_s"] if old["wall_s"] else float("nan"),
+            )
+        )
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--managers", type=int, nargs="+", default=DEFAULT_MANAGERS)
+    parser.add_argument("--gws", type=int, nargs="+", default=DEFAULT_GWS)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--no-memory", action="store_true", help="skip memory pass")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--compare", default=None, help="previous results JSON")
+    args = parser.parse_args()
+
+    commit = get_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_ms": args.latency_ms,
+        "results": [],
+    }
+    for n_managers in args.managers:
+        for gw in args.gws:
+            timed = run_case(
+                n_managers, gw, False, args.latency_ms, args.max_concurrency
+            )
+            traced = (
+                None
+                if args.no_memory
+                else run_case(
+                    n_managers, gw, True, args.latency_ms, args.max_concurrency
+                )
+            )
+            for stage in timed.wall_s:
+                results["results"].append(
+                    {
+                        "managers": n_managers,
+                        "gw": gw,
+                        "stage": stage,
+                        "wall_s": round(timed.wall_s[stage], 6),
+                        "peak_mb": (
+                            None if traced is None else round(traced.peak_mb[stage], 3)
+                        ),
+                        "requests": timed.requests[stage],
+                    }
+                )
+                print(
+                    "{0:>5} managers, GW {1:>2}, {2:>16}: {3:9.3f} s {4:>9} MB {5:>7} requests".format(
+                        n_managers,
+                        gw,
+                        stage,
+                        timed.wall_s[stage],
+                        (
+                            "-"
+                            if traced is None
+                            else "{0:.1f}".format(traced.peak_mb[stage])
+                        ),
+                        timed.requests[stage],
+                    ),
+                    flush=True,
+                )
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, "pipeline_{0}.json".format(commit)
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("\nResults written to {0}".format(output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    return None
+
+
+if __name__ == "__main__":
+    main()
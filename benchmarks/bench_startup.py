@@ -0,0 +1,124 @@
+"""
+Import-time profile of the app's modules and the cost of building its CSS.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --modules league_data utils --top 20
+
+Each repeat imports the modules in a fresh interpreter under
+python -X importtime, after the modules the Streamlit runtime loads anyway
+(--preload), so the times are what the app's own modules add to a cold start.
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import assets
+
+
+#################
+### Constants ###
+#################
+
+
+APP_MODULES = [
+    "utils",
+    "assets",
+    "league_store",
+    "forecast",
+    "optimiser",
+    "league_data",
+]
+PRELOAD_MODULES = ["streamlit", "pandas", "numpy"]
+root_dir_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+#################
+### Functions ###
+#################
+
+
+def get_import_times(modules, preload_modules=PRELOAD_MODULES) -> list:
+    """
+    (name, depth, self seconds, cumulative seconds) of every module modules
+    import in a fresh interpreter, in import order, modules preload_modules
+    import left out.
+    """
+    code = "; ".join(
+        "import {0}".format(module) for module in list(preload_modules) + modules
+    )
+    completed_process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=root_dir_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_time_list = []
+    for line in completed_process.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        import_time_list.append(
+            (
+                name.strip(),
+                (len(name) - len(name.lstrip()) - 1) // 2,
+                int(self_us) / 1e6,
+                int(cumulative_us) / 1e6,
+            )
+        )
+    ### Top level imports of preload_modules come first, drop them and their imports
+    n_preloaded = 0
+    for i, (name, depth, _, _) in enumerate(import_time_list):
+        if depth == 0 and name in preload_modules:
+            n_preloaded = i + 1
+    return import_time_list[n_preloaded:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+", default=APP_MODULES)
+    parser.add_argument("--preload", nargs="*", default=PRELOAD_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    ### Best of repeats, by total import time
+    import_time_list = min(
+        (get_import_times(args.modules, args.preload) for _ in range(args.repeat)),
+        key=lambda import_times: sum(
+            cumulative for _, depth, _, cumulative in import_times if depth == 0
+        ),
+    )
+    top_level_list = [entry for entry in import_time_list if entry[1] == 0]
+    print(
+        "import {0} after {1}: {2:.3f} s".format(
+            ", ".join(args.modules),
+            ", ".join(args.preload) or "nothing",
+            sum(cumulative for _, _, _, cumulative in top_level_list),
+        )
+    )
+    for name, _, _, cumulative in top_level_list:
+        print("{0:>40}: {1:.3f} s".format(name, cumulative))
+    print("slowest imports, cumulative:")
+    for name, depth, _, cumulative in sorted(
+        import_time_list, key=lambda entry: -entry[3]
+    )[: args.top]:
+        print("{0:>40}: {1:.3f} s".format("  " * depth + name, cumulative))
+
+    start = time.perf_counter()
+    assets.build_custom_css()
+    build_time = time.perf_counter() - start
+    assets.get_custom_css()
+    start = time.perf_counter()
+    assets.get_custom_css()
+    print(
+        "custom CSS: built in {0:.4f} s, memoised in {1:.6f} s".format(
+            build_time, time.perf_counter() - start
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Offline stand-in for the FPL API endpoints used by LeagueData.
+
+Serve a synthetic league:
+
+    python -m benchmarks.standin_server --managers 100 --gw 25 --latency-ms 40
+
+Replay recorded responses (recording any missing ones from the real API):
+
+    python -m benchmarks.standin_server --fixtures-dir fixtures/ \\
+        --upstream https://fantasy.premierleague.com
+
+Then point the app at it with FPL_API_URL=http://127.0.0.1:8765/api.
+"""
+
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import collections
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from benchmarks import synthetic
+
+
+#################
+### Constants ###
+#################
+
+
+route_list = [
+    ("standings", re.compile(r"^/api/leagues-classic/(?P<leagueID>\d+)/standings/$")),
+    ("history", re.compile(r"^/api/entry/(?P<manager_id>\d+)/history/$")),
+    ("picks", re.compile(r"^/api/entry/(?P<manager_id>\d+)/event/(?P<gw>\d+)/picks/$")),
+    ("transfers", re.compile(r"^/api/entry/(?P<manager_id>\d+)/transfers/$")),
+    ("bootstrap-static", re.compile(r"^/api/bootstrap-static/$")),
+    ("live", re.compile(r"^/api/event/(?P<gw>\d+)/live/$")),
+]
+
+
+###############
+### Classes ###
+###############
+
+
+class FaultConfig(object):
+    def __init__(
+        self,
+        latency_ms=0.0,
+        jitter_ms=0.0,
+        error_rate=0.0,
+        max_rps=None,
+        retry_after=1,
+        seed=0,
+    ):
+        """
+        Arguments:
+        ----------
+            latency_ms: float
+                fixed delay added to every response
+            jitter_ms: float
+                extra uniformly distributed delay in [0, jitter_ms]
+            error_rate: float
+                fraction of requests answered with 503
+            max_rps: float or None
+                requests per second above which clients get 429 + Retry-After
+            retry_after: int
+                Retry-After header value (seconds) sent with 429s
+            seed: int
+                seed for the latency jitter and error sampling
+
+        Returns:
+        --------
+            None
+
+        """
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.max_rps = max_rps
+        self.retry_after = int(retry_after)
+        self.rng = random.Random(seed)
+
+
+class StandinServer(object):
+    def __init__(
+        self,
+        league=None,
+        fixtures_dir=None,
+        upstream=None,
+        faults=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """
+        Arguments:
+        ----------
+            league: synthetic.SyntheticLeague or None
+                league to generate responses from
+            fixtures_dir: str or None
+                directory of recorded JSON responses, checked before the league
+            upstream: str or None
+                base URL to fetch (and record into fixtures_dir) responses
+                that are neither recorded nor synthetic
+            faults: FaultConfig or None
+                latency, error and throttling injection
+            host, port: str, int
+                address to bind, port 0 picks a free port
+
+        Returns:
+        --------
+            None
+
+        """
+        self.league = league
+        self.fixtures_dir = fixtures_dir
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.faults = faults or FaultConfig()
+        self.request_counts = collections.Counter()
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._bootstrap_body = None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    @property
+    def url_templates(self) -> dict:
+        """
+        LeagueData URL template kwargs pointing at this server.
+        """
+        return {
+            name: self.base_url + path
+            for name, path in synthetic.url_path_template_dict.items()
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        return None
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+        return None
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+        return None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                return None
+
+            def do_GET(self):
+                server._handle(self)
+                return None
+
+        return Handler
+
+    def _handle(self, handler):
+        path = handler.path.split("?")[0]
+        endpoint, params = _match_route(path)
+        with self._lock:
+            self.request_counts[endpoint or "unknown"] += 1
+
+        ### Fault injection
+        delay = self.faults.latency_ms + self.faults.rng.uniform(
+            0, self.faults.jitter_ms
+        )
+        if delay:
+            time.sleep(delay / 1000)
+        if self._is_throttled():
+            with self._lock:
+                self.request_counts["429"] += 1
+            return _send(
+                handler,
+                429,
+                b'{"detail": "Too many requests"}',
+                {"Retry-After": str(self.faults.retry_after)},
+            )
+        if self.faults.error_rate and self.faults.rng.random() < self.faults.error_rate:
+            with self._lock:
+                self.request_counts["503"] += 1
+            return _send(handler, 503, b'{"detail": "Service unavailable"}')
+
+        if endpoint is None:
+            return _send(handler, 404, b'{"detail": "Not found."}')
+        body = self._get_body(endpoint, params, path)
+        if body is None:
+            return _send(handler, 404, b'{"detail": "Not found."}')
+
+        ### bootstrap-static supports conditional requests, like the real API's CDN
+        if endpoint == "bootstrap-static":
+            etag = '"{0}"'.format(hashlib.md5(body).hexdigest())
+            if handler.headers.get("If-None-Match") == etag:
+                return _send(handler, 304, b"", {"ETag": etag})
+            return _send(handler, 200, body, {"ETag": etag})
+        return _send(handler, 200, body)
+
+    def _get_body(self, endpoint, params, path):
+        ### Recorded responses first
+        fixture_path = self._get_fixture_path(path)
+        if fixture_path is not None and os.path.exists(fixture_path):
+            with open(fixture_path, "rb") as f:
+                return f.read()
+
+        if self.league is not None:
+            response_json = self._get_synthetic_json(endpoint, params)
+            return None if response_json is None else json.dumps(response_json).encode()
+
+        if self.upstream is not None:
+            response = requests.get(self.upstream + path, timeout=30)
+            if response.status_code != 200:
+                return None
+            if fixture_path is not None:
+                os.makedirs(os.path.dirname(fixture_path), exist_ok=True)
+                with open(fixture_path, "wb") as f:
+                    f.write(response.content)
+            return response.content
+        return None
+
+    def _get_synthetic_json(self, endpoint, params):
+        ### The league generates lazily, one request at a time
+        with self._lock:
+            return self._generate_synthetic_json(endpoint, params)
+
+    def _generate_synthetic_json(self, endpoint, params):
+        league = self.league
+        if endpoint == "standings":
+            if int(params["leagueID"]) != league.leagueID:
+                return None
+            return league.standings_json()
+        if endpoint == "bootstrap-static":
+            ### ~1.5 MB at full size, generate it once
+            if self._bootstrap_body is None:
+                self._bootstrap_body = league.bootstrap_static_json()
+            return self._bootstrap_body
+        if endpoint == "live":
+            return league.live_json(int(params["gw"]))
+        if int(params["manager_id"]) not in league.manager_ids:
+            return None
+        if endpoint == "history":
+            return league.history_json(int(params["manager_id"]))
+        if endpoint == "picks":
+            return league.picks_json(int(params["manager_id"]), int(params["gw"]))
+        return league.transfers_json(int(params["manager_id"]))
+
+    def _get_fixture_path(self, path):
+        if self.fixtures_dir is None:
+            return None
+        return os.path.join(self.fixtures_dir, path.strip("/"), "index.json")
+
+    def _is_throttled(self) -> bool:
+        ### Fixed one-second window counter
+        if not self.faults.max_rps:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            return self._window_count > self.faults.max_rps
+
+
+#################
+### Functions ###
+#################
+
+
+def _match_route(path):
+    for endpoint, pattern in route_list:
+        match = pattern.match(path)
+        if match:
+            return endpoint, match.groupdict()
+    return None, {}
+
+
+def _send(handler, status, body, headers=None):
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    if body:
+        handler.wfile.write(body)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--league-id", type=int, default=1)
+    parser.add_argument("--managers", type=int, default=20)
+    parser.add_argument("--gw", type=int, default=30)
+    parser.add_argument("--gw-live", action="store_true", help="current GW unfinished")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixtures-dir", default=None)
+    parser.add_argument("--upstream", default=None)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=float, default=None)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    league = None
+    if args.upstream is None:
+        league = synthetic.SyntheticLeague(
+            leagueID=args.league_id,
+            n_managers=args.managers,
+            current_gw=args.gw,
+            current_gw_finished=not args.gw_live,
+            seed=args.seed,
+        )
+    server = StandinServer(
+        league=league,
+        fixtures_dir=args.fixtures_dir,
+        upstream=args.upstream,
+        faults=FaultConfig(
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            max_rps=args.max_rps,
+            retry_after=args.retry_after,
+            seed=args.seed,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    print("Serving the FPL API on {0}/api/".format(server.base_url))
+    for name, url in server.url_templates.items():
+        print("  {0}: {1}".format(name, url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+    return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+import numpy as np
+import autosub
+
+
+#################
+### Constants ###
+#################
+
+
+N_PLAYERS = 700
+SQUAD_POSITION_COUNTS = {1: 2, 2: 5, 3: 5, 4: 3}  # element_type: players per squad
+url_path_template_dict = {
+    "standings_url_template": "/api/leagues-classic/{leagueID}/standings/",
+    "history_url_template": "/api/entry/{manager_id}/history/",
+    "picks_url_template": "/api/entry/{manager_id}/event/{gw}/picks/",
+    "transfers_url_template": "/api/entry/{manager_id}/transfers/",
+    "bootstrap_static_url": "/api/bootstrap-static/",
+    "live_url_template": "/api/event/{gw}/live/",
+}
+
+
+#################
+### Functions ###
+#################
+
+
+def make_element_types(n_players=N_PLAYERS, seed=0) -> np.ndarray:
+    """
+    element_type (1-4) for player ids 1..n_players, index 0 unused.
+    """
+    rng = np.random.default_rng(seed)
+    return np.r_[0, rng.choice([1, 2, 3, 4], size=n_players, p=[0.1, 0.33, 0.4, 0.17])]
+
+
+def make_picks_json(rng, element_types, chip=None) -> dict:
+    """
+    Valid-looking picks payload: 2/5/5/3 squad, 3-4-3 starting XI with the
+    goalkeeper first, captain and vice-captain among the starters.
+    """
+    squad = {
+        element_type: rng.choice(
+            np.flatnonzero(element_types == element_type),
+            size=n,
+            replace=False,
+        )
+        for element_type, n in SQUAD_POSITION_COUNTS.items()
+    }
+    starters = (
+        list(squad[1][:1])
+        + list(squad[2][:3])
+        + list(squad[3][:4])
+        + list(squad[4][:3])
+    )
+    bench = list(squad[1][1:]) + list(squad[2][3:]) + list(squad[3][4:])
+    captain, vice_captain = rng.choice(np.arange(1, 11), size=2, replace=False)
+    picks = []
+    for i, element in enumerate(starters + bench):
+        is_captain = bool(i == captain)
+        picks.append(
+            {
+                "element": int(element),
+                "position": i + 1,
+                "multiplier": (
+                    (3 if chip == "3xc" else 2)
+                    if is_captain
+                    else (1 if i < 11 or chip == "bboost" else 0)
+                ),
+                "is_captain": is_captain,
+                "is_vice_captain": bool(i == vice_captain),
+            }
+        )
+    return {"active_chip": chip, "picks": picks}
+
+
+###############
+### Classes ###
+###############
+
+
+class SyntheticLeague(object):
+    def __init__(
+        self,
+        leagueID=1,
+        n_managers=20,
+        current_gw=30,
+        current_gw_finished=True,
+        n_players=N_PLAYERS,
+        n_teams=20,
+        seed=0,
+    ):
+        """
+        Arguments:
+        ----------
+            leagueID: int
+                league id served by the standings endpoint
+            n_managers: int
+                number of managers in the league
+            current_gw: int
+                latest gameweek to have started
+            current_gw_finished: bool
+                whether current_gw is finished (and its data checked)
+            n_players: int
+                number of players in bootstrap-static
+            n_teams: int
+                number of clubs
+            seed: int
+                everything served is a deterministic function of the arguments
+
+        Returns:
+        --------
+            None
+
+        Payloads mirror the shapes of the FPL API endpoints used by LeagueData.
+        Each manager's squad evolves with 0-2 same-position transfers per
+        gameweek, and history points are the squad's live points times the
+        pick multipliers, so every endpoint is consistent with the others.
+        """
+        self.leagueID = int(leagueID)
+        self.n_managers = int(n_managers)
+        self.current_gw = int(current_gw)
+        self.current_gw_finished = bool(current_gw_finished)
+        self.n_players = int(n_players)
+        self.n_teams = int(n_teams)
+        self.seed = int(seed)
+
+        rng = np.random.default_rng(self.seed)
+        self.element_types = make_element_types(self.n_players, seed=self.seed)
+        self.element_teams = np.r_[0, rng.integers(1, self.n_teams + 1, self.n_players)]
+        self.element_costs = np.r_[
+            0,
+            np.round(
+                np.clip(rng.gamma(4.0, 0.35, self.n_players) + 3.8, 4.0, 14.5) * 10
+            ).astype(int),
+        ]
+        ### Propensity to play and to score, fixed per player
+        self.element_availability = np.r_[0, rng.beta(2.0, 1.2, self.n_players)]
+        self.element_quality = np.r_[0, rng.gamma(2.0, 1.0, self.n_players)]
+        self.manager_ids = 1000 + np.arange(self.n_managers) * 7 + self.seed
+        self.deadline_times = [
+            np.datetime64("2023-08-11T17:30:00") + np.timedelta64(7 * (gw - 1), "D")
+            for gw in range(1, 39)
+        ]
+        self._live_points_array = None
+        self._manager_seasons = {}
+
+    def bootstrap_static_json(self) -> dict:
+        live_points_array = self._get_live_points_array()
+        played = max(1, self.current_gw)
+        events = []
+        for gw in range(1, 39):
+            finished = gw < self.current_gw or (
+                gw == self.current_gw and self.current_gw_finished
+            )
+            events.append(
+                {
+                    "id": gw,
+                    "name": "Gameweek {0}".format(gw),
+                    "deadline_time": str(self.deadline_times[gw - 1]) + "Z",
+                    "finished": finished,
+                    "data_checked": finished,
+                    "is_previous": gw == self.current_gw - 1,
+                    "is_current": gw == self.current_gw,
+                    "is_next": gw == self.current_gw + 1,
+                }
+            )
+        elements = []
+        for element in range(1, self.n_players + 1):
+            total_points = int(
+                live_points_array[element, 1 : self.current_gw + 1].sum()
+            )
+            recent_points = live_points_array[
+                element, max(1, self.current_gw - 3) : self.current_gw + 1
+            ]
+            elements.append(
+                {
+                    "id": element,
+                    "web_name": "Player{0}".format(element),
+                    "element_type": int(self.element_types[element]),
+                    "team": int(self.element_teams[element]),
+                    "now_cost": int(self.element_costs[element]),
+                    "status": "a",
+                    "chance_of_playing_next_round": None,
+                    "total_points": total_points,
+                    "points_per_game": "{0:.1f}".format(total_points / played),
+                    "form": "{0:.1f}".format(recent_points.mean()),
+                    "ep_next": "{0:.1f}".format(
+                        3.0 * self.element_quality[element] / 2.0
+                    ),
+                }
+            )
+        teams = [
+            {
+                "id": team,
+                "name": "Team {0}".format(team),
+                "short_name": "T{0:02d}".format(team),
+            }
+            for team in range(1, self.n_teams + 1)
+        ]
+        element_types = [
+            {"id": 1, "singular_name_short": "GKP"},
+            {"id": 2, "singular_name_short": "DEF"},
+            {"id": 3, "singular_name_short": "MID"},
+            {"id": 4, "singular_name_short": "FWD"},
+        ]
+        return {
+            "events": events,
+            "elements": elements,
+            "teams": teams,
+            "element_types": element_types,
+        }
+
+    def live_json(self, gw) -> dict:
+        rng = np.random.default_rng((self.seed, 1, gw))
+        minutes = self._get_minutes_array()[:, gw]
+        points = self._get_live_points_array()[:, gw]
+        played = minutes > 0
+        goals = np.where(played, rng.poisson(0.1 * self.element_quality), 0)
+        assists = np.where(played, rng.poisson(0.08 * self.element_quality), 0)
+        bps = np.where(played, rng.integers(0, 40, len(minutes)), 0)
+        xg = np.where(played, rng.gamma(1.0, 0.1 * self.element_quality), 0.0)
+        elements = []
+        for element in range(1, self.n_players + 1):
+            elements.append(
+                {
+                    "id": element,
+                    "stats": {
+                        "minutes": int(minutes[element]),
+                        "goals_scored": int(goals[element]),
+                        "assists": int(assists[element]),
+                        "clean_sheets": 0,
+                        "goals_conceded": 0,
+                        "own_goals": 0,
+                        "penalties_saved": 0,
+                        "penalties_missed": 0,
+                        "yellow_cards": 0,
+                        "red_cards": 0,
+                        "saves": 0,
+                        "bonus": int(min(3, goals[element])),
+                        "bps": int(bps[element]),
+                        "influence": "{0:.1f}".format(bps[element] * 0.8),
+                        "creativity": "0.0",
+                        "threat": "0.0",
+                        "ict_index": "{0:.1f}".format(bps[element] * 0.08),
+                        "starts": int(minutes[element] >= 60),
+                        "expected_goals": "{0:.2f}".format(xg[element]),
+                        "expected_assists": "0.00",
+                        "expected_goal_involvements": "{0:.2f}".format(xg[element]),
+                        "expected_goals_conceded": "0.00",
+                        "total_points": int(points[element]),
+                        "in_dreamteam": False,
+                    },
+                    "explain": [],
+                }
+            )
+        return {"elements": elements}
+
+    def standings_json(self) -> dict:
+        totals = np.array(
+            [
+                self._get_manager_season(manager_id)["history"][-1]["total_points"]
+                for manager_id in self.manager_ids
+            ]
+        )
+        event_totals = [
+            self._get_manager_season(manager_id)["history"][-1]["points"]
+            for manager_id in self.manager_ids
+        ]
+        order = np.argsort(-totals, kind="stable")
+        results = []
+        for rank, i in enumerate(order, start=1):
+            results.append(
+                {
+                    "id": int(i) + 1,
+                    "event_total": int(event_totals[i]),
+                    "player_name": "Manager {0}".format(i + 1),
+                    "rank": rank,
+                    "last_rank": rank,
+                    "rank_sort": rank,
+                    "total": int(totals[i]),
+                    "entry": int(self.manager_ids[i]),
+                    "entry_name": "Team {0} FC".format(i + 1),
+                }
+            )
+        return {
+            "league": {
+                "id": self.leagueID,
+                "name": "Synthetic League {0}".format(self.leagueID),
+            },
+            "standings": {"has_next": False, "page": 1, "results": results},
+        }
+
+    def history_json(self, manager_id) -> dict:
+        return {
+            "current": self._get_manager_season(manager_id)["history"],
+            "past": [],
+            "chips": [],
+        }
+
+    def picks_json(self, manager_id, gw) -> dict:
+        manager_season = self._get_manager_season(manager_id)
+        if not 1 <= gw <= self.current_gw:
+            return None
+        history_dict = manager_season["history"][gw - 1]
+        return {
+            "active_chip": None,
+            "automatic_subs": [],
+            "entry_history": history_dict,
+            "picks": manager_season["picks"][gw - 1],
+        }
+
+    def transfers_json(self, manager_id) -> list:
+        return self._get_manager_season(manager_id)["transfers"]
+
+    def _get_minutes_array(self) -> np.ndarray:
+        rng = np.random.default_rng((self.seed, 2))
+        plays = (
+            rng.random((self.n_players + 1, 39)) < self.element_availability[:, None]
+        )
+        minutes = np.where(
+            plays, rng.choice([90, 90, 90, 75, 60, 30, 15], plays.shape), 0
+        )
+        minutes[0] = 0
+        minutes[:, self.current_gw + 1 :] = 0
+        return minutes
+
+    def _get_live_points_array(self) -> np.ndarray:
+        ### (player_id, gw) total_points, 0 for unplayed gameweeks
+        if self._live_points_array is None:
+            rng = np.random.default_rng((self.seed, 3))
+            minutes = self._get_minutes_array()
+            appearance = np.where(minutes >= 60, 2, np.where(minutes > 0, 1, 0))
+            returns = rng.poisson(
+                np.broadcast_to(self.element_quality[:, None], minutes.shape)
+            )
+            self._live_points_array = np.where(minutes > 0, appearance + returns, 0)
+        return self._live_points_array
+
+    def _get_manager_season(self, manager_id) -> dict:
+        manager_id = int(manager_id)
+        if manager_id not in self._manager_seasons:
+            self._manager_seasons[manager_id] = self._make_manager_season(manager_id)
+        return self._manager_seasons[manager_id]
+
+    def _make_manager_season(self, manager_id) -> dict:
+        rng = np.random.default_rng((self.seed, 4, manager_id))
+        live_points_array = self._get_live_points_array()
+        minutes_array = self._get_minutes_array()
+        squad = make_picks_json(rng, self.element_types)["picks"]
+        elements = [pick["element"] for pick in squad]
+        bank = 1000 - int(self.element_costs[elements].sum())
+        if bank < 0:
+            bank = int(rng.integers(0, 30))
+        picks_list, history, transfers = [], [], []
+        total_points, free_transfers = 0, 1
+        for gw in range(1, self.current_gw + 1):
+            ### Same-position transfers before the deadline
+            n_transfers = 0 if gw == 1 else int(rng.choice([0, 1, 1, 2]))
+            for _ in range(n_transfers):
+                slot = int(rng.integers(0, 15))
+                element_out = elements[slot]
+                candidates = np.flatnonzero(
+                    self.element_types == self.element_types[element_out]
+                )
+                element_in = int(rng.choice(np.setdiff1d(candidates, elements)))
+                elements[slot] = element_in
+                transfers.append(
+                    {
+                        "element_in": element_in,
+                        "element_in_cost": int(self.element_costs[element_in]),
+                        "element_out": int(element_out),
+                        "element_out_cost": int(self.element_costs[element_out]),
+                        "entry": manager_id,
+                        "event": gw,
+                        "time": str(
+                            self.deadline_times[gw - 1]
+                            - np.timedelta64(int(rng.integers(1, 96)), "h")
+                        )
+                        + "Z",
+                    }
+                )
+            transfer_cost = 4 * max(0, n_transfers - free_transfers)
+            free_transfers = min(
+                2, free_transfers - min(n_transfers, free_transfers) + 1
+            )
+
+            captain, vice_captain = rng.choice(np.arange(11), size=2, replace=False)
+            picks = []
+            for i, element in enumerate(elements):
+                picks.append(
+                    {
+                        "element": int(element),
+                        "position": i + 1,
+                        "multiplier": 2 if i == captain else (1 if i < 11 else 0),
+                        "is_captain": bool(i == captain),
+                        "is_vice_captain": bool(i == vice_captain),
+                    }
+                )
+            picks_list.append(picks)
+
+            ### Scored after automatic substitutions, as the live game does
+            multipliers = autosub.get_autosub_multipliers(
+                self.element_types[elements],
+                np.array([pick["multiplier"] for pick in picks]),
+                np.array([pick["is_vice_captain"] for pick in picks]),
+                minutes_array[elements, gw] > 0,
+            )
+            gw_points = live_points_array[elements, gw]
+            points = int((gw_points * multipliers).sum())
+            total_points += points - transfer_cost
+            history.append(
+                {
+                    "event": gw,
+                    "points": points,
+                    "total_points": total_points,
+                    "rank": int(rng.integers(1, 10**7)),
+                    "rank_sort": int(rng.integers(1, 10**7)),
+                    "overall_rank": int(rng.integers(1, 10**7)),
+                    "percentile_rank": int(rng.integers(1, 100)),
+                    "bank": bank,
+                    "value": 1000 + gw // 4,
+                    "event_transfers": n_transfers,
+                    "event_transfers_cost": transfer_cost,
+                    "points_on_bench": int(gw_points[multipliers == 0].sum()),
+                }
+            )
+        return {"picks": picks_list, "history": history, "transfers": transfers[::-1]}
@@ -0,0 +1,190 @@
+import time
+import threading
+import pandas as pd
+import requests
+import http_client
+import response_cache
+
+
+#################
+### Constants ###
+#################
+
+
+REVALIDATE_AFTER = 300  # seconds between conditional requests
+position_name_dict = {1: "GKP", 2: "DEF", 3: "MID", 4: "FWD"}
+
+
+###############
+### Classes ###
+###############
+
+
+class BootstrapRegistry(object):
+    def __init__(self, url, revalidate_after=REVALIDATE_AFTER):
+        """
+        Arguments:
+        ----------
+            url: str
+                bootstrap-static URL
+            revalidate_after: float
+                seconds after which the next access sends a conditional
+                request (If-None-Match / If-Modified-Since) to the API
+
+        Returns:
+        --------
+            None
+
+        """
+        self.url = url
+        self.revalidate_after = float(revalidate_after)
+        self.downloads = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._etag = None
+        self._last_modified = None
+        self._payload = None
+
+    def refresh(self, force=False):
+        """
+        Revalidate the payload if it is older than revalidate_after seconds.
+        """
+        with self._lock:
+            if (
+                not force
+                and self._checked_at is not None
+                and time.time() - self._checked_at < self.revalidate_after
+            ):
+                return None
+            if self._payload is None:
+                self._load_persisted()
+
+            headers = {}
+            if self._payload is not None:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+            try:
+                response = http_client.get_default_client().get(
+                    self.url, headers=headers
+                )
+                response.raise_for_status()
+            except requests.RequestException:
+                ### API down, serve the payload held until the next revalidation
+                if self._payload is None:
+                    raise
+                self._checked_at = time.time()
+                return None
+            if response.status_code == 304 and self._payload is not None:
+                self.not_modified += 1
+            else:
+                self._etag = response.headers.get("ETag")
+                self._last_modified = response.headers.get("Last-Modified")
+                bootstrap_static_json = response.json()
+                self._index(bootstrap_static_json)
+                self._persist(bootstrap_static_json)
+                self.downloads += 1
+            self._checked_at = time.time()
+        return None
+
+    @property
+    def events_df(self) -> pd.DataFrame:
+        self.refresh()
+        return self._payload["events_df"]
+
+    @property
+    def elements_df(self) -> pd.DataFrame:
+        self.refresh()
+        return self._payload["elements_df"]
+
+    @property
+    def teams_df(self) -> pd.DataFrame:
+        self.refresh()
+        return self._payload["teams_df"]
+
+    @property
+    def player_id_name_dict(self) -> dict:
+        self.refresh()
+        return self._payload["player_id_name_dict"]
+
+    def _index(self, bootstrap_static_json):
+        ### Events keep their positional index, deadlines are looked up by gw - 1
+        events_df = pd.DataFrame(bootstrap_static_json["events"])
+
+        teams_df = pd.DataFrame(bootstrap_static_json["teams"]).set_index("id")
+
+        elements_df = pd.DataFrame(bootstrap_static_json["elements"]).set_index("id")
+        elements_df = pd.DataFrame(
+            {
+                "web_name": elements_df["web_name"],
+                "team": elements_df["team"].astype("int16"),
+                "team_name": elements_df["team"].map(teams_df["short_name"]),
+                "element_type": elements_df["element_type"].astype("int8"),
+                "position": elements_df["element_type"].map(position_name_dict),
+                "now_cost": elements_df["now_cost"].astype("int16"),
+                "price": elements_df["now_cost"] / 10,
+                ### Flagged players only, None means no known doubt
+                "chance_of_playing": pd.to_numeric(
+                    elements_df["chance_of_playing_next_round"], errors="coerce"
+                )
+                .fillna(100)
+                .div(100),
+            },
+            index=elements_df.index,
+        )
+
+        self._payload = {
+            "events_df": events_df,
+            "teams_df": teams_df,
+            "elements_df": elements_df,
+            "player_id_name_dict": elements_df["web_name"].to_dict(),
+        }
+        return None
+
+    def _persist(self, bootstrap_static_json):
+        ### Lets a restarted process revalidate instead of downloading again
+        response_cache.get_default_cache().set(
+            self._get_persist_key(),
+            {
+                "etag": self._etag,
+                "last_modified": self._last_modified,
+                "json": bootstrap_static_json,
+            },
+            ttl=response_cache.KEEP_FOREVER,
+        )
+        return None
+
+    def _load_persisted(self):
+        hit, persisted = response_cache.get_default_cache().get(
+            self._get_persist_key()
+        )
+        if not hit or not (persisted["etag"] or persisted["last_modified"]):
+            return None
+        self._etag = persisted["etag"]
+        self._last_modified = persisted["last_modified"]
+        self._index(persisted["json"])
+        return None
+
+    def _get_persist_key(self):
+        return self.url + "#bootstrap-registry"
+
+
+#################
+### Functions ###
+#################
+
+
+_registry_dict = {}
+_registry_dict_lock = threading.Lock()
+
+
+def get_registry(url) -> BootstrapRegistry:
+    """
+    One registry per bootstrap-static URL for the whole process.
+    """
+    with _registry_dict_lock:
+        if url not in _registry_dict:
+            _registry_dict[url] = BootstrapRegistry(url)
+    return _registry_dict[url]
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+
+#################
+### Constants ###
+#################
+
+
+FORM_WINDOW = 4
+FORM_DIVISOR = 12
+total_col_list = ["Transfers", "Transfer Costs", "Points on Bench"]
+
+
+#################
+### Functions ###
+#################
+
+
+def add_derived_metrics(season_stats_df) -> pd.DataFrame:
+    """
+    season_stats_df sorted by Manager then GW, with "Rank" (league rank per
+    gameweek), the "Total" columns and "Form" added, all in one vectorised
+    pass over the contiguous per-manager rows.
+    """
+    season_stats_df = season_stats_df.sort_values(by=["Manager", "GW"], kind="stable")
+    group_ids = pd.factorize(season_stats_df["Manager"])[0]
+    season_stats_df["Rank"] = get_rank(
+        season_stats_df["GW"].to_numpy(), season_stats_df["Total Points"].to_numpy()
+    )
+    for col in total_col_list:
+        season_stats_df[f"Total {col}"] = get_group_cumsum(
+            season_stats_df[col].to_numpy(), group_ids
+        )
+    season_stats_df["Form"] = (
+        get_group_rolling_mean(
+            season_stats_df["Points"].to_numpy(), group_ids, FORM_WINDOW
+        )
+        / FORM_DIVISOR
+    )
+    return season_stats_df
+
+
+def append_gameweek(season_stats_df, gw_season_stats_df) -> pd.DataFrame:
+    """
+    Add the rows of a single new gameweek to season_stats_df, which already
+    has its derived columns and no rows after that gameweek. Only rows of that
+    gameweek are computed: the "Total" columns and "Form" of the new rows
+    from each manager's previous rows, and "Rank" of every row of the gameweek.
+    """
+    gw = gw_season_stats_df["GW"].iloc[0]
+    gw_season_stats_df = gw_season_stats_df.copy()
+    prev_df = season_stats_df.loc[season_stats_df["GW"] < gw]
+    prev_grouped = prev_df.groupby("Manager")
+    managers = gw_season_stats_df["Manager"]
+
+    ### "Total" columns carry on from each manager's last row
+    last_df = prev_grouped.last()
+    for col in total_col_list:
+        offset = managers.map(last_df[f"Total {col}"]).fillna(0)
+        gw_season_stats_df[f"Total {col}"] = (gw_season_stats_df[col] + offset).astype(
+            season_stats_df[f"Total {col}"].dtype
+        )
+
+    ### "Form" over the new row and the manager's previous FORM_WINDOW - 1 rows
+    window_df = prev_grouped.tail(FORM_WINDOW - 1).groupby("Manager")["Points"]
+    points_sum = managers.map(window_df.sum()).fillna(0)
+    n_rows = managers.map(window_df.count()).fillna(0) + 1
+    gw_season_stats_df["Form"] = (
+        (gw_season_stats_df["Points"] + points_sum) / n_rows / FORM_DIVISOR
+    )
+
+    ### Rows of that gameweek that are not replaced stay, but are re-ranked
+    kept_df = season_stats_df.loc[
+        ~((season_stats_df["GW"] == gw) & season_stats_df["Manager"].isin(managers))
+    ]
+    gw_mask = (kept_df["GW"] == gw).to_numpy()
+    kept_gw_df = kept_df.loc[gw_mask]
+    ranks = get_rank(
+        np.zeros(len(kept_gw_df) + len(gw_season_stats_df), dtype=np.int64),
+        np.concatenate(
+            [
+                kept_gw_df["Total Points"].to_numpy(),
+                gw_season_stats_df["Total Points"].to_numpy(),
+            ]
+        ),
+    )
+    gw_season_stats_df["Rank"] = ranks[len(kept_gw_df) :]
+    if len(kept_gw_df):
+        kept_df = kept_df.copy()
+        kept_df.loc[gw_mask, "Rank"] = ranks[: len(kept_gw_df)]
+
+    return pd.concat(
+        [kept_df, gw_season_stats_df[season_stats_df.columns]]
+    ).sort_values(by=["Manager", "GW"], kind="stable")
+
+
+def get_rank(group_ids, values) -> np.ndarray:
+    """
+    Descending "min" rank of values within each group, as float like
+    pd.Series.rank, NaN values left unranked.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rank = np.full(len(values), np.nan)
+    is_value = ~np.isnan(values)
+    idx = np.nonzero(is_value)[0]
+    order = idx[np.lexsort((-values[idx], group_ids[idx]))]
+    if not len(order):
+        return rank
+    sorted_groups = group_ids[order]
+    sorted_values = values[order]
+    ### Position in the sorted order of the first row of each group and of each tie
+    positions = np.arange(len(order))
+    is_group_start = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    is_tie_start = is_group_start | np.r_[True, sorted_values[1:] != sorted_values[:-1]]
+    group_start = np.maximum.accumulate(np.where(is_group_start, positions, 0))
+    tie_start = np.maximum.accumulate(np.where(is_tie_start, positions, 0))
+    rank[order] = tie_start - group_start + 1
+    return rank
+
+
+def get_group_cumsum(values, group_ids) -> np.ndarray:
+    """
+    Cumulative sum of values restarting at each group, groups contiguous.
+    """
+    cumsum = np.cumsum(values)
+    group_start_idx = _get_group_start_idx(group_ids)
+    ### Subtract the running total up to the row before each group's start
+    offsets = np.r_[0, cumsum][group_start_idx]
+    return cumsum - offsets
+
+
+def get_group_rolling_mean(values, group_ids, window) -> np.ndarray:
+    """
+    Trailing mean over the last window rows of each group (fewer at the
+    start of a group), groups contiguous.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    cumsum = np.r_[0, np.cumsum(values)]
+    positions = np.arange(len(values))
+    window_start = np.maximum(positions - window + 1, _get_group_start_idx(group_ids))
+    return (cumsum[positions + 1] - cumsum[window_start]) / (
+        positions + 1 - window_start
+    )
+
+
+def _get_group_start_idx(group_ids) -> np.ndarray:
+    ### Index of the first row of each row's group
+    positions = np.arange(len(group_ids))
+    if not len(group_ids):
+        return positions
+    is_group_start = np.r_[True, group_ids[1:] != group_ids[:-1]]
+    return np.maximum.accumulate(np.where(is_group_start, positions, 0))
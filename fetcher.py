@@ -0,0 +1,76 @@
+import concurrent.futures
+
+
+#################
+### Constants ###
+#################
+
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+###############
+### Classes ###
+###############
+
+
+class ConcurrentFetcher(object):
+    def __init__(self, fetch_fn, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Arguments:
+        ----------
+            fetch_fn: callable(url_template, **kwargs) -> dict
+                function performing a single request and returning the parsed JSON
+            max_concurrency: int
+                maximum number of requests in flight at any one time;
+                a value of 1 (or less) falls back to fetching serially
+
+        Returns:
+        --------
+            None
+
+        """
+        self.fetch_fn = fetch_fn
+        self.max_concurrency = max(1, int(max_concurrency))
+
+    def fetch_all(self, url_template, kwargs_list, progress_callback=None) -> list:
+        """
+        Fetch one response per entry of kwargs_list.
+        Results are returned in the same order as kwargs_list, regardless of
+        the order in which the requests complete, so callers can assemble
+        their DataFrames exactly as they would from a serial loop.
+        progress_callback(n_completed, n_total) is always called from the
+        calling thread, which keeps Streamlit elements safe to update.
+        """
+        n_total = len(kwargs_list)
+        results = [None] * n_total
+        if n_total == 0:
+            return results
+
+        ### Serial path
+        if self.max_concurrency == 1 or n_total == 1:
+            for i, kwargs in enumerate(kwargs_list):
+                results[i] = self.fetch_fn(url_template, **kwargs)
+                if progress_callback is not None:
+                    progress_callback(i + 1, n_total)
+            return results
+
+        ### Concurrent path
+        pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, n_total)
+        )
+        try:
+            future_idx_dict = {
+                pool.submit(self.fetch_fn, url_template, **kwargs): i
+                for i, kwargs in enumerate(kwargs_list)
+            }
+            for n_completed, future in enumerate(
+                concurrent.futures.as_completed(future_idx_dict), start=1
+            ):
+                results[future_idx_dict[future]] = future.result()
+                if progress_callback is not None:
+                    progress_callback(n_completed, n_total)
+        finally:
+            ### Don't leave queued requests running if one of them failed
+            pool.shutdown(wait=True, cancel_futures=True)
+        return results
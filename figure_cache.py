@@ -0,0 +1,133 @@
+import threading
+import collections
+import numpy as np
+import plotly.graph_objects as go
+
+
+#################
+### Constants ###
+#################
+
+
+DEFAULT_MAX_ENTRIES = 64
+AXIS_PADDING = 0.05  # fraction of the data span added either side of an axis range
+
+
+###############
+### Classes ###
+###############
+
+
+class FigureCache(object):
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Arguments:
+        ----------
+            max_entries: int
+                number of figure specs kept, least recently used dropped first
+
+        Returns:
+        --------
+            None
+
+        """
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> figure spec dict
+
+    def get_figure(self, key, make_fig) -> go.Figure:
+        """
+        A new figure from the spec cached under key, make_fig() being called
+        and its figure serialised on a miss. key must identify the data and
+        every parameter make_fig uses (e.g. data version and chart options).
+        The figure returned is the caller's own to update.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return go.Figure(self._entries[key])
+        spec = make_fig().to_dict()
+        with self._lock:
+            self._entries[key] = spec
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+        return go.Figure(spec)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return None
+
+
+#################
+### Functions ###
+#################
+
+
+def get_vline_layout(x_list, text_list, **line_kwargs) -> dict:
+    """
+    Layout shapes and annotations for a dashed vertical line at each x,
+    labelled above the plot, as fig.add_vline(..., annotation_position="top")
+    would add them one at a time. Passed to fig.update_layout in one call.
+    """
+    shape_list = [
+        dict(
+            type="line",
+            x0=x,
+            x1=x,
+            xref="x",
+            y0=0,
+            y1=1,
+            yref="y domain",
+            line=line_kwargs,
+        )
+        for x in x_list
+    ]
+    annotation_list = [
+        dict(
+            x=x,
+            xref="x",
+            xanchor="center",
+            y=1,
+            yref="y domain",
+            yanchor="bottom",
+            text=text,
+            showarrow=False,
+        )
+        for x, text in zip(x_list, text_list)
+    ]
+    return dict(shapes=shape_list, annotations=annotation_list)
+
+
+def get_axis_range(values, padding=AXIS_PADDING):
+    """
+    [low, high] axis range around values, padded by padding times their
+    span (or 1 if there is no span). None if there are no finite values,
+    leaving the axis to autorange.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    low, high = values.min(), values.max()
+    pad = padding * (high - low) if high > low else 1.0
+    return [low - pad, high + pad]
+
+
+_default_figure_cache = None
+_default_figure_cache_lock = threading.Lock()
+
+
+def get_default_figure_cache() -> FigureCache:
+    """
+    Process-wide figure cache, shared by every Streamlit session.
+    """
+    global _default_figure_cache
+    with _default_figure_cache_lock:
+        if _default_figure_cache is None:
+            _default_figure_cache = FigureCache()
+    return _default_figure_cache
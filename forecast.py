@@ -0,0 +1,162 @@
+import threading
+import collections
+import numpy as np
+import pandas as pd
+
+
+#################
+### Constants ###
+#################
+
+
+DEFAULT_HORIZON = 8
+HALF_LIFE = 4  # gameweeks for a past gameweek's weight to halve
+PRIOR_APPEARANCES = 3  # weight of the position average in points per appearance
+DEFAULT_MAX_ENTRIES = 16
+
+
+###############
+### Classes ###
+###############
+
+
+class Forecaster(object):
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Arguments:
+        ----------
+            max_entries: int
+                number of expected-points matrices kept, least recently used dropped first
+
+        Returns:
+        --------
+            None
+
+        """
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # key -> pd.DataFrame
+
+    def get_expected_points_df(
+        self,
+        data_version,
+        player_gw_store,
+        elements_df,
+        last_gw,
+        horizon=DEFAULT_HORIZON,
+        team_gw_multiplier=None,
+    ) -> pd.DataFrame:
+        """
+        get_expected_points_df, computed once per data_version and horizon.
+        data_version must identify the player data (e.g. the API and
+        league_store.get_data_version), a custom team_gw_multiplier bypasses the cache.
+        """
+        if team_gw_multiplier is not None:
+            return get_expected_points_df(
+                player_gw_store, elements_df, last_gw, horizon, team_gw_multiplier
+            )
+        key = (data_version, int(last_gw), int(horizon))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        expected_points_df = get_expected_points_df(
+            player_gw_store, elements_df, last_gw, horizon
+        )
+        with self._lock:
+            self._entries[key] = expected_points_df
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+        return expected_points_df
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return None
+
+
+#################
+### Functions ###
+#################
+
+
+def get_expected_points_df(
+    player_gw_store,
+    elements_df,
+    last_gw,
+    horizon=DEFAULT_HORIZON,
+    team_gw_multiplier=None,
+) -> pd.DataFrame:
+    """
+    Expected points of every player in elements_df (index player id) for
+    each of the horizon gameweeks after last_gw, one column per gameweek.
+
+    Expected points are points per appearance times the chance of appearing.
+    Both are exponentially weighted over past gameweeks (HALF_LIFE), points
+    per appearance shrunk towards the position average by PRIOR_APPEARANCES.
+    The first gameweek is scaled by chance_of_playing_next_round and every
+    gameweek by team_gw_multiplier[team, gw] if given (fixture difficulty,
+    blank and double gameweeks), else 1.
+    """
+    n_gws = player_gw_store.n_gws
+    gws = np.arange(last_gw + 1, min(last_gw + horizon, n_gws) + 1)
+    player_ids = elements_df.index.to_numpy()
+
+    ### (player, past gw) arrays, players missing from the store have no history
+    store_rows = np.where(player_ids <= player_gw_store.n_players, player_ids, 0)
+    past_gws = np.arange(1, last_gw + 1)
+    points = player_gw_store.get("total_points", store_rows, past_gws).astype(
+        np.float64
+    )
+    played = player_gw_store.get("minutes", store_rows, past_gws) > 0
+    played[store_rows == 0] = False
+    weights = 0.5 ** ((last_gw - past_gws) / HALF_LIFE)
+
+    appearance_weight = played @ weights
+    points_weight = (points * played) @ weights
+    total_weight = weights.sum()
+
+    ### Points per appearance, shrunk towards the position average
+    element_type = elements_df["element_type"].to_numpy()
+    type_points = np.bincount(element_type, weights=points_weight, minlength=5)
+    type_appearances = np.bincount(element_type, weights=appearance_weight, minlength=5)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        type_mean = np.nan_to_num(type_points / type_appearances)
+        points_per_appearance = (
+            points_weight + PRIOR_APPEARANCES * type_mean[element_type]
+        ) / (appearance_weight + PRIOR_APPEARANCES)
+        appearance_chance = np.nan_to_num(appearance_weight / total_weight)
+
+    expected_points = np.repeat(
+        (points_per_appearance * appearance_chance)[:, None], len(gws), axis=1
+    )
+    if len(gws) and "chance_of_playing" in elements_df:
+        expected_points[:, 0] *= elements_df["chance_of_playing"].to_numpy()
+    if team_gw_multiplier is not None:
+        team = elements_df["team"].to_numpy()
+        expected_points *= team_gw_multiplier[team[:, None], gws[None, :]]
+
+    return pd.DataFrame(
+        expected_points,
+        index=pd.Index(player_ids, name="player_id"),
+        columns=pd.Index(gws, name="GW"),
+    )
+
+
+_default_forecaster = None
+_default_forecaster_lock = threading.Lock()
+
+
+def get_default_forecaster() -> Forecaster:
+    """
+    Process-wide forecaster, shared by every Streamlit session.
+    """
+    global _default_forecaster
+    with _default_forecaster_lock:
+        if _default_forecaster is None:
+            _default_forecaster = Forecaster()
+    return _default_forecaster
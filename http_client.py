@@ -0,0 +1,208 @@
+import re
+import time
+import random
+import threading
+import collections
+import email.utils
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+#################
+### Constants ###
+#################
+
+
+DEFAULT_TIMEOUT = (5.0, 30.0)  # (connect, read) seconds
+DEFAULT_POOL_SIZE = 32
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_MAX_BACKOFF = 60.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+LATENCY_SAMPLES_PER_ENDPOINT = 2000
+
+
+###############
+### Classes ###
+###############
+
+
+class HTTPClient(object):
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        max_backoff=DEFAULT_MAX_BACKOFF,
+    ):
+        """
+        Arguments:
+        ----------
+            pool_size: int
+                number of keep-alive connections kept open per host;
+                should be at least the fetcher's concurrency limit
+            timeout: float or (float, float)
+                per-request (connect, read) timeout in seconds
+            max_retries: int
+                retries after the first attempt on connection errors,
+                timeouts and RETRY_STATUS_CODES responses
+            backoff_factor: float
+                retry n waits between half and all of backoff_factor * 2**n
+                seconds (equal jitter),
+                unless the server sends a Retry-After header
+            max_backoff: float
+                upper bound on any single wait
+
+        Returns:
+        --------
+            None
+
+        """
+        self.timeout = timeout
+        self.max_retries = int(max_retries)
+        self.backoff_factor = float(backoff_factor)
+        self.max_backoff = float(max_backoff)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=int(pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=LATENCY_SAMPLES_PER_ENDPOINT)
+        )
+        self._counts = collections.defaultdict(collections.Counter)
+
+    def get(self, url, headers=None) -> requests.Response:
+        """
+        GET url, retrying with exponential backoff.
+        The final response is returned as is (including 304s and error codes),
+        only network errors on the last attempt are raised.
+        """
+        endpoint = get_endpoint_name(url)
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(endpoint, time.perf_counter() - start, "errors")
+                if attempt == self.max_retries:
+                    raise
+                self._record(endpoint, None, "retries")
+                time.sleep(self._get_backoff(attempt))
+                continue
+
+            self._record(endpoint, time.perf_counter() - start, "requests")
+            if (
+                response.status_code not in RETRY_STATUS_CODES
+                or attempt == self.max_retries
+            ):
+                return response
+            self._record(endpoint, None, "retries")
+            if response.status_code == 429:
+                self._record(endpoint, None, "throttled")
+            retry_after = response.headers.get("Retry-After")
+            ### Hand the pooled connection back before waiting
+            response.close()
+            time.sleep(self._get_backoff(attempt, retry_after))
+        return response
+
+    def get_json(self, url):
+        response = self.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    def latency_stats(self) -> dict:
+        """
+        Per-endpoint request counts and latency percentiles in milliseconds.
+        """
+        with self._lock:
+            stats_dict = {}
+            for endpoint, counts in self._counts.items():
+                latencies = np.array(self._latencies[endpoint]) * 1000
+                stats_dict[endpoint] = {
+                    "requests": counts["requests"],
+                    "errors": counts["errors"],
+                    "retries": counts["retries"],
+                    "throttled": counts["throttled"],
+                    "mean_ms": float(latencies.mean()) if len(latencies) else np.nan,
+                    "p50_ms": float(np.percentile(latencies, 50))
+                    if len(latencies)
+                    else np.nan,
+                    "p95_ms": float(np.percentile(latencies, 95))
+                    if len(latencies)
+                    else np.nan,
+                    "max_ms": float(latencies.max()) if len(latencies) else np.nan,
+                }
+        return stats_dict
+
+    def reset_stats(self):
+        with self._lock:
+            self._latencies.clear()
+            self._counts.clear()
+        return None
+
+    def _record(self, endpoint, latency, count_name):
+        with self._lock:
+            self._counts[endpoint][count_name] += 1
+            if latency is not None:
+                self._latencies[endpoint].append(latency)
+        return None
+
+    def _get_backoff(self, attempt, retry_after=None) -> float:
+        ### Server knows best
+        retry_after_seconds = parse_retry_after(retry_after)
+        if retry_after_seconds is not None:
+            return min(retry_after_seconds, self.max_backoff)
+        ### Exponential with equal jitter, a random wait of half to all of it
+        backoff = self.backoff_factor * (2**attempt)
+        return min(random.uniform(0.5, 1.0) * backoff, self.max_backoff)
+
+
+#################
+### Functions ###
+#################
+
+
+def get_endpoint_name(url) -> str:
+    """
+    Collapse ids in the URL path so that e.g. every entry/{id}/event/{gw}/picks/
+    request is aggregated under one endpoint.
+    """
+    path = re.sub(r"^https?://[^/]+", "", url.split("?")[0])
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+
+def parse_retry_after(retry_after):
+    """
+    Retry-After is either a number of seconds or an HTTP date.
+    """
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> HTTPClient:
+    """
+    Process-wide client, so every FPL request shares one connection pool.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HTTPClient()
+    return _default_client
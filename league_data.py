@@ -1,12 +1,28 @@
-from altair import Self
 import streamlit as st
+import sys
+import copy
+import threading
+import collections
 import datetime as datetime
 from dataclasses import dataclass
-import requests
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import utils
+import fetcher
+import response_cache
+import league_snapshot
+import bootstrap
+import picks_builder
+import player_gw_store
+import derived_metrics
+import similarity
+import what_if
+import forecast
+import optimiser
+import planner
+import simulator
+import league_store
+import figure_cache
 from ast import literal_eval
 
 
@@ -71,6 +87,11 @@ combined_plotly_colour_list = [
 rgba_tuples_list = [
     literal_eval(c.replace("rgba", "")) for c in combined_plotly_colour_list
 ]
+reversed_y_axis_list = ["Rank", "Overall Rank"]
+MAX_CACHED_VIEWS = 128  # derived views kept per league, see LeagueData._get_view
+### Approximate memory the derived views of a league may hold, about one
+### what-if similarity tensor of a 1000 manager league plus its frames
+MAX_CACHED_VIEW_BYTES = 256 * 1024**2
 
 ###############
 ### Classes ###
@@ -86,6 +107,8 @@ class LeagueData:
     transfers_url_template: str
     bootstrap_static_url: str
     live_url_template: str
+    max_concurrency: int = fetcher.DEFAULT_MAX_CONCURRENCY
+    incremental: bool = False
 
     def __post_init__(self):
         ### League info
@@ -94,18 +117,45 @@ class LeagueData:
             self.standings_df["Manager"].values, index=self.standings_df["ID"]
         ).to_dict()
 
-        ### Dataframe for game week deadlines
-        self.bootstrap_static_events_df = pd.DataFrame(
-            self._get_requests_response(self.bootstrap_static_url, kwars={})["events"]
+        ### Dataframe for game week deadlines, from the shared bootstrap-static registry
+        self.bootstrap_static_events_df = self._get_bootstrap_registry().events_df
+        self.data_version = league_store.get_data_version(self.bootstrap_static_url)
+
+        ### Previous build of this league, only refetch what has changed since
+        snapshot = self._load_snapshot() if self.incremental else None
+        if snapshot is not None:
+            self._refresh_from_snapshot(snapshot)
+        else:
+            self._build_from_scratch()
+
+        self._save_snapshot()
+
+        ### Counterfactual "what if" teams, see add_what_if_managers
+        self.what_if_engine = what_if.WhatIfEngine(
+            league_teams_df=self.league_teams_df,
+            season_stats_df=self.season_stats_df,
+            standings_df=self.standings_df,
+            points_array=self.player_gw_store.stat_array_dict["total_points"],
+            minutes_array=self.player_gw_store.stat_array_dict["minutes"],
+            element_types=self._get_bootstrap_registry().elements_df["element_type"],
+            max_gw=self.max_gw,
         )
+        self.what_if_gw = None
+        self.what_if_season_stats_df = None
+        self.what_if_standings_df = None
+
+        ### Derived views, shared by every view() of this league
+        self._view_dict = collections.OrderedDict()
+        self._view_lock = threading.Lock()
 
+    def _build_from_scratch(self):
         ### Season stats
         with st.spinner(text="(1/3) Collecting and processing season statistics..."):
             self.season_stats_df = self._get_season_stats_df()
         self.max_gw = self.season_stats_df["GW"].max()
 
         ### Player ID:web_name lookup
-        self.player_id_name_dict = self._get_player_id_name_lookup()
+        self.player_id_name_dict = self._get_bootstrap_registry().player_id_name_dict
 
         ### Manager teams
         with st.spinner(
@@ -113,6 +163,11 @@ class LeagueData:
         ):
             self.league_teams_df = self._get_teams_dfs()
 
+        ### Per gameweek team similarity counts
+        self.similarity_tensor = similarity.SimilarityTensor.from_league_teams_df(
+            self.league_teams_df
+        )
+
         ### Transfers
         self.transfers_df = self._get_transfers_df()
 
@@ -120,222 +175,325 @@ class LeagueData:
         with st.spinner(
             text="(3/3) Collecting and processing player data, almost there..."
         ):
+            self.player_gw_store = player_gw_store.PlayerGameweekStore()
+            self._update_player_gw_store(list(range(1, self.max_gw + 1)))
             self.players_df = self._get_players_df()
-
-    def add_what_if_managers(self, what_if_gw):
-        ### Extend league_teams_df
-        self.league_teams_df = self._extend_league_teams_df(what_if_gw)
-        ### Season stats
-        self.season_stats_df = self._recalc_season_stats(what_if_gw)
-        ### Standings
-        self.standings_df = self._recalc_standings()
         return None
 
-    def _recalc_standings(self):
-        ### Get "what if" managers' latest gw stats
-        what_if_standings_df = (
-            self.season_stats_df.loc[
-                (self.season_stats_df["GW"] == self.max_gw)
-                & (self.season_stats_df["Manager"].str.contains("(?:what if)")),
-                ["Rank", "Manager", "Points", "Total Points", "Form"],
-            ]
-            .rename(columns={"Points": "GW Total"})
-            .reset_index(drop=True)
-        )
+    def _refresh_from_snapshot(self, snapshot):
+        ### Gameweeks that were not finished when the snapshot was taken may have changed
+        refresh_from_gw = snapshot["stable_gw"] + 1
+        prev_manager_id_name_dict = snapshot["manager_id_name_dict"]
+        new_manager_ids = [
+            manager_id
+            for manager_id in self.manager_id_name_dict
+            if manager_id not in prev_manager_id_name_dict
+        ]
 
-        ### Concat with current standings
-        recalc_standings_df = pd.concat(
-            [self.standings_df, what_if_standings_df],
-            ignore_index=True,
-            join="outer",
-        ).sort_values(by=["Manager"])
+        ### Season stats, one request per manager regardless
+        with st.spinner(text="(1/3) Refreshing season statistics..."):
+            self.season_stats_df = self._refresh_season_stats_df(
+                snapshot, refresh_from_gw
+            )
+        self.max_gw = self.season_stats_df["GW"].max()
 
-        ### Forward fill team names and recalc Rank
-        recalc_standings_df["Team Name"] = recalc_standings_df["Team Name"].ffill()
-        recalc_standings_df["Rank"] = recalc_standings_df["Total Points"].rank(
-            method="min", ascending=False
-        )
+        ### Player ID:web_name lookup
+        self.player_id_name_dict = self._get_bootstrap_registry().player_id_name_dict
+
+        ### Manager teams, picks are fixed once made so only new gameweeks and managers
+        with st.spinner(text="(2/3) Refreshing team selection data..."):
+            manager_gw_list = [
+                (manager_id, gw)
+                for manager_id in self.manager_id_name_dict
+                for gw in range(
+                    1 if manager_id in new_manager_ids else snapshot["max_gw"] + 1,
+                    self.max_gw + 1,
+                )
+            ]
+            prev_league_teams_df = snapshot["league_teams_df"]
+            prev_league_teams_df = prev_league_teams_df.assign(
+                Manager=prev_league_teams_df["Manager"]
+                .map({v: k for k, v in prev_manager_id_name_dict.items()})
+                .map(self.manager_id_name_dict)
+            ).dropna(subset=["Manager"])
+            league_teams_df_list = [prev_league_teams_df]
+            if manager_gw_list:
+                league_teams_df_list.append(self._get_teams_dfs(manager_gw_list))
+            self.league_teams_df = self._sort_league_teams_df(
+                pd.concat(league_teams_df_list)
+            )
+
+        ### Per gameweek team similarity counts, only the new gameweeks
+        self.similarity_tensor = self._refresh_similarity_tensor(snapshot)
 
-        ### Order by Rank
-        recalc_standings_df = recalc_standings_df.sort_values(by="Rank")
+        ### Transfers
+        self.transfers_df = self._get_transfers_df()
 
-        ### Output only necessary columns and change dtype
-        recalc_standings_df = recalc_standings_df[
-            ["Rank", "Manager", "Team Name", "GW Total", "Total Points"]
-        ].astype({"Rank": "int32", "Total Points": "int32"})
+        ### Players, live points settle once the gameweek is finished
+        with st.spinner(text="(3/3) Refreshing player data..."):
+            self.player_gw_store = snapshot["player_gw_store"]
+            self._update_player_gw_store(list(range(refresh_from_gw, self.max_gw + 1)))
+            self.players_df = self._get_players_df()
+        return None
 
-        return recalc_standings_df
+    def view(self):
+        ### Cheap per-session copy sharing the built DataFrames,
+        ### "what if" mode reassigns attributes rather than mutating them
+        return copy.copy(self)
 
-    def _recalc_season_stats(self, what_if_gw) -> pd.DataFrame:
-        ### Merge player points to league_teams_df
-        self.league_teams_df = pd.merge(
-            left=self.league_teams_df,
-            right=self.players_df,
-            left_on=["element", "gw"],
-            right_on=["player_id", "gw"],
-            how="left",
+    def add_what_if_managers(self, what_if_gw):
+        ### "What if" rows live beside season_stats_df and standings_df, never in them
+        (
+            self.what_if_season_stats_df,
+            self.what_if_standings_df,
+            self.similarity_tensor,
+        ) = self._get_view(
+            ("what_if", what_if_gw), lambda: self._make_what_if_views(what_if_gw)
         )
+        self.what_if_gw = what_if_gw
+        return None
 
-        ### Calculate earned points and benched points
-        self.league_teams_df["earned_points"] = (
-            self.league_teams_df["total_points"] * self.league_teams_df["multiplier"]
-        )
-        self.league_teams_df["benched_points"] = np.where(
-            self.league_teams_df["multiplier"] == 0,
-            self.league_teams_df["total_points"],
-            0,
+    def get_what_if_summary_df(self) -> pd.DataFrame:
+        ### Every freeze gameweek is computed in one pass and cached with the league
+        return self.what_if_engine.get_freeze_summary_df()
+
+    def get_expected_points_df(self, horizon=forecast.DEFAULT_HORIZON) -> pd.DataFrame:
+        ### (player, gameweek) expected points after max_gw, shared per data version
+        return forecast.get_default_forecaster().get_expected_points_df(
+            data_version=(self.bootstrap_static_url, self.data_version),
+            player_gw_store=self.player_gw_store,
+            elements_df=self._get_bootstrap_registry().elements_df,
+            last_gw=self.max_gw,
+            horizon=horizon,
         )
 
-        ### Calculate Points per gw
-        what_if_season_stats_df = (
-            (
-                self.league_teams_df.groupby(["Manager", "gw"])["earned_points"]
-                .sum()
-                .to_frame(name="earned_points")
-                .reset_index()
-            )
-            .rename(columns={"gw": "GW", "earned_points": "Points"})
-            .reset_index(drop=True)
+    def optimise_squad(
+        self, horizon=forecast.DEFAULT_HORIZON, budget=optimiser.BUDGET
+    ) -> optimiser.SquadSolution:
+        ### Best squad for the expected points of the next horizon gameweeks
+        return self._get_view(
+            ("squad_solution", horizon, budget),
+            lambda: optimiser.optimise_squad(
+                self.get_expected_points_df(horizon),
+                self._get_bootstrap_registry().elements_df,
+                budget=budget,
+            ),
         )
 
-        ### Drop non "what if" managers
-        what_if_season_stats_df = what_if_season_stats_df[
-            what_if_season_stats_df["Manager"].str.contains("(?:what if)")
-        ]
+    def plan_transfers(
+        self, manager, horizon=forecast.DEFAULT_HORIZON
+    ) -> planner.TransferPlan:
+        return self._get_view(
+            ("transfer_plan", manager, horizon),
+            lambda: self._make_transfer_plan(manager, horizon),
+        )
 
-        ### Calculate Points on Bench and merge
-        pob_df = (
-            (
-                self.league_teams_df.groupby(["Manager", "gw"])["benched_points"]
-                .sum()
-                .to_frame(name="benched_points")
-                .reset_index()
-            )
-            .rename(columns={"gw": "GW", "benched_points": "Points on Bench"})
-            .reset_index(drop=True)
+    def simulate_league(
+        self, n_sims=simulator.DEFAULT_N_SIMS, seed=simulator.DEFAULT_SEED
+    ) -> simulator.SimulationResult:
+        return self._get_view(
+            ("simulation", n_sims, seed), lambda: self._make_simulation(n_sims, seed)
         )
-        what_if_season_stats_df = pd.merge(
-            what_if_season_stats_df, pob_df, on=["Manager", "GW"], how="left"
-        )
-
-        ### Merge in transfers and costs
-        what_if_season_stats_df["Manager"] = what_if_season_stats_df[
-            "Manager"
-        ].str.replace(" (what if)", "")
-        what_if_season_stats_df = pd.merge(
-            left=what_if_season_stats_df,
-            right=self.season_stats_df.loc[
-                :,
-                [
-                    "Manager",
-                    "GW",
-                    "Transfers",
-                    "Transfer Costs",
-                    "Total Transfers",
-                    "Total Transfer Costs",
-                ],
-            ],
-            on=["Manager", "GW"],
-            how="left",
+
+    def get_season_stats_view(self) -> pd.DataFrame:
+        ### Season stats plus any "what if" rows, by manager then gameweek
+        if self.what_if_season_stats_df is None:
+            return self.season_stats_df
+        return self._get_view(
+            ("season_stats_view", self.what_if_gw),
+            lambda: pd.concat(
+                [self.season_stats_df, self.what_if_season_stats_df],
+                ignore_index=True,
+            ).sort_values(by=["Manager", "GW"]),
         )
-        what_if_season_stats_df["Manager"] = (
-            what_if_season_stats_df["Manager"].astype(str) + " (what if)"
+
+    def get_standings_view(self) -> pd.DataFrame:
+        ### Standings plus any "what if" rows, with the latest "Form"
+        return self._get_view(
+            ("standings_view", self.what_if_gw), self._make_standings_view
         )
-        for transfer_col in ["Transfers", "Transfer Costs"]:
-            what_if_season_stats_df[transfer_col] = np.where(
-                what_if_season_stats_df["GW"] > what_if_gw,
-                0,
-                what_if_season_stats_df[transfer_col],
-            )
-        for total_transfer_col in ["Total Transfers", "Total Transfer Costs"]:
-            what_if_season_stats_df[total_transfer_col] = np.where(
-                what_if_season_stats_df["GW"] > what_if_gw,
-                np.nan,
-                what_if_season_stats_df[total_transfer_col],
-            )
-            what_if_season_stats_df[total_transfer_col] = what_if_season_stats_df[
-                total_transfer_col
-            ].ffill()
-
-        ### Calculate Total Points
-        what_if_season_stats_df["Total Points"] = (
-            what_if_season_stats_df.groupby(["Manager"])["Points"].transform(
-                pd.Series.cumsum
-            )
-            - what_if_season_stats_df["Total Transfer Costs"]
+
+    def get_similarity_df(self, gw_range) -> pd.DataFrame:
+        ### Slice of the precomputed per gameweek counts
+        return self._get_view(
+            ("similarity_df", self.what_if_gw, gw_range),
+            lambda: self.similarity_tensor.jaccard_sim(gw_range),
         )
-        ### Calculate Total Points on Bench
-        what_if_season_stats_df["Total Points on Bench"] = (
-            what_if_season_stats_df.groupby(["Manager"])["Points on Bench"].transform(
-                pd.Series.cumsum
-            )
+
+    def get_venn_word_lists(self, manager1, manager2, gw) -> tuple:
+        ### (manager1 only, both, manager2 only) pick labels of gameweek gw
+        return self._get_view(
+            ("venn_word_lists", self.what_if_gw, manager1, manager2, gw),
+            lambda: self._make_venn_word_lists(manager1, manager2, gw),
         )
 
-        ### Concat with regular managers
-        recalc_season_stats_df = pd.concat(
-            [self.season_stats_df, what_if_season_stats_df],
-            ignore_index=True,
-            join="outer",
-        ).sort_values(by=["Manager", "GW"])
+    def get_managers(self) -> list:
+        return self.similarity_tensor.managers
 
-        ### Recalculate league rank as "Rank"
-        recalc_season_stats_df["Rank"] = recalc_season_stats_df.groupby("GW")[
-            "Total Points"
-        ].rank(method="min", ascending=False)
+    def get_pick_codes(self, manager, gw) -> np.ndarray:
+        return self.what_if_engine.get_pick_codes(manager, gw, self.what_if_gw)
 
-        ### Recalculate "Form"
-        recalc_season_stats_df["Form"] = recalc_season_stats_df.groupby("Manager")[
-            "Points"
-        ].transform(lambda s: s.rolling(4, min_periods=1).mean().div(12))
+    def make_season_stats_chart(self, gw_range, y_axis_option):
+        ### Traces for every gameweek are built once, gw_range only sets the axes
+        fig = figure_cache.get_default_figure_cache().get_figure(
+            key=(
+                self.bootstrap_static_url,
+                self.leagueID,
+                self.data_version,
+                "season_stats_chart",
+                self.what_if_gw,
+                y_axis_option,
+            ),
+            make_fig=lambda: self._make_season_stats_fig(y_axis_option),
+        )
+        season_stats_df = self.get_season_stats_view()
+        y_range = figure_cache.get_axis_range(
+            season_stats_df.loc[
+                season_stats_df["GW"].between(gw_range[0], gw_range[1]), y_axis_option
+            ]
+        )
+        if y_range is not None and y_axis_option in reversed_y_axis_list:
+            y_range = y_range[::-1]
+        fig.update_xaxes(range=figure_cache.get_axis_range(gw_range))
+        fig.update_yaxes(range=y_range)
+        return fig
 
-        return recalc_season_stats_df
+    def make_similarity_heatmap(self, gw_range):
+        return figure_cache.get_default_figure_cache().get_figure(
+            key=(
+                self.bootstrap_static_url,
+                self.leagueID,
+                self.data_version,
+                "similarity_heatmap",
+                self.what_if_gw,
+                gw_range,
+            ),
+            make_fig=lambda: self._make_similarity_heatmap(
+                self.get_similarity_df(gw_range)
+            ),
+        )
 
-    def _extend_league_teams_df(self, what_if_gw) -> pd.DataFrame:
-        what_if_league_df = self.league_teams_df.copy()
-        what_if_league_df["Manager"] = (
-            what_if_league_df["Manager"].astype(str) + " (what if)"
+    def make_transfers_fig(self):
+        return figure_cache.get_default_figure_cache().get_figure(
+            key=(
+                self.bootstrap_static_url,
+                self.leagueID,
+                self.data_version,
+                "transfers_fig",
+            ),
+            make_fig=self._make_transfers_fig,
         )
-        gw_to_repeat = what_if_league_df.loc[what_if_league_df["gw"] == what_if_gw, :]
-        repeated_section = pd.concat(
-            [gw_to_repeat] * (self.max_gw - what_if_gw),
-            ignore_index=True,
+
+    def _get_view(self, key, make_view):
+        ### make_view() computed on first use of key, which must hold every input
+        ### it depends on beyond the league data (e.g. what_if_gw, gw_range)
+        ### Entries are (view, nbytes), least recently used evicted first until
+        ### both MAX_CACHED_VIEWS and MAX_CACHED_VIEW_BYTES hold
+        with self._view_lock:
+            if key in self._view_dict:
+                self._view_dict.move_to_end(key)
+                return self._view_dict[key][0]
+        view = make_view()
+        nbytes = get_nbytes(view)
+        if nbytes > MAX_CACHED_VIEW_BYTES:
+            ### Too big to keep at all, recomputed on every use instead
+            return view
+        with self._view_lock:
+            self._view_dict[key] = (view, nbytes)
+            self._view_dict.move_to_end(key)
+            total_nbytes = sum(n for _, n in self._view_dict.values())
+            while (
+                len(self._view_dict) > MAX_CACHED_VIEWS
+                or total_nbytes > MAX_CACHED_VIEW_BYTES
+            ):
+                _, (_, evicted_nbytes) = self._view_dict.popitem(last=False)
+                total_nbytes -= evicted_nbytes
+        return view
+
+    def _make_what_if_views(self, what_if_gw) -> tuple:
+        what_if_season_stats_df = self.what_if_engine.get_season_stats_df(
+            what_if_gw, columns=self.season_stats_df.columns
         )
-        repeated_section["gw"] = np.repeat(
-            list(range(what_if_gw + 1, self.max_gw + 1)),
-            15 * len(self.manager_id_name_dict),
+        what_if_standings_df = self.what_if_engine.get_standings_df(
+            what_if_season_stats_df
         )
-        repeated_section["player_pick_full"] = list(
-            (
-                repeated_section["player_pick"] + repeated_section["gw"].astype(str)
-            ).values
+        similarity_tensor = self.what_if_engine.get_similarity_tensor(
+            self.similarity_tensor, what_if_gw
         )
-        what_if_league_df = pd.concat(
-            [
-                what_if_league_df.loc[what_if_league_df["gw"] <= what_if_gw, :],
-                repeated_section,
-            ]
+        return what_if_season_stats_df, what_if_standings_df, similarity_tensor
+
+    def _make_transfer_plan(self, manager, horizon) -> planner.TransferPlan:
+        ### From the manager's squad, bank and free transfers after max_gw
+        squad = self.league_teams_df.loc[
+            (self.league_teams_df["Manager"] == manager)
+            & (self.league_teams_df["gw"] == self.max_gw),
+            "element",
+        ]
+        manager_stats_df = self.season_stats_df.loc[
+            self.season_stats_df["Manager"] == manager
+        ].sort_values(by="GW")
+        ### "Bank" is in £, now_cost in £0.1m
+        bank = manager_stats_df["Bank"].iloc[-1] / 1e5
+        return planner.get_default_planner().plan(
+            squad.to_numpy(),
+            bank=round(bank),
+            free_transfers=planner.get_free_transfers(
+                manager_stats_df.loc[manager_stats_df["GW"] > 1, "Transfers"]
+            ),
+            expected_points_df=self.get_expected_points_df(horizon),
+            elements_df=self._get_bootstrap_registry().elements_df,
         )
-        extended_league_teams_df = pd.concat([self.league_teams_df, what_if_league_df])
-        return extended_league_teams_df
 
-    def make_season_stats_chart(self, gw_range, y_axis_option):
-        if self.season_stats_df["Manager"].str.contains("what if").any():
-            colour_list = combined_plotly_colour_list
-        else:
-            colour_list = hex_plotly_colour_list
-        fig = px.line(
-            self.season_stats_df[
-                self.season_stats_df["GW"].between(gw_range[0], gw_range[1])
+    def _make_simulation(self, n_sims, seed) -> simulator.SimulationResult:
+        ### Final standings of the remaining gameweeks, squads held as picked in max_gw
+        managers = self.standings_df["Manager"].to_numpy()
+        squad_weights, points_history = simulator.get_simulation_inputs(
+            self.league_teams_df, self.players_df, managers, self.max_gw
+        )
+        return simulator.get_default_simulator().simulate(
+            managers,
+            self.standings_df["Total Points"].to_numpy(),
+            squad_weights,
+            points_history,
+            n_gws=self.player_gw_store.n_gws - self.max_gw,
+            n_sims=n_sims,
+            seed=seed,
+        )
+
+    def _make_standings_view(self) -> pd.DataFrame:
+        standings_df = self.standings_df
+        if self.what_if_standings_df is not None:
+            standings_df = pd.concat(
+                [standings_df, self.what_if_standings_df], ignore_index=True
+            ).sort_values(by="Rank", kind="stable")
+        season_stats_df = self.get_season_stats_view()
+        return standings_df.merge(
+            season_stats_df.loc[
+                season_stats_df["GW"] == self.max_gw, ["Manager", "Form"]
             ],
-            x="GW",
-            y=y_axis_option,
-            color="Manager",
-            color_discrete_sequence=colour_list,
-            markers=True,
+            how="inner",
+            on="Manager",
         )
-        return fig
 
-    def make_similarity_heatmap(self, sim_df):
+    def _make_venn_word_lists(self, manager1, manager2, gw) -> tuple:
+        manager1_picks = self.get_pick_codes(manager1, gw)
+        manager2_picks = self.get_pick_codes(manager2, gw)
+        ### Compare integer pick codes, names are only needed for display
+        return tuple(
+            picks_builder.get_pick_labels(
+                picks, self.player_id_name_dict, hide_played=True
+            )
+            for picks in [
+                np.setdiff1d(manager1_picks, manager2_picks),
+                np.intersect1d(manager1_picks, manager2_picks),
+                np.setdiff1d(manager2_picks, manager1_picks),
+            ]
+        )
+
+    def _make_similarity_heatmap(self, sim_df):
+        ### plotly.express is imported where used, it is slow to load
+        import plotly.express as px
+
         heatmap_colourscale = [
             [0, "rgba(61,23,90,255)"],
             [0.35, "rgba(70,160,246,255)"],
@@ -352,8 +510,27 @@ class LeagueData:
         )
         return fig
 
-    @st.cache_data(ttl=3600, show_spinner=False)
-    def make_transfers_fig(self):
+    def _make_season_stats_fig(self, y_axis_option):
+        import plotly.express as px
+
+        season_stats_df = self.get_season_stats_view()
+        if self.what_if_season_stats_df is not None:
+            colour_list = combined_plotly_colour_list
+        else:
+            colour_list = hex_plotly_colour_list
+        fig = px.line(
+            season_stats_df,
+            x="GW",
+            y=y_axis_option,
+            color="Manager",
+            color_discrete_sequence=colour_list,
+            markers=True,
+        )
+        return fig
+
+    def _make_transfers_fig(self):
+        import plotly.express as px
+
         fig = (
             px.scatter(
                 self.transfers_df,
@@ -391,53 +568,55 @@ class LeagueData:
                 showlegend=True, yaxis_type="category", hovermode="x unified"
             )
         )
-        for gw in range(1, 39):
-            fig.add_vline(
-                x=datetime.datetime.strptime(
-                    self.bootstrap_static_events_df.loc[gw - 1, "deadline_time"], "%Y-%m-%dT%H:%M:%SZ"  # type: ignore
-                ).timestamp()
-                * 1000,
-                line_width=1,
-                line_dash="dash",
-                line_color="red",
-                annotation_text=f"Gameweek {gw} Deadline",
-                annotation_position="top",
+        ### Every deadline line and label in one layout update
+        deadline_time_list = self.bootstrap_static_events_df["deadline_time"].tolist()
+        fig.update_layout(
+            **figure_cache.get_vline_layout(
+                x_list=[
+                    datetime.datetime.strptime(
+                        deadline_time, "%Y-%m-%dT%H:%M:%SZ"
+                    ).timestamp()
+                    * 1000
+                    for deadline_time in deadline_time_list
+                ],
+                text_list=[
+                    f"Gameweek {gw} Deadline"
+                    for gw in range(1, len(deadline_time_list) + 1)
+                ],
+                width=1,
+                dash="dash",
+                color="red",
             )
+        )
         return fig
 
-    @st.cache_data(ttl=3600, show_spinner=False)
+    def _update_player_gw_store(self, gw_list):
+        live_response_json_list = self._fetch_batch(
+            self.live_url_template, [{"gw": gw} for gw in gw_list]
+        )
+        for gw, response_json in zip(gw_list, live_response_json_list):
+            self.player_gw_store.add_gameweek(gw, response_json)
+        return None
+
     def _get_players_df(self):
-        all_players_all_gw_list = []
-        for gw in range(1, self.max_gw + 1):
-            response_json = self._get_requests_response(
-                url_template=self.live_url_template, gw=gw
-            )
-            all_players_dict_list = []
-            for result_dict in response_json["elements"]:
-                player_id = result_dict["id"]
-                stats_dict = result_dict["stats"]
-                stats_dict["player_id"] = player_id
-                stats_dict["web_name"] = self.player_id_name_dict[player_id]
-                all_players_dict_list.append(stats_dict)
-            all_players_df = pd.DataFrame(all_players_dict_list)
-            all_players_df["gw"] = gw
-            all_players_all_gw_list.append(all_players_df)
-        players_df = (
-            pd.concat(all_players_all_gw_list)
-            .loc[:, ["player_id", "web_name", "gw", "total_points"]]  # type: ignore
-            .reset_index(drop=True)
+        ### Points per player per gameweek, every other stat stays in player_gw_store
+        players_df = self.player_gw_store.to_frame(stats=["total_points"]).astype(
+            {"player_id": "int64", "gw": "int64", "total_points": "int64"}
+        )
+        players_df.insert(
+            1, "web_name", players_df["player_id"].map(self.player_id_name_dict)
         )
         return players_df
 
-    @st.cache_data(ttl=3600, show_spinner=False)
     def _get_transfers_df(self) -> pd.DataFrame:
         transfers_dfs_list = []
-        for i, (manager_id, manager_name) in enumerate(
-            self.manager_id_name_dict.items()
+        transfers_response_json_list = self._fetch_batch(
+            self.transfers_url_template,
+            [{"manager_id": manager_id} for manager_id in self.manager_id_name_dict],
+        )
+        for (manager_id, manager_name), transfers_response_json in zip(
+            self.manager_id_name_dict.items(), transfers_response_json_list
         ):
-            transfers_response_json = self._get_requests_response(
-                self.transfers_url_template, manager_id=manager_id
-            )
             if not transfers_response_json:
                 continue
             transfers_per_manager_df = pd.DataFrame(transfers_response_json)
@@ -461,110 +640,137 @@ class LeagueData:
         )
         return transfers_df
 
-    @st.cache_data(ttl=3600, show_spinner=False)
-    def _get_teams_dfs(self) -> pd.DataFrame:
-        league_teams_df_list = []
-        league_picks_dict = {}
+    def _get_teams_dfs(self, manager_gw_list=None) -> pd.DataFrame:
+        ### Defaults to every manager x gameweek selection
+        if manager_gw_list is None:
+            manager_gw_list = [
+                (manager_id, gw)
+                for manager_id in self.manager_id_name_dict
+                for gw in range(1, self.max_gw + 1)
+            ]
+        n_managers = len(set(manager_id for manager_id, _ in manager_gw_list))
+        ### Nothing to fetch, an empty frame with the usual columns and dtypes
+        if n_managers == 0:
+            return picks_builder.PicksBatchBuilder(n_teams=0).build()
+        n_gws = max(1, len(manager_gw_list) // n_managers)
         managers_completed = st.empty()
         gws_completed = st.empty()
         percent_completed = st.empty()
         prog_bar = st.progress(0)
-        for i, (manager_id, manager_name) in enumerate(
-            self.manager_id_name_dict.items()
-        ):
-            league_picks_dict[manager_name] = []
+
+        def update_progress(n_completed, n_total):
             managers_completed.text(
-                "({0}/{1}) Managers completed".format(i, len(self.manager_id_name_dict))
+                "({0}/{1}) Managers completed".format(n_completed // n_gws, n_managers)
+            )
+            gws_completed.text(
+                "({0}/{1}) Gameweeks completed".format(n_completed % n_gws, n_gws)
+            )
+            percent_completed.text("{0:.3f} %".format(100 * (n_completed / n_total)))
+            prog_bar.progress(n_completed / n_total)
+
+        ### Fetch all selections in one batch
+        team_selection_response_json_list = self._fetch_batch(
+            self.picks_url_template,
+            [
+                {"manager_id": manager_id, "gw": gw}
+                for manager_id, gw in manager_gw_list
+            ],
+            progress_callback=update_progress,
+        )
+
+        ### Collect raw picks column-wise, derive everything else in one pass
+        builder = picks_builder.PicksBatchBuilder(n_teams=len(manager_gw_list))
+        for (manager_id, gw), team_selection_response_json in zip(
+            manager_gw_list, team_selection_response_json_list
+        ):
+            builder.add(
+                self.manager_id_name_dict[manager_id],
+                gw,
+                team_selection_response_json["picks"],
             )
-            for j, gw in enumerate(range(1, self.max_gw + 1)):
-                team_selection_response_json = self._get_requests_response(
-                    self.picks_url_template, manager_id=manager_id, gw=gw
-                )
-                picks_df = pd.DataFrame(team_selection_response_json["picks"])
-                picks_df["player_name"] = picks_df["element"].map(
-                    self.player_id_name_dict
-                )
-                picks_df["Manager"] = manager_name
-                picks_df["gw"] = gw
-                picks_df["status"] = np.where(
-                    (picks_df["is_captain"] == True) & (picks_df["multiplier"] == 2),
-                    "c",
-                    np.where(
-                        (picks_df["is_captain"] == True)
-                        & (picks_df["multiplier"] == 3),
-                        "tc",
-                        np.where(
-                            picks_df["is_vice_captain"] == True,
-                            "v",
-                            np.where(
-                                (picks_df["multiplier"] == 0)
-                                | (picks_df["position"].isin([12, 13, 14, 15])),
-                                "b",
-                                "p",
-                            ),
-                        ),
-                    ),
-                )
-                picks_df["player_pick"] = list(
-                    (
-                        picks_df["player_name"]
-                        + " ("
-                        + picks_df["status"].astype(str)
-                        + ")"
-                    ).values
-                )
-                picks_df["player_pick_full"] = list(
-                    (picks_df["player_pick"] + picks_df["gw"].astype(str)).values
-                )
-                league_teams_df_list.append(picks_df)
-                gws_completed.text(
-                    "({0}/{1}) Gameweeks completed".format(j, self.max_gw)
-                )
-                percent_completed.text(
-                    "{0:.3f} %".format(
-                        100
-                        * (
-                            ((i * self.max_gw) + (j + 1))
-                            / (len(self.manager_id_name_dict) * self.max_gw)
-                        )
-                    )
-                )
-                prog_bar.progress(
-                    ((i * self.max_gw) + (j + 1))
-                    / (len(self.manager_id_name_dict) * self.max_gw)
-                )
 
         managers_completed.empty()
         gws_completed.empty()
         percent_completed.empty()
         prog_bar.empty()
 
-        league_teams_df = pd.concat(league_teams_df_list).reset_index(drop=True)
+        league_teams_df = builder.build()
         return league_teams_df
 
-    @st.cache_data(ttl=3600, show_spinner=False)
+    def _refresh_similarity_tensor(self, snapshot) -> similarity.SimilarityTensor:
+        similarity_tensor = snapshot["similarity_tensor"]
+        ### Manager axes follow the (sorted) names, any change means a rebuild
+        managers = sorted(self.league_teams_df["Manager"].unique())
+        if similarity_tensor.managers != managers:
+            return similarity.SimilarityTensor.from_league_teams_df(
+                self.league_teams_df
+            )
+        similarity_tensor.update(
+            self.league_teams_df, gws=range(snapshot["max_gw"] + 1, self.max_gw + 1)
+        )
+        return similarity_tensor
+
     def _get_season_stats_df(self) -> pd.DataFrame:
+        ### Add "Rank", "Total" columns and "Form"
+        return derived_metrics.add_derived_metrics(self._get_raw_season_stats_df())
+
+    def _refresh_season_stats_df(self, snapshot, refresh_from_gw) -> pd.DataFrame:
+        raw_season_stats_df = self._get_raw_season_stats_df()
+        prev_season_stats_df = snapshot["season_stats_df"]
+        prev_manager_ids = list(snapshot["manager_id_name_dict"])
+
+        ### Rows of known managers in settled gameweeks keep their derived columns
+        reused_df = prev_season_stats_df.loc[
+            prev_season_stats_df["ID"].isin(list(self.manager_id_name_dict))
+            & (prev_season_stats_df["GW"] < refresh_from_gw)
+        ]
+        reused_df = reused_df.assign(
+            Manager=reused_df["ID"].map(self.manager_id_name_dict)
+        ).sort_values(by=["Manager", "GW"], kind="stable")
+        new_df = raw_season_stats_df.loc[
+            ~(
+                raw_season_stats_df["ID"].isin(prev_manager_ids)
+                & (raw_season_stats_df["GW"] < refresh_from_gw)
+            )
+        ]
+
+        ### A change of membership changes every gameweek's ranks
+        if set(prev_manager_ids) != set(self.manager_id_name_dict):
+            return derived_metrics.add_derived_metrics(
+                pd.concat([reused_df[raw_season_stats_df.columns], new_df])
+            )
+        season_stats_df = reused_df
+        for gw in sorted(new_df["GW"].unique()):
+            season_stats_df = derived_metrics.append_gameweek(
+                season_stats_df, new_df.loc[new_df["GW"] == gw]
+            )
+        return season_stats_df
+
+    def _get_raw_season_stats_df(self) -> pd.DataFrame:
         season_stats_list = []
         managers_completed = st.empty()
         percent_completed = st.empty()
         prog_bar = st.progress(0)
-        for i, (manager_id, manager_name) in enumerate(
-            self.manager_id_name_dict.items()
-        ):
-            history_response_json = self._get_requests_response(
-                self.history_url_template, manager_id=manager_id
+
+        def update_progress(n_completed, n_total):
+            managers_completed.text(
+                "({0}/{1}) Managers completed".format(n_completed, n_total)
             )
+            percent_completed.text("{0:.3f} %".format(100 * (n_completed / n_total)))
+            prog_bar.progress(n_completed / n_total)
+
+        history_response_json_list = self._fetch_batch(
+            self.history_url_template,
+            [{"manager_id": manager_id} for manager_id in self.manager_id_name_dict],
+            progress_callback=update_progress,
+        )
+        for (manager_id, manager_name), history_response_json in zip(
+            self.manager_id_name_dict.items(), history_response_json_list
+        ):
             season_stats_per_manager_df = pd.DataFrame(history_response_json["current"])
             season_stats_per_manager_df["ID"] = manager_id
             season_stats_per_manager_df["Manager"] = manager_name
             season_stats_list.append(season_stats_per_manager_df)
-            managers_completed.text(
-                "({0}/{1}) Managers completed".format(i, len(self.manager_id_name_dict))
-            )
-            percent_completed.text(
-                "{0:.3f} %".format(100 * ((i + 1) / len(self.manager_id_name_dict)))
-            )
-            prog_bar.progress((i + 1) / len(self.manager_id_name_dict))
         managers_completed.empty()
         percent_completed.empty()
         prog_bar.empty()
@@ -576,24 +782,8 @@ class LeagueData:
         ### Divide by 10
         season_stats_df["Bank"] = season_stats_df["Bank"] * 1e5
         season_stats_df["Value"] = season_stats_df["Value"] * 1e5
-        ### Add league rank as "Rank"
-        season_stats_df["Rank"] = np.nan
-        season_stats_df["Rank"] = season_stats_df.groupby("GW")["Total Points"].rank(
-            method="min", ascending=False
-        )
-        ### Add "Total" columns
-        for col in ["Transfers", "Transfer Costs", "Points on Bench"]:
-            season_stats_df[f"Total {col}"] = season_stats_df.groupby("Manager")[
-                col
-            ].cumsum()
-        ### Add "Form" column
-        season_stats_df["Form"] = season_stats_df.groupby("Manager")[
-            "Points"
-        ].transform(lambda s: s.rolling(4, min_periods=1).mean().div(12))
-
-        return season_stats_df.sort_values(by=["Manager", "GW"])
-
-    @st.cache_data
+        return season_stats_df
+
     def _get_league_name_and_standings(self) -> tuple:
         fpl_league_response_json = self._get_requests_response(
             self.standings_url_template, leagueID=self.leagueID
@@ -604,18 +794,122 @@ class LeagueData:
         ).rename(columns=col_name_change_dict)
         return league_name, standings_df
 
-    @st.cache_data
-    def _get_player_id_name_lookup(self) -> dict:
-        bootstrap_static_response = self._get_requests_response(
-            self.bootstrap_static_url, kwars={}
+    def _get_bootstrap_registry(self) -> bootstrap.BootstrapRegistry:
+        return bootstrap.get_registry(self.bootstrap_static_url)
+
+    def _sort_league_teams_df(self, league_teams_df) -> pd.DataFrame:
+        ### Same manager-major, gameweek-minor order as a full build
+        manager_order = {
+            name: i for i, name in enumerate(self.manager_id_name_dict.values())
+        }
+        return (
+            league_teams_df.assign(
+                manager_order=league_teams_df["Manager"].map(manager_order)
+            )
+            .sort_values(by=["manager_order", "gw"], kind="stable")
+            .drop(columns="manager_order")
+            .reset_index(drop=True)
+        )
+
+    def _get_snapshot_key(self) -> str:
+        return league_snapshot.get_snapshot_key(
+            self.leagueID,
+            [
+                self.standings_url_template,
+                self.history_url_template,
+                self.picks_url_template,
+                self.transfers_url_template,
+                self.bootstrap_static_url,
+                self.live_url_template,
+            ],
         )
-        elements_df = pd.DataFrame(bootstrap_static_response["elements"])
-        player_id_name_dict = pd.Series(
-            elements_df["web_name"].values, index=elements_df["id"]
-        ).to_dict()
-        return player_id_name_dict
+
+    def _load_snapshot(self):
+        snapshot = league_snapshot.load_snapshot(self._get_snapshot_key())
+        if snapshot is None:
+            return None
+        ### A snapshot from a previous season is of no use
+        if (
+            snapshot["season_start"]
+            != self.bootstrap_static_events_df.loc[0, "deadline_time"]
+        ):
+            return None
+        return snapshot
+
+    def _save_snapshot(self):
+        ### Last gameweek up to which every gameweek is finished
+        finished = (
+            self.bootstrap_static_events_df.sort_values(by="id")["finished"]
+            .astype(bool)
+            .values[: self.max_gw]
+        )
+        stable_gw = int(np.argmin(finished)) if not finished.all() else len(finished)
+        snapshot = {
+            name: getattr(self, name) for name in league_snapshot.SNAPSHOT_NAMES
+        }
+        snapshot.update(
+            max_gw=int(self.max_gw),
+            stable_gw=stable_gw,
+            manager_id_name_dict=self.manager_id_name_dict,
+            season_start=self.bootstrap_static_events_df.loc[0, "deadline_time"],
+        )
+        ### Only an optimisation, an unwritable cache directory must not break the app
+        try:
+            league_snapshot.save_snapshot(self._get_snapshot_key(), snapshot)
+        except OSError:
+            pass
+        return None
+
+    def _fetch_batch(self, url_template, kwargs_list, progress_callback=None) -> list:
+        return fetcher.ConcurrentFetcher(
+            self._get_requests_response, max_concurrency=self.max_concurrency
+        ).fetch_all(url_template, kwargs_list, progress_callback=progress_callback)
 
     def _get_requests_response(self, url_template, **kwargs) -> dict:
-        response = requests.get(url_template.format(**kwargs))
-        response_json = response.json()
-        return response_json
+        return utils.get_requests_response(
+            url_template, ttl=self._get_response_ttl(url_template, kwargs), **kwargs
+        )
+
+    def _get_response_ttl(self, url_template, kwargs):
+        ### Picks never change once the deadline has passed,
+        ### nor live points once the gameweek is finished
+        if "gw" not in kwargs or not hasattr(self, "bootstrap_static_events_df"):
+            return response_cache.DEFAULT_TTL
+        event = self.bootstrap_static_events_df.loc[
+            self.bootstrap_static_events_df["id"] == kwargs["gw"]
+        ]
+        if event.empty:
+            return response_cache.DEFAULT_TTL
+        if url_template == self.picks_url_template:
+            deadline_time = pd.to_datetime(event["deadline_time"].iloc[0], utc=True)
+            if deadline_time < pd.Timestamp.now(tz="UTC"):
+                return response_cache.KEEP_FOREVER
+        elif url_template == self.live_url_template:
+            if bool(event["finished"].iloc[0]):
+                return response_cache.KEEP_FOREVER
+        return response_cache.DEFAULT_TTL
+
+
+#################
+### Functions ###
+#################
+
+
+def get_nbytes(obj, depth=0) -> int:
+    """
+    Approximate memory held by a derived view: the buffers of its arrays and
+    frames, summed through tuples, lists, dicts and the attributes of the
+    result objects (SimilarityTensor, SquadSolution, ...) holding them.
+    """
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=True, deep=True)))
+    if depth < 3:
+        if isinstance(obj, (tuple, list)):
+            return sum(get_nbytes(item, depth + 1) for item in obj)
+        if isinstance(obj, dict):
+            return sum(get_nbytes(value, depth + 1) for value in obj.values())
+        if hasattr(obj, "__dict__"):
+            return sum(get_nbytes(value, depth + 1) for value in vars(obj).values())
+    return sys.getsizeof(obj)
@@ -0,0 +1,83 @@
+import os
+import hashlib
+import tempfile
+import pandas as pd
+
+
+#################
+### Constants ###
+#################
+
+
+root_dir_path = os.path.dirname(os.path.realpath(__file__))
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(root_dir_path, ".fpl_cache", "snapshots")
+### Bump whenever the layout of a snapshotted attribute changes
+SNAPSHOT_VERSION = 3
+SNAPSHOT_NAMES = [
+    "season_stats_df",
+    "league_teams_df",
+    "players_df",
+    "transfers_df",
+    "player_gw_store",
+    "similarity_tensor",
+]
+
+
+#################
+### Functions ###
+#################
+
+
+def get_snapshot_key(leagueID, url_templates) -> str:
+    """
+    Snapshots are keyed by league and by the API they were built from,
+    so a league loaded from a stand-in server never mixes with the real one.
+    """
+    key_str = "|".join([str(leagueID)] + [str(u) for u in url_templates])
+    return "league_{0}_{1}".format(
+        leagueID, hashlib.sha1(key_str.encode()).hexdigest()[:12]
+    )
+
+
+def save_snapshot(key, snapshot, snapshot_dir=None):
+    """
+    snapshot is a dict holding the SNAPSHOT_NAMES attributes plus
+    "max_gw" (last gameweek built), "stable_gw" (last gameweek up to which
+    every gameweek is finished), "manager_id_name_dict" (league members at
+    build time) and "season_start" (first deadline, telling seasons apart).
+    Written to a temporary file of its own first, so concurrent saves of a
+    league never interleave and a reader only ever sees a whole snapshot.
+    """
+    snapshot_dir = snapshot_dir or DEFAULT_SNAPSHOT_DIR
+    snapshot = dict(snapshot, version=SNAPSHOT_VERSION)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, key + ".pkl")
+    with tempfile.NamedTemporaryFile(
+        dir=snapshot_dir, prefix=key + ".", suffix=".tmp", delete=False
+    ) as f:
+        tmp_path = f.name
+    try:
+        pd.to_pickle(snapshot, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return None
+
+
+def load_snapshot(key, snapshot_dir=None):
+    snapshot_dir = snapshot_dir or DEFAULT_SNAPSHOT_DIR
+    path = os.path.join(snapshot_dir, key + ".pkl")
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = pd.read_pickle(path)
+    except Exception:
+        ### A corrupt or incompatible snapshot just means a full rebuild
+        return None
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    if any(name not in snapshot for name in SNAPSHOT_NAMES):
+        return None
+    return snapshot
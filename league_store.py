@@ -0,0 +1,139 @@
+import time
+import threading
+import collections
+import concurrent.futures
+import bootstrap
+
+
+#################
+### Constants ###
+#################
+
+
+DEFAULT_MAX_LEAGUES = 8
+LIVE_DATA_VERSION_TTL = 3600  # seconds, while a gameweek is still being scored
+
+
+###############
+### Classes ###
+###############
+
+
+class LeagueStore(object):
+    def __init__(self, max_leagues=DEFAULT_MAX_LEAGUES):
+        """
+        Arguments:
+        ----------
+            max_leagues: int
+                number of built leagues kept in memory, least recently used dropped first
+
+        Returns:
+        --------
+            None
+
+        """
+        self.max_leagues = int(max_leagues)
+        self.builds = 0
+        self.hits = 0
+        self.waits = 0
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # (league_key, data_version) -> obj
+        self._inflight = {}  # (league_key, data_version) -> Future
+
+    def get(self, league_key, data_version, build_fn):
+        """
+        Return the object built by build_fn() for (league_key, data_version).
+        Only one build per key runs at a time, concurrent callers for the
+        same key block until it finishes and then share its result.
+        """
+        key = (league_key, data_version)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            future = self._inflight.get(key)
+            is_builder = future is None
+            if is_builder:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+            else:
+                self.waits += 1
+
+        if not is_builder:
+            return future.result()
+
+        try:
+            obj = build_fn()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            ### A newer data version replaces the old one
+            for stale_key in [k for k in self._entries if k[0] == league_key]:
+                del self._entries[stale_key]
+            self._entries[key] = obj
+            while len(self._entries) > self.max_leagues:
+                self._entries.popitem(last=False)
+            self.builds += 1
+        future.set_result(obj)
+        return obj
+
+    def is_building(self, league_key, data_version) -> bool:
+        with self._lock:
+            return (league_key, data_version) in self._inflight
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "leagues": len(self._entries),
+                "in_flight": len(self._inflight),
+                "builds": self.builds,
+                "hits": self.hits,
+                "waits": self.waits,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return None
+
+
+#################
+### Functions ###
+#################
+
+
+def get_data_version(bootstrap_static_url) -> str:
+    """
+    Changes whenever the FPL data behind a league can have changed:
+    a new gameweek starting or finishing, or, while the current gameweek
+    is still being scored, every LIVE_DATA_VERSION_TTL seconds.
+    """
+    events_df = bootstrap.get_registry(bootstrap_static_url).events_df
+    current_events_df = events_df.loc[events_df["is_current"] == True]
+    if current_events_df.empty:
+        return "pre-season"
+    event = current_events_df.iloc[0]
+    data_version = "gw{0}".format(event["id"])
+    if event["finished"] and event["data_checked"]:
+        return data_version + "-final"
+    return data_version + "-live{0}".format(int(time.time() // LIVE_DATA_VERSION_TTL))
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store() -> LeagueStore:
+    """
+    Process-wide store, shared by every Streamlit session.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = LeagueStore()
+    return _default_store
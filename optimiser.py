@@ -0,0 +1,198 @@
+import time
+import numpy as np
+from scipy import sparse
+
+
+#################
+### Constants ###
+#################
+
+
+BUDGET = 1000  # now_cost units, £0.1m
+MAX_PER_CLUB = 3
+XI_SIZE = 11
+BENCH_WEIGHT = 0.1  # value of a benched player's expected points
+DEFAULT_TIME_LIMIT = 10.0  # seconds
+### element_type: squad count, (min, max) in the starting XI
+squad_position_count_dict = {1: 2, 2: 5, 3: 5, 4: 3}
+xi_position_bounds_dict = {1: (1, 1), 2: (3, 5), 3: (2, 5), 4: (1, 3)}
+
+
+###############
+### Classes ###
+###############
+
+
+class SquadSolution(object):
+    def __init__(self, squad_df, expected_points, cost, solve_time, status):
+        """
+        Arguments:
+        ----------
+            squad_df: pd.DataFrame
+                the 15 players with their position, club, price, status
+                ("c", "p" or "b") and expected points
+            expected_points: float
+                expected points of the starting XI, captain doubled
+            cost: int
+                squad cost in now_cost units
+            solve_time: float
+                seconds taken, pruning and solving
+            status: str
+                solver status message
+
+        Returns:
+        --------
+            None
+
+        """
+        self.squad_df = squad_df
+        self.expected_points = expected_points
+        self.cost = cost
+        self.solve_time = solve_time
+        self.status = status
+
+
+#################
+### Functions ###
+#################
+
+
+def optimise_squad(
+    expected_points_df,
+    elements_df,
+    budget=BUDGET,
+    bench_weight=BENCH_WEIGHT,
+    time_limit=DEFAULT_TIME_LIMIT,
+) -> SquadSolution:
+    """
+    Squad, starting XI and captain maximising the XI's expected points over
+    the gameweeks of expected_points_df (player id x gameweek), captain
+    doubled, plus bench_weight times the bench's, under the budget, squad
+    positions, MAX_PER_CLUB and a valid formation. Prices and clubs come
+    from elements_df (bootstrap registry). Solved exactly as a mixed integer
+    program with HiGHS after removing players no optimal squad needs.
+    """
+    ### scipy.optimize is imported where used, it is slow to load
+    from scipy import optimize
+
+    start = time.perf_counter()
+    elements_df = elements_df.loc[expected_points_df.index]
+    points = expected_points_df.sum(axis=1).to_numpy(dtype=np.float64)
+    candidates = get_candidate_mask(points, elements_df)
+    points = points[candidates]
+    element_type = elements_df["element_type"].to_numpy()[candidates]
+    team = elements_df["team"].to_numpy()[candidates]
+    cost = elements_df["now_cost"].to_numpy(dtype=np.float64)[candidates]
+    n_players = len(points)
+
+    ### Variables: squad x[p], starter y[p], captain c[p]
+    x_idx = np.arange(n_players)
+    y_idx = x_idx + n_players
+    c_idx = x_idx + 2 * n_players
+    n_vars = 3 * n_players
+    objective = -np.r_[bench_weight * points, (1 - bench_weight) * points, points]
+
+    ### (variable indices, coefficients, lower, upper) of each constraint row
+    row_spec_list = [(x_idx, cost, -np.inf, budget)]
+    ### Squad positions and clubs
+    for position, count in squad_position_count_dict.items():
+        row_spec_list.append((x_idx[element_type == position], 1, count, count))
+    for club in np.unique(team):
+        row_spec_list.append((x_idx[team == club], 1, -np.inf, MAX_PER_CLUB))
+    ### Starting XI in a valid formation, one captain
+    row_spec_list.append((y_idx, 1, XI_SIZE, XI_SIZE))
+    for position, (lower, upper) in xi_position_bounds_dict.items():
+        row_spec_list.append((y_idx[element_type == position], 1, lower, upper))
+    row_spec_list.append((c_idx, 1, 1, 1))
+    row_matrix = np.zeros((len(row_spec_list), n_vars))
+    for i, (idx, coefs, _, _) in enumerate(row_spec_list):
+        row_matrix[i, idx] = coefs
+    ### Starters are in the squad, the captain starts
+    link_matrix = sparse.vstack(
+        [
+            _get_link_matrix(y_idx, x_idx, n_vars),
+            _get_link_matrix(c_idx, y_idx, n_vars),
+        ]
+    )
+
+    result = optimize.milp(
+        objective,
+        constraints=[
+            optimize.LinearConstraint(
+                sparse.csr_matrix(row_matrix),
+                [spec[2] for spec in row_spec_list],
+                [spec[3] for spec in row_spec_list],
+            ),
+            optimize.LinearConstraint(link_matrix, -np.inf, 0),
+        ],
+        integrality=np.ones(n_vars),
+        bounds=optimize.Bounds(0, 1),
+        options={"time_limit": time_limit},
+    )
+    if result.x is None:
+        raise ValueError("No feasible squad: {0}".format(result.message))
+    solution = np.round(result.x).astype(bool)
+
+    ### Squad by position then expected points, with each player's pick status
+    in_squad = solution[x_idx]
+    order = np.lexsort((-points[in_squad], element_type[in_squad]))
+    squad_idx = np.nonzero(in_squad)[0][order]
+    squad_df = elements_df.loc[
+        expected_points_df.index[candidates][squad_idx],
+        ["web_name", "position", "team_name", "price"],
+    ]
+    squad_df["status"] = np.where(
+        solution[c_idx[squad_idx]],
+        "c",
+        np.where(solution[y_idx[squad_idx]], "p", "b"),
+    )
+    squad_df["Expected Points"] = points[squad_idx]
+    return SquadSolution(
+        squad_df=squad_df,
+        expected_points=float(points @ (solution[y_idx] + solution[c_idx])),
+        cost=int(cost[in_squad].sum()),
+        solve_time=time.perf_counter() - start,
+        status=result.message,
+    )
+
+
+def get_candidate_mask(points, elements_df) -> np.ndarray:
+    """
+    Players an optimal squad may need, points being each player's expected
+    points. A player is dropped when players of the same position that cost
+    no more and are expected to score at least as much come from enough
+    distinct clubs that one of them can always take the dropped player's
+    place: squad count + 4, as at most squad count - 1 of them are already
+    picked and at most four other clubs are full.
+    """
+    element_type = elements_df["element_type"].to_numpy()
+    team = elements_df["team"].to_numpy()
+    cost = elements_df["now_cost"].to_numpy()
+    candidates = np.ones(len(points), dtype=bool)
+    for position, count in squad_position_count_dict.items():
+        members = np.nonzero(element_type == position)[0]
+        ### Best first, ties cheaper first, so every player's dominators come before it
+        members = members[np.lexsort((cost[members], -points[members]))]
+        member_cost = cost[members]
+        ### dominates[d, p]: d comes earlier and costs no more than p
+        dominates = np.triu(member_cost[:, None] <= member_cost[None, :], k=1)
+        club_onehot = np.zeros((len(members), int(team.max()) + 1), dtype=np.int32)
+        club_onehot[np.arange(len(members)), team[members]] = 1
+        n_dominating_clubs = ((dominates.T.astype(np.int32) @ club_onehot) > 0).sum(
+            axis=1
+        )
+        candidates[members] = n_dominating_clubs < count + 4
+    return candidates
+
+
+def _get_link_matrix(idx, upper_idx, n_vars):
+    ### Rows of variable idx[i] - variable upper_idx[i], constrained <= 0
+    n_rows = len(idx)
+    rows = np.arange(n_rows)
+    return sparse.csr_matrix(
+        (
+            np.r_[np.ones(n_rows), -np.ones(n_rows)],
+            (np.r_[rows, rows], np.r_[idx, upper_idx]),
+        ),
+        shape=(n_rows, n_vars),
+    )
@@ -0,0 +1,166 @@
+import operator
+import numpy as np
+import pandas as pd
+
+
+#################
+### Constants ###
+#################
+
+
+PICK_COLUMNS = ["element", "position", "multiplier", "is_captain", "is_vice_captain"]
+PICKS_PER_TEAM = 15
+BENCH_POSITIONS = [12, 13, 14, 15]
+
+### Pick status enum: played, benched, captain, vice-captain, triple captain
+STATUS_LABELS = ["p", "b", "c", "v", "tc"]
+STATUS_P, STATUS_B, STATUS_C, STATUS_V, STATUS_TC = range(len(STATUS_LABELS))
+### A pick is element * N_STATUS_CODES + status, a pick in a gameweek
+### additionally pick * N_GW_CODES + gw
+N_STATUS_CODES = 8
+N_GW_CODES = 64
+
+_pick_getter = operator.itemgetter(*PICK_COLUMNS)
+
+
+###############
+### Classes ###
+###############
+
+
+class PicksBatchBuilder(object):
+    def __init__(self, n_teams, picks_per_team=PICKS_PER_TEAM):
+        """
+        Arguments:
+        ----------
+            n_teams: int
+                expected number of (manager, gameweek) selections, used to
+                preallocate the column arrays (they grow if exceeded)
+            picks_per_team: int
+                expected number of picks per selection
+
+        Returns:
+        --------
+            None
+
+        """
+        capacity = max(1, int(n_teams) * int(picks_per_team))
+        self.n_rows = 0
+        self.pick_array = np.zeros((capacity, len(PICK_COLUMNS)), dtype=np.int64)
+        self.manager_idx_array = np.zeros(capacity, dtype=np.int32)
+        self.gw_array = np.zeros(capacity, dtype=np.int64)
+        self.manager_names = []
+        self._manager_idx_dict = {}
+
+    def add(self, manager_name, gw, picks):
+        """
+        Append one selection, picks being the "picks" list of the picks endpoint.
+        """
+        n_picks = len(picks)
+        if self.n_rows + n_picks > len(self.gw_array):
+            self._grow(self.n_rows + n_picks)
+        if manager_name not in self._manager_idx_dict:
+            self._manager_idx_dict[manager_name] = len(self.manager_names)
+            self.manager_names.append(manager_name)
+
+        rows = slice(self.n_rows, self.n_rows + n_picks)
+        if n_picks:
+            self.pick_array[rows] = [_pick_getter(pick) for pick in picks]
+        self.manager_idx_array[rows] = self._manager_idx_dict[manager_name]
+        self.gw_array[rows] = gw
+        self.n_rows += n_picks
+        return None
+
+    def build(self) -> pd.DataFrame:
+        """
+        One DataFrame for every selection added, with the same columns as
+        the picks endpoint plus Manager, gw, status (STATUS_LABELS index)
+        and pick (get_pick_codes), all numeric but Manager.
+        Display strings come from get_pick_labels when rendering.
+        """
+        n = self.n_rows
+        element = self.pick_array[:n, 0]
+        position = self.pick_array[:n, 1]
+        multiplier = self.pick_array[:n, 2]
+        is_captain = self.pick_array[:n, 3].astype(bool)
+        is_vice_captain = self.pick_array[:n, 4].astype(bool)
+
+        status = get_status_array(position, multiplier, is_captain, is_vice_captain)
+
+        league_teams_df = pd.DataFrame(
+            {
+                "element": element,
+                "position": position,
+                "multiplier": multiplier,
+                "is_captain": is_captain,
+                "is_vice_captain": is_vice_captain,
+            }
+        )
+        league_teams_df["Manager"] = np.array(self.manager_names, dtype=object)[
+            self.manager_idx_array[:n]
+        ]
+        league_teams_df["gw"] = self.gw_array[:n]
+        league_teams_df["status"] = status
+        league_teams_df["pick"] = get_pick_codes(element, status)
+        return league_teams_df
+
+    def _grow(self, min_capacity):
+        capacity = max(min_capacity, 2 * len(self.gw_array))
+        self.pick_array = np.resize(self.pick_array, (capacity, len(PICK_COLUMNS)))
+        self.manager_idx_array = np.resize(self.manager_idx_array, capacity)
+        self.gw_array = np.resize(self.gw_array, capacity)
+        return None
+
+
+#################
+### Functions ###
+#################
+
+
+def get_status_array(position, multiplier, is_captain, is_vice_captain) -> np.ndarray:
+    """
+    Pick status code in one vectorised pass:
+    captain (c), triple captain (tc), vice-captain (v), benched (b) or played (p).
+    Conditions are checked in that order.
+    """
+    return np.select(
+        [
+            is_captain & (multiplier == 2),
+            is_captain & (multiplier == 3),
+            is_vice_captain,
+            (multiplier == 0) | np.isin(position, BENCH_POSITIONS),
+        ],
+        [STATUS_C, STATUS_TC, STATUS_V, STATUS_B],
+        default=STATUS_P,
+    ).astype(np.int8)
+
+
+def get_pick_codes(element, status) -> np.ndarray:
+    return np.asarray(element, dtype=np.int32) * N_STATUS_CODES + np.asarray(
+        status, dtype=np.int32
+    )
+
+
+def get_pick_gw_codes(pick, gw) -> np.ndarray:
+    """
+    Picks that are only equal within the same gameweek.
+    """
+    return np.asarray(pick, dtype=np.int64) * N_GW_CODES + np.asarray(gw)
+
+
+def get_pick_labels(pick, player_id_name_dict, hide_played=False) -> list:
+    """
+    Display strings of pick codes, e.g. "Salah (c)". Players just
+    played (p) are labelled by name alone if hide_played. A player missing
+    from player_id_name_dict (e.g. added after the bootstrap snapshot) is
+    labelled by element id.
+    """
+    element, status = np.divmod(np.asarray(pick, dtype=np.int64), N_STATUS_CODES)
+    status_suffixes = np.array(
+        [" ({0})".format(label) for label in STATUS_LABELS], dtype=object
+    )
+    if hide_played:
+        status_suffixes[STATUS_P] = ""
+    element = pd.Series(element)
+    names = element.map(player_id_name_dict).fillna(element.astype(str))
+    return list(names + status_suffixes[status])
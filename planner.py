@@ -0,0 +1,460 @@
+import os
+import time
+import itertools
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import optimiser
+
+
+#################
+### Constants ###
+#################
+
+
+HIT_COST = 4
+MAX_FREE_TRANSFERS = 5
+MAX_TRANSFERS_PER_GW = 2
+DEFAULT_BEAM_WIDTH = 32
+DOUBLE_TRANSFER_CANDIDATES = 24  # best single transfers per state paired into doubles
+DEFAULT_MAX_WORKERS = min(4, os.cpu_count() or 1)
+PARALLEL_MIN_SQUADS = 20000  # smaller batches are evaluated in-process
+### Squad slots by position: 2 GKP, 5 DEF, 5 MID, 3 FWD
+slot_position_array = np.repeat(
+    list(optimiser.squad_position_count_dict),
+    list(optimiser.squad_position_count_dict.values()),
+)
+slot_block_list = [
+    np.nonzero(slot_position_array == position)[0]
+    for position in optimiser.squad_position_count_dict
+]
+plan_col_list = [
+    "GW",
+    "Transfers Out",
+    "Transfers In",
+    "Transfers",
+    "Free Transfers",
+    "Hit",
+    "Expected Points",
+    "Bank",
+]
+
+
+###############
+### Classes ###
+###############
+
+
+class TransferPlan(object):
+    def __init__(self, plan_df, expected_points, hold_expected_points, stats):
+        """
+        Arguments:
+        ----------
+            plan_df: pd.DataFrame
+                one row per gameweek: transfers, free transfers available,
+                hit taken, expected points of the best XI and bank (£m) after
+            expected_points: float
+                net expected points of the plan over the horizon, hits deducted
+            hold_expected_points: float
+                expected points of keeping the current squad
+            stats: dict
+                search statistics: squads evaluated, seconds taken and
+                squads evaluated per second
+
+        Returns:
+        --------
+            None
+
+        """
+        self.plan_df = plan_df
+        self.expected_points = expected_points
+        self.hold_expected_points = hold_expected_points
+        self.stats = stats
+
+
+class TransferPlanner(object):
+    def __init__(self, beam_width=DEFAULT_BEAM_WIDTH, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Arguments:
+        ----------
+            beam_width: int
+                transfer sequences kept after each gameweek, best first
+            max_workers: int
+                processes evaluating candidate squads; a value of 1 (or less)
+                evaluates them in-process
+
+        Returns:
+        --------
+            None
+
+        """
+        self.beam_width = max(1, int(beam_width))
+        self.max_workers = max(1, int(max_workers))
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def plan(
+        self, squad, bank, free_transfers, expected_points_df, elements_df
+    ) -> TransferPlan:
+        """
+        Transfer sequence over the gameweeks of expected_points_df (player id
+        x gameweek) maximising the expected points of the best XI and captain
+        each gameweek, less HIT_COST for every transfer beyond the free ones.
+        An unused free transfer rolls over, up to MAX_FREE_TRANSFERS.
+
+        squad is the 15 player ids of the current squad and bank the money in
+        the bank, in now_cost units. Players sell for their now_cost, as
+        purchase prices are not public. The search is a beam search over
+        gameweeks of up to MAX_TRANSFERS_PER_GW transfers each, incoming
+        players pruned by optimiser.get_candidate_mask and sequences reaching
+        the same squad with no more points, free transfers or bank dropped.
+        """
+        start = time.perf_counter()
+        elements_df = elements_df.loc[expected_points_df.index]
+        points = expected_points_df.to_numpy(dtype=np.float64)
+        cost = elements_df["now_cost"].to_numpy(dtype=np.int64)
+        team = elements_df["team"].to_numpy(dtype=np.int64)
+        element_type = elements_df["element_type"].to_numpy()
+
+        ### Current squad in slot order, incoming players by position
+        squad_idx = expected_points_df.index.get_indexer(squad)
+        if (squad_idx < 0).any():
+            raise ValueError("squad players missing from expected_points_df")
+        squad_idx = _get_canonical_squads(squad_idx[None, :], element_type)[0]
+        if not np.array_equal(element_type[squad_idx], slot_position_array):
+            raise ValueError("squad must be 15 players in 2/5/5/3 positions")
+        pool = np.nonzero(
+            optimiser.get_candidate_mask(points.sum(axis=1), elements_df)
+        )[0]
+        position_pool_dict = {
+            position: pool[element_type[pool] == position]
+            for position in optimiser.squad_position_count_dict
+        }
+
+        ### State: (squad, bank, free transfers, net points, transfers per gameweek)
+        state_list = [(squad_idx, int(bank), int(free_transfers), 0.0, ())]
+        n_evaluated = 0
+        for t in range(points.shape[1]):
+            future_points = points[:, t:]
+            move_list = []
+            ### Hold and every single transfer of every state
+            for state in state_list:
+                outs, ins = _get_single_transfers(state, position_pool_dict, cost, team)
+                move_list.append((np.r_[-1, outs][:, None], np.r_[-1, ins][:, None]))
+            squads = _apply_transfers(state_list, move_list, element_type)
+            values = self._evaluate(squads, future_points)
+            n_evaluated += len(squads)
+            ### Doubles from each state's best singles
+            double_move_list = []
+            offset = 0
+            for state, (outs, ins) in zip(state_list, move_list):
+                single_values = values[offset + 1 : offset + len(outs)].sum(axis=1)
+                offset += len(outs)
+                double_move_list.append(
+                    _get_double_transfers(
+                        state, outs[1:, 0], ins[1:, 0], single_values, cost, team
+                    )
+                )
+            double_squads = _apply_transfers(state_list, double_move_list, element_type)
+            double_values = self._evaluate(double_squads, future_points)
+            n_evaluated += len(double_squads)
+            state_list = self._select(
+                state_list,
+                [move_list, double_move_list],
+                [squads, double_squads],
+                [values, double_values],
+                cost,
+                t,
+            )
+
+        best_state = state_list[0]
+        hold_points = float(_get_squad_points(squad_idx[None, :], points).sum())
+        search_time = time.perf_counter() - start
+        return TransferPlan(
+            plan_df=_get_plan_df(
+                best_state,
+                squad_idx,
+                int(bank),
+                int(free_transfers),
+                points,
+                expected_points_df.columns,
+                elements_df,
+            ),
+            expected_points=best_state[3],
+            hold_expected_points=hold_points,
+            stats={
+                "squads_evaluated": n_evaluated,
+                "seconds": search_time,
+                "squads_per_second": n_evaluated / search_time,
+            },
+        )
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        return None
+
+    def _evaluate(self, squads, points) -> np.ndarray:
+        ### Serial path
+        if self.max_workers == 1 or len(squads) < PARALLEL_MIN_SQUADS:
+            return _get_squad_points(squads, points)
+
+        ### Parallel path, one chunk of squads per worker
+        with self._lock:
+            if self._executor is None:
+                ### Spawned, not forked, as the Streamlit server is multi-threaded
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            executor = self._executor
+        chunk_list = np.array_split(squads, self.max_workers)
+        return np.concatenate(
+            list(executor.map(_get_squad_points, chunk_list, itertools.repeat(points)))
+        )
+
+    def _select(
+        self, state_list, move_lists, squads_list, values_list, cost, t
+    ) -> list:
+        ### Children of every state, ranked by net points so far plus the
+        ### points of holding their squad for the rest of the horizon
+        parent_list, outs_list, ins_list = [], [], []
+        for move_list in move_lists:
+            for i, (outs, ins) in enumerate(move_list):
+                parent_list.append(np.full(len(outs), i))
+                outs_list.append(
+                    np.pad(
+                        outs,
+                        ((0, 0), (0, MAX_TRANSFERS_PER_GW - outs.shape[1])),
+                        constant_values=-1,
+                    )
+                )
+                ins_list.append(
+                    np.pad(
+                        ins,
+                        ((0, 0), (0, MAX_TRANSFERS_PER_GW - ins.shape[1])),
+                        constant_values=-1,
+                    )
+                )
+        parent = np.concatenate(parent_list)
+        ins = np.concatenate(ins_list)
+        ### Slots out to players out
+        slots = np.concatenate(outs_list)
+        parent_squads = np.stack([state[0] for state in state_list])[parent]
+        outs = np.where(
+            slots >= 0,
+            np.take_along_axis(parent_squads, np.maximum(slots, 0), axis=1),
+            -1,
+        )
+        squads = np.concatenate(squads_list)
+        values = np.concatenate(values_list)
+
+        bank = np.array([state[1] for state in state_list])[parent]
+        free_transfers = np.array([state[2] for state in state_list])[parent]
+        score = np.array([state[3] for state in state_list])[parent]
+        n_transfers = (ins >= 0).sum(axis=1)
+        bank = (
+            bank
+            + np.where(outs >= 0, cost[outs], 0).sum(axis=1)
+            - np.where(ins >= 0, cost[ins], 0).sum(axis=1)
+        )
+        score = (
+            score
+            + values[:, 0]
+            - HIT_COST * np.maximum(n_transfers - free_transfers, 0)
+        )
+        free_transfers = np.minimum(
+            np.maximum(free_transfers - n_transfers, 0) + 1, MAX_FREE_TRANSFERS
+        )
+        key = score + values[:, 1:].sum(axis=1)
+
+        ### Best first, skipping children dominated by a kept child with the same squad
+        kept_list = []
+        kept_dict = {}
+        for i in np.argsort(-key, kind="stable"):
+            squad_key = squads[i].tobytes()
+            if any(
+                free_transfers[i] <= kept_ft and bank[i] <= kept_bank
+                for kept_ft, kept_bank in kept_dict.get(squad_key, [])
+            ):
+                continue
+            kept_dict.setdefault(squad_key, []).append((free_transfers[i], bank[i]))
+            history = state_list[parent[i]][4]
+            if n_transfers[i]:
+                history = history + (
+                    (
+                        t,
+                        tuple(outs[i, : n_transfers[i]]),
+                        tuple(ins[i, : n_transfers[i]]),
+                    ),
+                )
+            kept_list.append(
+                (
+                    squads[i],
+                    int(bank[i]),
+                    int(free_transfers[i]),
+                    float(score[i]),
+                    history,
+                )
+            )
+            if len(kept_list) == self.beam_width:
+                break
+        return kept_list
+
+
+#################
+### Functions ###
+#################
+
+
+def get_free_transfers(transfer_counts) -> int:
+    """
+    Free transfers available for the next gameweek, transfer_counts being
+    the transfers made in each gameweek from GW2 on. One free transfer is
+    added each gameweek, unused ones roll over up to MAX_FREE_TRANSFERS.
+    Wildcards and free hits are not known, so are not accounted for.
+    """
+    free_transfers = 1
+    for n_transfers in transfer_counts:
+        free_transfers = min(
+            max(free_transfers - int(n_transfers), 0) + 1, MAX_FREE_TRANSFERS
+        )
+    return free_transfers
+
+
+_default_planner = None
+_default_planner_lock = threading.Lock()
+
+
+def get_default_planner() -> TransferPlanner:
+    """
+    Process-wide planner, so every Streamlit session shares its worker processes.
+    """
+    global _default_planner
+    with _default_planner_lock:
+        if _default_planner is None:
+            _default_planner = TransferPlanner()
+    return _default_planner
+
+
+def _get_squad_points(squads, points) -> np.ndarray:
+    """
+    Expected points of the best starting XI and captain of each squad
+    (n, 15 slot-ordered player indices) for each gameweek of points
+    (player, gameweek), shape (n, gameweek).
+    """
+    squad_points = np.moveaxis(points[squads], 1, 2)  # (squad, gw, slot)
+    block_points_list = [
+        -np.sort(-squad_points[..., block], axis=-1) for block in slot_block_list
+    ]
+    gkp, defs, mids, fwds = block_points_list
+    ### Formation minimums, then the best four of the remaining outfield players
+    forced = gkp[..., 0] + defs[..., :3].sum(-1) + mids[..., :2].sum(-1) + fwds[..., 0]
+    remaining = np.concatenate([defs[..., 3:], mids[..., 2:], fwds[..., 1:]], axis=-1)
+    flexible = -np.sort(-remaining, axis=-1)[..., :4].sum(-1)
+    ### The best outfield player always starts
+    captain = np.maximum(
+        gkp[..., 0], squad_points[..., len(slot_block_list[0]) :].max(-1)
+    )
+    return forced + flexible + captain
+
+
+def _get_single_transfers(state, position_pool_dict, cost, team) -> tuple:
+    ### (slot out, player in) of every transfer within the bank and club limit
+    squad, bank, _, _, _ = state
+    club_counts = np.bincount(team[squad], minlength=team.max() + 1)
+    in_squad = np.zeros(len(team), dtype=bool)
+    in_squad[squad] = True
+    outs_list, ins_list = [], []
+    for slot, player in enumerate(squad):
+        pool = position_pool_dict[slot_position_array[slot]]
+        ins = pool[
+            ~in_squad[pool]
+            & (cost[pool] <= bank + cost[player])
+            & (
+                club_counts[team[pool]] - (team[pool] == team[player])
+                < optimiser.MAX_PER_CLUB
+            )
+        ]
+        outs_list.append(np.full(len(ins), slot))
+        ins_list.append(ins)
+    return np.concatenate(outs_list), np.concatenate(ins_list)
+
+
+def _get_double_transfers(state, outs, ins, values, cost, team) -> tuple:
+    ### Pairs of the best single transfers, on different slots, within the bank and club limit
+    squad, bank, _, _, _ = state
+    best = np.argsort(-values, kind="stable")[:DOUBLE_TRANSFER_CANDIDATES]
+    i, j = np.triu_indices(len(best), k=1)
+    i, j = best[i], best[j]
+    outs_pair = np.stack([outs[i], outs[j]], axis=1)
+    ins_pair = np.stack([ins[i], ins[j]], axis=1)
+    valid = (outs[i] != outs[j]) & (ins[i] != ins[j])
+    valid &= cost[ins_pair].sum(axis=1) <= bank + cost[squad[outs_pair]].sum(axis=1)
+    ### Club counts after both transfers
+    club_counts = np.bincount(team[squad], minlength=team.max() + 1)
+    for k in range(2):
+        club = team[ins_pair[:, k]]
+        n_club = (
+            club_counts[club]
+            - (team[squad[outs_pair]] == club[:, None]).sum(axis=1)
+            + (team[ins_pair] == club[:, None]).sum(axis=1)
+        )
+        valid &= n_club <= optimiser.MAX_PER_CLUB
+    return outs_pair[valid], ins_pair[valid]
+
+
+def _apply_transfers(state_list, move_list, element_type) -> np.ndarray:
+    ### Squads after each (slots out, players in) move of each state, -1 for none
+    squads_list = []
+    for state, (outs, ins) in zip(state_list, move_list):
+        squads = np.repeat(state[0][None, :], len(outs), axis=0)
+        rows = np.arange(len(outs))
+        for k in range(outs.shape[1]):
+            has_move = outs[:, k] >= 0
+            squads[rows[has_move], outs[has_move, k]] = ins[has_move, k]
+        squads_list.append(squads)
+    if not squads_list:
+        return np.empty((0, len(slot_position_array)), dtype=np.int64)
+    return _get_canonical_squads(np.concatenate(squads_list), element_type)
+
+
+def _get_canonical_squads(squads, element_type) -> np.ndarray:
+    ### Slot order: by position, then player index, so equal squads are equal arrays
+    sort_key = element_type[squads].astype(np.int64) * len(element_type) + squads
+    return np.take_along_axis(squads, np.argsort(sort_key, axis=1), axis=1)
+
+
+def _get_plan_df(state, squad, bank, free_transfers, points, gws, elements_df):
+    ### Replay the transfers of state gameweek by gameweek
+    transfer_dict = {t: (outs, ins) for t, outs, ins in state[4]}
+    web_name = elements_df["web_name"].to_numpy()
+    cost = elements_df["now_cost"].to_numpy()
+    element_type = elements_df["element_type"].to_numpy()
+    row_list = []
+    for t, gw in enumerate(gws):
+        outs, ins = transfer_dict.get(t, ((), ()))
+        squad = np.r_[np.setdiff1d(squad, outs), list(ins)].astype(np.int64)
+        hit = HIT_COST * max(len(ins) - free_transfers, 0)
+        bank += cost[list(outs)].sum() - cost[list(ins)].sum()
+        row_list.append(
+            [
+                gw,
+                ", ".join(web_name[list(outs)]),
+                ", ".join(web_name[list(ins)]),
+                len(ins),
+                free_transfers,
+                hit,
+                _get_squad_points(
+                    _get_canonical_squads(squad[None, :], element_type),
+                    points[:, t : t + 1],
+                )[0, 0],
+                bank / 10,
+            ]
+        )
+        free_transfers = min(max(free_transfers - len(ins), 0) + 1, MAX_FREE_TRANSFERS)
+    return pd.DataFrame(row_list, columns=plan_col_list)
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+
+#################
+### Constants ###
+#################
+
+
+N_GWS = 38
+INITIAL_N_PLAYERS = 800
+DEFAULT_STAT_DTYPE = np.float32  # live stats missing from stat_dtype_dict
+stat_dtype_dict = {
+    "minutes": np.int16,
+    "goals_scored": np.int8,
+    "assists": np.int8,
+    "clean_sheets": np.int8,
+    "goals_conceded": np.int8,
+    "own_goals": np.int8,
+    "penalties_saved": np.int8,
+    "penalties_missed": np.int8,
+    "yellow_cards": np.int8,
+    "red_cards": np.int8,
+    "saves": np.int8,
+    "bonus": np.int8,
+    "bps": np.int16,
+    "influence": np.float32,
+    "creativity": np.float32,
+    "threat": np.float32,
+    "ict_index": np.float32,
+    "starts": np.int8,
+    "expected_goals": np.float32,
+    "expected_assists": np.float32,
+    "expected_goal_involvements": np.float32,
+    "expected_goals_conceded": np.float32,
+    "total_points": np.int16,
+    "in_dreamteam": np.bool_,
+}
+
+
+###############
+### Classes ###
+###############
+
+
+class PlayerGameweekStore(object):
+    def __init__(self, n_players=INITIAL_N_PLAYERS, n_gws=N_GWS):
+        """
+        Arguments:
+        ----------
+            n_players: int
+                initial number of player ids (rows grow if a larger id turns up)
+            n_gws: int
+                number of gameweeks in the season
+
+        Returns:
+        --------
+            None
+
+        Every stat is a dense (player_id, gw) array, row 0 and column 0 unused,
+        so stat_array[player_id, gw] needs no index lookup and the flat
+        offset player_id * (n_gws + 1) + gw addresses the same cell in
+        stat_array.ravel(). Stats are those of stat_dtype_dict plus any other
+        numeric stat a live payload holds, as DEFAULT_STAT_DTYPE.
+        """
+        self.n_gws = int(n_gws)
+        self.stat_array_dict = {
+            stat: np.zeros((n_players + 1, self.n_gws + 1), dtype=dtype)
+            for stat, dtype in stat_dtype_dict.items()
+        }
+        ### Whether the player appeared in that gameweek's live payload
+        self.present = np.zeros((n_players + 1, self.n_gws + 1), dtype=np.bool_)
+        self.gws = set()
+
+    @property
+    def n_players(self) -> int:
+        return self.present.shape[0] - 1
+
+    def add_gameweek(self, gw, live_json):
+        """
+        Parse an event/{gw}/live payload, replacing any data already held for gw.
+        """
+        elements = live_json["elements"]
+        player_ids = np.fromiter(
+            (element["id"] for element in elements), dtype=np.int64, count=len(elements)
+        )
+        if len(player_ids) and player_ids.max() > self.n_players:
+            self._grow(int(player_ids.max()))
+
+        ### One columnar extraction of every stat in the payload
+        stats_df = pd.DataFrame.from_records(
+            [element["stats"] for element in elements]
+        ).apply(pd.to_numeric, errors="coerce")
+        for stat in stats_df.columns:
+            if stat not in self.stat_array_dict and stats_df[stat].notna().any():
+                self.stat_array_dict[stat] = np.zeros(
+                    self.present.shape, dtype=DEFAULT_STAT_DTYPE
+                )
+        stats_df = stats_df.reindex(columns=list(self.stat_array_dict))
+        for stat, stat_array in self.stat_array_dict.items():
+            stat_array[:, gw] = 0
+            stat_array[player_ids, gw] = (
+                stats_df[stat].fillna(0).to_numpy().astype(stat_array.dtype)
+            )
+        self.present[:, gw] = False
+        self.present[player_ids, gw] = True
+        self.gws.add(gw)
+        return None
+
+    def get(self, stat, player_ids=None, gws=None) -> np.ndarray:
+        """
+        (len(player_ids), len(gws)) array of stat, all players/gameweeks by default.
+        """
+        stat_array = self.stat_array_dict[stat]
+        if player_ids is None:
+            player_ids = np.arange(stat_array.shape[0])
+        if gws is None:
+            gws = np.arange(stat_array.shape[1])
+        return stat_array[np.ix_(np.asarray(player_ids), np.asarray(gws))]
+
+    def get_offsets(self, player_ids, gws) -> np.ndarray:
+        return np.asarray(player_ids) * (self.n_gws + 1) + np.asarray(gws)
+
+    def get_by_offset(self, stat, offsets) -> np.ndarray:
+        return self.stat_array_dict[stat].ravel()[offsets]
+
+    def to_frame(self, stats=None) -> pd.DataFrame:
+        """
+        Long (player_id, gw, stats...) DataFrame of every present row,
+        ordered by gameweek then player id.
+        """
+        if stats is None:
+            stats = list(self.stat_array_dict)
+        gw_idx, player_idx = np.nonzero(self.present.T)
+        players_gw_df = pd.DataFrame({"player_id": player_idx, "gw": gw_idx})
+        for stat in stats:
+            players_gw_df[stat] = self.stat_array_dict[stat][player_idx, gw_idx]
+        return players_gw_df
+
+    def memory_usage(self) -> int:
+        return self.present.nbytes + sum(
+            stat_array.nbytes for stat_array in self.stat_array_dict.values()
+        )
+
+    def _grow(self, max_player_id):
+        n_rows = max(max_player_id + 1, 2 * self.present.shape[0])
+        for stat, stat_array in self.stat_array_dict.items():
+            grown_array = np.zeros((n_rows, self.n_gws + 1), dtype=stat_array.dtype)
+            grown_array[: stat_array.shape[0]] = stat_array
+            self.stat_array_dict[stat] = grown_array
+        grown_present = np.zeros((n_rows, self.n_gws + 1), dtype=np.bool_)
+        grown_present[: self.present.shape[0]] = self.present
+        self.present = grown_present
+        return None
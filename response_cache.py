@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+
+#################
+### Constants ###
+#################
+
+
+root_dir_path = os.path.dirname(os.path.realpath(__file__))
+
+DEFAULT_CACHE_DIR = os.path.join(root_dir_path, ".fpl_cache", "responses")
+DEFAULT_TTL = 300  # seconds, for endpoints whose data can still change
+DEFAULT_MAX_BYTES = 512 * 1024**2
+KEEP_FOREVER = None  # ttl for responses that can never change again
+
+
+###############
+### Classes ###
+###############
+
+
+class ResponseCache(object):
+    def __init__(
+        self,
+        cache_dir=DEFAULT_CACHE_DIR,
+        max_bytes=DEFAULT_MAX_BYTES,
+    ):
+        """
+        Arguments:
+        ----------
+            cache_dir: str
+                directory holding one JSON file per cached URL
+            max_bytes: int
+                total size above which the least recently used entries are evicted
+
+        Returns:
+        --------
+            None
+
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index = None  # key -> [size, last_access]
+
+    def get(self, url):
+        """
+        Returns (True, response_json) for a live entry, (False, None) otherwise.
+        """
+        key = self._key(url)
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return False, None
+
+        if entry["expires_at"] is not None and entry["expires_at"] < time.time():
+            self._remove(key)
+            with self._lock:
+                self.expired += 1
+                self.misses += 1
+            return False, None
+
+        ### Touch the file so recency survives a restart
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            index = self._get_index()
+            if key in index:
+                index[key][1] = time.time()
+        return True, entry["response"]
+
+    def set(self, url, response_json, ttl=DEFAULT_TTL):
+        """
+        Store response_json for ttl seconds, or forever if ttl is KEEP_FOREVER.
+        """
+        key = self._key(url)
+        path = self._path(key)
+        expires_at = None if ttl is KEEP_FOREVER else time.time() + ttl
+        data = json.dumps(
+            {"url": url, "expires_at": expires_at, "response": response_json}
+        )
+
+        ### Write atomically, through a temporary file no other thread or
+        ### process shares, so concurrent readers never see a partial file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache_dir, prefix=key + ".", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._get_index()[key] = [len(data), time.time()]
+            self._evict()
+        return None
+
+    def get_or_fetch(self, url, fetch_fn, ttl=DEFAULT_TTL):
+        """
+        Return the cached response for url, calling fetch_fn(url) on a miss.
+        """
+        hit, response_json = self.get(url)
+        if hit:
+            return response_json
+        response_json = fetch_fn(url)
+        self.set(url, response_json, ttl=ttl)
+        return response_json
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self._get_index()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(index),
+                "bytes": sum(size for size, _ in index.values()),
+            }
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._get_index()):
+                self._remove_file(key)
+            self._index = {}
+        return None
+
+    def _get_index(self) -> dict:
+        ### Built lazily from the files left by previous processes
+        if self._index is None:
+            self._index = {}
+            if os.path.isdir(self.cache_dir):
+                for dir_entry in os.scandir(self.cache_dir):
+                    if dir_entry.name.endswith(".json"):
+                        stat = dir_entry.stat()
+                        self._index[dir_entry.name[:-5]] = [
+                            stat.st_size,
+                            stat.st_mtime,
+                        ]
+        return self._index
+
+    def _evict(self):
+        ### Drop least recently used entries until back under 90% of max_bytes
+        index = self._get_index()
+        total_bytes = sum(size for size, _ in index.values())
+        if total_bytes <= self.max_bytes:
+            return None
+        for key, (size, _) in sorted(index.items(), key=lambda item: item[1][1]):
+            self._remove_file(key)
+            del index[key]
+            self.evictions += 1
+            total_bytes -= size
+            if total_bytes <= 0.9 * self.max_bytes:
+                break
+        return None
+
+    def _remove(self, key):
+        with self._lock:
+            self._remove_file(key)
+            self._get_index().pop(key, None)
+        return None
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        return None
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+
+#################
+### Functions ###
+#################
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """
+    Process-wide cache shared by utils.get_requests_response and LeagueData.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+#################
+### Constants ###
+#################
+
+
+N_GWS = 38
+
+
+###############
+### Classes ###
+###############
+
+
+class SimilarityTensor(object):
+    def __init__(self, managers, n_gws=N_GWS):
+        """
+        Arguments:
+        ----------
+            managers: list
+                manager names, the order of the manager axes
+            n_gws: int
+                number of gameweeks in the season
+
+        Returns:
+        --------
+            None
+
+        intersection_array[gw, i, j] is the number of picks managers i and j
+        share in gameweek gw and pick_count_array[gw, i] the number of distinct
+        picks of manager i, so the union of the two is
+        pick_count_array[gw, i] + pick_count_array[gw, j] - intersection_array[gw, i, j].
+        Row 0 is unused. Picks of different gameweeks never match, so any gameweek
+        range is a sum over its rows.
+        """
+        self.managers = list(managers)
+        self.n_gws = int(n_gws)
+        n_managers = len(self.managers)
+        ### A selection has at most 15 picks
+        self.intersection_array = np.zeros(
+            (self.n_gws + 1, n_managers, n_managers), dtype=np.uint8
+        )
+        self.pick_count_array = np.zeros((self.n_gws + 1, n_managers), dtype=np.uint8)
+        self.gws = set()
+
+    @classmethod
+    def from_league_teams_df(cls, league_teams_df, n_gws=N_GWS):
+        similarity_tensor = cls(np.sort(league_teams_df["Manager"].unique()), n_gws)
+        similarity_tensor.update(league_teams_df)
+        return similarity_tensor
+
+    def update(self, league_teams_df, gws=None):
+        """
+        (Re)compute the gameweeks in gws from league_teams_df, every gameweek
+        in it by default. Managers not on the manager axes are ignored.
+        """
+        if gws is None:
+            gws = league_teams_df["gw"].unique()
+        gw_array = league_teams_df["gw"].to_numpy()
+        manager_idx_array = pd.Categorical(
+            league_teams_df["Manager"], categories=self.managers
+        ).codes
+        pick_code_array = league_teams_df["pick"].to_numpy()
+        for gw in gws:
+            gw_mask = (gw_array == gw) & (manager_idx_array >= 0)
+            self.add_gameweek(
+                int(gw), manager_idx_array[gw_mask], pick_code_array[gw_mask]
+            )
+        return None
+
+    def add_gameweek(self, gw, manager_idx_array, pick_code_array):
+        """
+        Replace gameweek gw with the picks pick_code_array[k] of managers
+        manager_idx_array[k], the picks being any non-negative integer codes.
+        """
+        n_managers = len(self.managers)
+        incidence_matrix = sparse.csr_matrix(
+            (
+                np.ones(len(pick_code_array), dtype=np.int32),
+                (manager_idx_array, pick_code_array),
+            ),
+            shape=(n_managers, int(pick_code_array.max(initial=-1)) + 1),
+        )
+        ### Repeated picks were summed, a set holds them once
+        incidence_matrix.data[:] = 1
+        intersection_matrix = (incidence_matrix @ incidence_matrix.T).toarray()
+        self.intersection_array[gw] = intersection_matrix
+        self.pick_count_array[gw] = intersection_matrix.diagonal()
+        self.gws.add(gw)
+        return None
+
+    def get_counts(self, gw_range) -> tuple:
+        """
+        (intersection, union) count matrices over gw_range, either a single
+        gameweek or an inclusive (first, last) pair.
+        """
+        first_gw, last_gw = _get_gw_bounds(gw_range)
+        intersection_matrix = self.intersection_array[first_gw : last_gw + 1].sum(
+            axis=0, dtype=np.int32
+        )
+        pick_counts = self.pick_count_array[first_gw : last_gw + 1].sum(
+            axis=0, dtype=np.int32
+        )
+        union_matrix = pick_counts[:, None] + pick_counts[None, :] - intersection_matrix
+        return intersection_matrix, union_matrix
+
+    def jaccard_sim(self, gw_range) -> pd.DataFrame:
+        """
+        Same DataFrame as utils.jaccard_sim of the managers' picks over gw_range.
+        """
+        intersection_matrix, union_matrix = self.get_counts(gw_range)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            jaccard_matrix = intersection_matrix / union_matrix
+        managers = pd.Index(self.managers, name="Manager")
+        return pd.DataFrame(index=managers, columns=managers, data=jaccard_matrix)
+
+
+#################
+### Functions ###
+#################
+
+
+def _get_gw_bounds(gw_range) -> tuple:
+    if np.ndim(gw_range) == 0:
+        return int(gw_range), int(gw_range)
+    return int(gw_range[0]), int(gw_range[1])
@@ -0,0 +1,248 @@
+import time
+import threading
+import multiprocessing
+import concurrent.futures
+import numpy as np
+import pandas as pd
+import picks_builder
+
+
+#################
+### Constants ###
+#################
+
+
+DEFAULT_N_SIMS = 10000
+DEFAULT_SEED = 0
+DEFAULT_MAX_WORKERS = 1
+BATCH_CELLS = 2**23  # sampled (simulation, player, gameweek) cells per batch
+### Weight of a pick's points in future gameweeks: captains double, bench nothing
+status_weight_array = np.zeros(len(picks_builder.STATUS_LABELS), dtype=np.float32)
+status_weight_array[[picks_builder.STATUS_P, picks_builder.STATUS_V]] = 1
+status_weight_array[[picks_builder.STATUS_C, picks_builder.STATUS_TC]] = 2
+
+
+###############
+### Classes ###
+###############
+
+
+class SimulationResult(object):
+    def __init__(self, position_df, stats):
+        """
+        Arguments:
+        ----------
+            position_df: pd.DataFrame
+                one row per manager: current and mean simulated final total
+                points, then the probability of finishing in each league
+                position (columns 1, 2, ...)
+            stats: dict
+                simulations run, batches, seconds taken and simulations per second
+
+        Returns:
+        --------
+            None
+
+        """
+        self.position_df = position_df
+        self.stats = stats
+
+
+class LeagueSimulator(object):
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, batch_cells=BATCH_CELLS):
+        """
+        Arguments:
+        ----------
+            max_workers: int
+                processes running batches of simulations; a value of 1 (or
+                less) runs them in-process
+            batch_cells: int
+                (simulation, player, gameweek) samples drawn per batch, which
+                bounds the memory a batch takes
+
+        Returns:
+        --------
+            None
+
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.batch_cells = max(1, int(batch_cells))
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def simulate(
+        self,
+        managers,
+        current_points,
+        squad_weights,
+        points_history,
+        n_gws,
+        n_sims=DEFAULT_N_SIMS,
+        seed=DEFAULT_SEED,
+    ) -> SimulationResult:
+        """
+        Probability of each manager finishing in each league position after
+        n_gws more gameweeks, over n_sims simulated seasons.
+
+        current_points (manager,) are the managers' total points, in current
+        league order, which also breaks ties. squad_weights (manager, player)
+        is each player's points weight in each manager's team and
+        points_history (player, past gameweek) the points each player scored,
+        0 when not playing. Every future gameweek a player's points are drawn
+        from one of their own past gameweeks, independently. Simulations run
+        in batches seeded from seed, so results do not depend on max_workers.
+        """
+        start = time.perf_counter()
+        current_points = np.asarray(current_points, dtype=np.float64)
+        ### Players who never scored add nothing
+        has_points = (points_history != 0).any(axis=1)
+        squad_weights = np.asarray(squad_weights, dtype=np.float32)[:, has_points]
+        points_history = np.asarray(points_history, dtype=np.int16)[has_points]
+
+        n_players = points_history.shape[0]
+        batch_size = max(1, self.batch_cells // max(n_players * n_gws, 1))
+        n_batches = -(-n_sims // batch_size)
+        seed_sequence_list = np.random.SeedSequence(seed).spawn(n_batches)
+        batch_size_list = [batch_size] * (n_batches - 1) + [
+            n_sims - batch_size * (n_batches - 1)
+        ]
+        batch_args = (current_points, squad_weights, points_history, n_gws)
+
+        ### Serial path
+        if self.max_workers == 1 or n_batches == 1:
+            result_list = [
+                _simulate_batch(seed_sequence, size, *batch_args)
+                for seed_sequence, size in zip(seed_sequence_list, batch_size_list)
+            ]
+        ### Parallel path
+        else:
+            result_list = list(
+                self._get_executor().map(
+                    _simulate_batch,
+                    seed_sequence_list,
+                    batch_size_list,
+                    *[[arg] * n_batches for arg in batch_args],
+                )
+            )
+        position_counts = sum(counts for counts, _ in result_list)
+        total_points_sum = sum(totals for _, totals in result_list)
+
+        position_df = pd.DataFrame(
+            position_counts / n_sims,
+            index=pd.Index(managers, name="Manager"),
+            columns=np.arange(1, len(managers) + 1),
+        )
+        position_df.insert(0, "Total Points", current_points)
+        position_df.insert(1, "Expected Total Points", total_points_sum / n_sims)
+        search_time = time.perf_counter() - start
+        return SimulationResult(
+            position_df=position_df.reset_index(),
+            stats={
+                "n_sims": n_sims,
+                "n_batches": n_batches,
+                "seconds": search_time,
+                "sims_per_second": n_sims / search_time,
+            },
+        )
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        return None
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                ### Spawned, not forked, as the Streamlit server is multi-threaded
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+
+#################
+### Functions ###
+#################
+
+
+def get_simulation_inputs(league_teams_df, players_df, managers, gw) -> tuple:
+    """
+    (squad_weights, points_history) for LeagueSimulator.simulate: each
+    manager's picks of gameweek gw, rows in managers order, and the points
+    of every picked player in players_df up to gw.
+    """
+    picks_df = league_teams_df.loc[
+        (league_teams_df["gw"] == gw) & league_teams_df["Manager"].isin(managers)
+    ]
+    manager_idx = pd.Index(managers).get_indexer(picks_df["Manager"])
+    player_ids, player_idx = np.unique(picks_df["element"], return_inverse=True)
+    squad_weights = np.zeros((len(managers), len(player_ids)), dtype=np.float32)
+    np.add.at(
+        squad_weights,
+        (manager_idx, player_idx),
+        status_weight_array[picks_df["status"].to_numpy()],
+    )
+    history_df = players_df.loc[
+        players_df["player_id"].isin(player_ids) & (players_df["gw"] <= gw)
+    ]
+    points_history = np.zeros((len(player_ids), gw), dtype=np.int16)
+    points_history[
+        np.searchsorted(player_ids, history_df["player_id"]), history_df["gw"] - 1
+    ] = history_df["total_points"]
+    return squad_weights, points_history
+
+
+_default_simulator = None
+_default_simulator_lock = threading.Lock()
+
+
+def get_default_simulator() -> LeagueSimulator:
+    """
+    Process-wide simulator, shared by every Streamlit session.
+    """
+    global _default_simulator
+    with _default_simulator_lock:
+        if _default_simulator is None:
+            _default_simulator = LeagueSimulator()
+    return _default_simulator
+
+
+def _simulate_batch(
+    seed_sequence, n_sims, current_points, squad_weights, points_history, n_gws
+) -> tuple:
+    """
+    (manager, position) finish counts and summed final total points of
+    n_sims simulations.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    n_managers = len(current_points)
+    n_players, n_past_gws = points_history.shape
+    if n_players and n_past_gws:
+        ### (simulation, gameweek, player) points, each drawn from a random past gameweek
+        past_gw_idx = rng.integers(
+            0, n_past_gws, size=(n_sims, n_gws, n_players), dtype=np.int16
+        )
+        player_offsets = np.arange(n_players, dtype=np.int32) * n_past_gws
+        player_points = points_history.ravel()[player_offsets + past_gw_idx]
+        ### (simulation, manager, gameweek) points
+        manager_points = np.moveaxis(
+            player_points.astype(np.float32) @ squad_weights.T, 1, 2
+        )
+        final_points = current_points + manager_points.sum(axis=2, dtype=np.float64)
+    else:
+        final_points = np.repeat(current_points[None, :], n_sims, axis=0)
+
+    ### League position of every manager in every simulation, ties in current order
+    order = np.argsort(-final_points, axis=1, kind="stable")
+    position = np.empty_like(order)
+    np.put_along_axis(
+        position, order, np.arange(n_managers)[None, :].repeat(n_sims, axis=0), axis=1
+    )
+    position_counts = np.bincount(
+        (np.arange(n_managers)[None, :] * n_managers + position).ravel(),
+        minlength=n_managers * n_managers,
+    ).reshape(n_managers, n_managers)
+    return position_counts, final_points.sum(axis=0)
@@ -0,0 +1,203 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+import autosub
+import bootstrap
+import http_client
+import league_data
+import league_snapshot
+import response_cache
+import what_if
+from benchmarks import standin_server, synthetic
+
+
+#################
+### Constants ###
+#################
+
+
+### 3-4-3 starting XI, then bench goalkeeper, defender, midfielder, forward
+squad_element_type_list = [1, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 1, 2, 3, 4]
+CAPTAIN_SLOT = 5
+VICE_CAPTAIN_SLOT = 6
+
+
+#################
+### Functions ###
+#################
+
+
+def make_team(element_types=None, did_not_play=(), captain_multiplier=2):
+    """
+    (element_type, multiplier, is_vice_captain, played) of one squad, the
+    picks in did_not_play (0-based slots) having played no minutes.
+    """
+    element_type = np.array(element_types or squad_element_type_list)
+    multiplier = np.array([1] * autosub.XI_SIZE + [0] * 4)
+    multiplier[CAPTAIN_SLOT] = captain_multiplier
+    is_vice_captain = np.zeros(15, dtype=np.bool_)
+    is_vice_captain[VICE_CAPTAIN_SLOT] = True
+    played = np.ones(15, dtype=np.bool_)
+    played[list(did_not_play)] = False
+    return element_type, multiplier, is_vice_captain, played
+
+
+def get_xi(multipliers) -> list:
+    ### Slots scoring after substitutions
+    return list(np.flatnonzero(multipliers > 0))
+
+
+def test_everyone_played_keeps_multipliers():
+    team = make_team()
+    np.testing.assert_array_equal(autosub.get_autosub_multipliers(*team), team[1])
+
+
+def test_goalkeeper_replaced_by_bench_goalkeeper():
+    multipliers = autosub.get_autosub_multipliers(*make_team(did_not_play=[0]))
+    assert get_xi(multipliers) == list(range(1, 12))
+
+
+def test_goalkeeper_kept_when_bench_goalkeeper_did_not_play():
+    multipliers = autosub.get_autosub_multipliers(*make_team(did_not_play=[0, 11]))
+    ### Outfield substitutes never take the goalkeeper's place
+    assert get_xi(multipliers) == list(range(11))
+
+
+def test_bench_goalkeeper_never_replaces_outfield_player():
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(did_not_play=[4, 12, 13, 14])
+    )
+    assert get_xi(multipliers) == list(range(11))
+
+
+def test_substitutes_come_on_in_bench_order():
+    multipliers = autosub.get_autosub_multipliers(*make_team(did_not_play=[4, 7]))
+    assert get_xi(multipliers) == [0, 1, 2, 3, 5, 6, 8, 9, 10, 12, 13]
+    ### Substitutes score once
+    assert multipliers[12] == 1 and multipliers[13] == 1
+
+
+def test_substitute_skipped_when_too_few_defenders():
+    ### Bench midfielder first, so the defender who did not play waits for
+    ### the bench defender
+    element_types = squad_element_type_list[:12] + [3, 2, 4]
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(element_types, did_not_play=[1])
+    )
+    assert get_xi(multipliers) == [0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 13]
+
+
+def test_substitute_skipped_when_too_few_forwards():
+    ### 5-4-1, the only forward did not play
+    element_types = [1, 2, 2, 2, 2, 2, 3, 3, 3, 3, 4, 1, 3, 2, 4]
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(element_types, did_not_play=[10])
+    )
+    assert get_xi(multipliers) == list(range(10)) + [14]
+
+
+def test_no_substitute_when_formation_cannot_be_kept():
+    ### Only midfielders on the bench for a defender, no one comes on
+    element_types = squad_element_type_list[:12] + [3, 3, 3]
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(element_types, did_not_play=[1])
+    )
+    assert get_xi(multipliers) == list(range(11))
+
+
+def test_vice_captain_promoted_when_captain_did_not_play():
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(did_not_play=[CAPTAIN_SLOT])
+    )
+    assert multipliers[VICE_CAPTAIN_SLOT] == 2
+    ### The captain makes way for the first bench outfield player
+    assert multipliers[CAPTAIN_SLOT] == 0 and multipliers[12] == 1
+
+
+def test_vice_captain_promoted_to_triple_captain():
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(did_not_play=[CAPTAIN_SLOT], captain_multiplier=3)
+    )
+    assert multipliers[VICE_CAPTAIN_SLOT] == 3
+
+
+def test_no_promotion_when_vice_captain_did_not_play():
+    multipliers = autosub.get_autosub_multipliers(
+        *make_team(did_not_play=[CAPTAIN_SLOT, VICE_CAPTAIN_SLOT])
+    )
+    assert multipliers.max() == 1
+    assert get_xi(multipliers) == [0, 1, 2, 3, 4, 7, 8, 9, 10, 12, 13]
+
+
+def test_bench_boost_makes_no_substitutions():
+    element_type, multiplier, is_vice_captain, played = make_team(did_not_play=[0, 4])
+    multiplier[autosub.XI_SIZE :] = 1
+    multipliers = autosub.get_autosub_multipliers(
+        element_type, multiplier, is_vice_captain, played
+    )
+    np.testing.assert_array_equal(multipliers, multiplier)
+
+
+def test_teams_at_once_match_one_at_a_time():
+    team_list = [
+        make_team(),
+        make_team(did_not_play=[0]),
+        make_team(did_not_play=[4, 7]),
+        make_team(did_not_play=[CAPTAIN_SLOT], captain_multiplier=3),
+        make_team(squad_element_type_list[:12] + [3, 2, 4], did_not_play=[1]),
+    ]
+    multipliers = autosub.get_autosub_multipliers(
+        *(np.stack(arrays) for arrays in zip(*team_list))
+    )
+    for i, team in enumerate(team_list):
+        np.testing.assert_array_equal(
+            multipliers[i], autosub.get_autosub_multipliers(*team)
+        )
+
+
+@pytest.fixture(scope="module")
+def ldo():
+    league = synthetic.SyntheticLeague(leagueID=1, n_managers=12, current_gw=8, seed=21)
+    with standin_server.StandinServer(
+        league=league
+    ) as server, tempfile.TemporaryDirectory() as tmp_dir, pytest.MonkeyPatch.context() as mp:
+        ### Cold caches, nothing shared with other modules
+        mp.setattr(
+            response_cache,
+            "_default_cache",
+            response_cache.ResponseCache(cache_dir=os.path.join(tmp_dir, "responses")),
+        )
+        mp.setattr(http_client, "_default_client", http_client.HTTPClient())
+        mp.setattr(bootstrap, "_registry_dict", {})
+        mp.setattr(
+            league_snapshot,
+            "DEFAULT_SNAPSHOT_DIR",
+            os.path.join(tmp_dir, "snapshots"),
+        )
+        yield league_data.LeagueData(leagueID=league.leagueID, **server.url_templates)
+
+
+@pytest.mark.parametrize("what_if_gw", [1, 4, 8])
+def test_what_if_matches_real_up_to_freeze_gw(ldo, what_if_gw):
+    col_list = ["Points", "Total Points", "Points on Bench", "Total Transfers"]
+    real_df = (
+        ldo.season_stats_df.loc[ldo.season_stats_df["GW"] <= what_if_gw]
+        .sort_values(by=["Manager", "GW"])
+        .reset_index(drop=True)
+    )
+    what_if_df = ldo.what_if_engine.get_season_stats_df(what_if_gw)
+    what_if_df = (
+        what_if_df.loc[what_if_df["GW"] <= what_if_gw]
+        .assign(
+            Manager=lambda df: df["Manager"].str.slice(0, -len(what_if.WHAT_IF_SUFFIX))
+        )
+        .sort_values(by=["Manager", "GW"])
+        .reset_index(drop=True)
+    )
+    pd.testing.assert_frame_equal(
+        what_if_df[["Manager", "GW"] + col_list],
+        real_df[["Manager", "GW"] + col_list],
+        check_dtype=False,
+    )
@@ -1,37 +1,157 @@
+import io
+import threading
+import collections
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from scipy import sparse
 import base64
-import requests
+import http_client
+import response_cache
 
 FIG_SIZE = (10, 6)
+VENN_FONT_FAMILY = "monospace"
+VENN_MAX_FIGS = 32
+VENN_DPI = 200  # as st.pyplot
 
 
-def get_requests_response(url_template, **kwargs):
-    response = requests.get(url_template.format(**kwargs))
-    response_json = response.json()
-    return response_json
+def get_requests_response(url_template, ttl=response_cache.DEFAULT_TTL, **kwargs):
+    return response_cache.get_default_cache().get_or_fetch(
+        url_template.format(**kwargs), _fetch_json, ttl=ttl
+    )
+
+
+def _fetch_json(url):
+    return http_client.get_default_client().get_json(url)
 
 
 def jaccard_sim(df):
+    """
+    Jaccard similarity of every pair of columns of df, treating each column
+    as a set of picks. Intersections come from one sparse matrix product
+    of the column x pick incidence matrix, unions from its row counts.
+    """
     columns = df.columns
-    jaccard_matrix = np.empty([len(columns), len(columns)])
-    for i, row in enumerate(columns):
-        for j, col in enumerate(columns):
-            jaccard_sim = len(set(df[row]).intersection(set(df[col]))) / len(
-                set(df[row]).union(set(df[col]))
-            )
-            jaccard_matrix[i, j] = jaccard_sim
+    incidence_matrix = get_incidence_matrix(df)
+    intersection_matrix = (incidence_matrix @ incidence_matrix.T).toarray()
+    set_sizes = intersection_matrix.diagonal()
+    union_matrix = set_sizes[:, None] + set_sizes[None, :] - intersection_matrix
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaccard_matrix = intersection_matrix / union_matrix
     jaccard_sim_df = pd.DataFrame(index=columns, columns=columns, data=jaccard_matrix)
     return jaccard_sim_df
 
 
+def get_incidence_matrix(df):
+    """
+    Sparse binary (column, distinct value) matrix of df, NaNs ignored.
+    """
+    n_rows, n_columns = df.shape
+    value_codes, values = pd.factorize(df.to_numpy().ravel(order="F"))
+    column_idx = np.repeat(np.arange(n_columns), n_rows)
+    is_value = value_codes >= 0
+    incidence_matrix = sparse.csr_matrix(
+        (
+            np.ones(is_value.sum(), dtype=np.int32),
+            (column_idx[is_value], value_codes[is_value]),
+        ),
+        shape=(n_columns, len(values)),
+    )
+    ### Duplicate values within a column were summed, a set holds them once
+    incidence_matrix.data[:] = 1
+    return incidence_matrix
+
+
 def get_img_as_base64(file):
     with open(file, "rb") as f:
         data = f.read()
     return base64.b64encode(data).decode()
 
 
+_text_extent_dict = {}  # (text, fontsize, fontfamily) -> (width, height) in pixels
+_venn_png_dict = collections.OrderedDict()  # word_list_venn_diagram arguments -> PNG
+_text_figure = None  # measures every word, never drawn
+_venn_lock = threading.Lock()
+
+
+def get_text_extents(words, fontsizes, fontfamily=VENN_FONT_FAMILY) -> np.ndarray:
+    """
+    (word, [width, height]) extents in pixels of words drawn on a FIG_SIZE
+    figure. Every (text, fontsize, fontfamily) is measured once, all with
+    the same renderer.
+    """
+    key_list = [
+        (str(word), float(fontsize), str(fontfamily))
+        for word, fontsize in zip(words, fontsizes)
+    ]
+    ### matplotlib is imported where used, it is slow to load
+    from matplotlib.figure import Figure
+    from matplotlib.text import Text
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    global _text_figure
+    with _venn_lock:
+        if _text_figure is None:
+            _text_figure = Figure(figsize=FIG_SIZE)
+            FigureCanvasAgg(_text_figure)
+        renderer = _text_figure.canvas.get_renderer()
+        for key in key_list:
+            if key not in _text_extent_dict:
+                text = Text(
+                    0.5,
+                    0.5,
+                    key[0],
+                    fontsize=key[1],
+                    fontfamily=key[2],
+                    bbox=dict(pad=0.0, facecolor="none", edgecolor="red"),
+                )
+                text.set_figure(_text_figure)
+                bbox = text.get_window_extent(renderer=renderer)
+                _text_extent_dict[key] = (bbox.width, bbox.height)
+        extent_list = [_text_extent_dict[key] for key in key_list]
+    return np.array(extent_list, dtype=np.float64).reshape(-1, 2)
+
+
+def get_word_list_venn_png(
+    words,
+    fontsizes,
+    polarities,
+    colour1="#46A0F8",
+    colour2="#FF2E63",
+    alpha1=1.0,
+    alpha2=1.0,
+    scale=1.0,
+) -> bytes:
+    """
+    word_list_venn_diagram(...) as PNG bytes, drawn once for each distinct
+    set of arguments, so the same pair of pick sets (and colours) reuses its
+    image. The VENN_MAX_FIGS most recently used images are kept.
+    """
+    key = (
+        tuple(map(str, words)),
+        tuple(map(float, fontsizes)),
+        tuple(map(int, polarities)),
+        str(colour1),
+        str(colour2),
+        float(alpha1),
+        float(alpha2),
+        float(scale),
+    )
+    with _venn_lock:
+        if key in _venn_png_dict:
+            _venn_png_dict.move_to_end(key)
+            return _venn_png_dict[key]
+    venn = word_list_venn_diagram(
+        words, fontsizes, polarities, colour1, colour2, alpha1, alpha2, scale
+    )
+    png_buffer = io.BytesIO()
+    venn.fig.savefig(png_buffer, format="png", dpi=VENN_DPI, bbox_inches="tight")
+    with _venn_lock:
+        _venn_png_dict[key] = png_buffer.getvalue()
+        while len(_venn_png_dict) > VENN_MAX_FIGS:
+            _venn_png_dict.popitem(last=False)
+        return _venn_png_dict[key]
+
+
 def human_readable(num):
     if num > 1000000:
         if not num % 1000000:
@@ -71,18 +191,17 @@ class word_list_venn_diagram(object):
         self.alpha1 = float(alpha1)
         self.alpha2 = float(alpha2)
 
-        # get bounding boxes of text
-        self.bboxes = [
-            self._get_bbox(word, size) for word, size in zip(self.words, self.fontsizes)
-        ]
+        # get extents of text, measured in the font it is drawn in
+        self.extents = get_text_extents(self.words, self.fontsizes, VENN_FONT_FAMILY)
+        heights = self.extents[:, 1]
+        polarities = np.asarray(polarities)
 
         # determine minimum radius of circles
         diameter = 0.0
         unique_polarities = np.unique(polarities)
         for polarity in unique_polarities:
             (idx,) = np.where(polarities == polarity)
-            heights = [self.bboxes[ii].height for ii in idx]
-            total = np.sum(heights)
+            total = np.sum(heights[idx])
             if total > diameter:
                 diameter = total
         radius = diameter / 2.0
@@ -91,24 +210,17 @@ class word_list_venn_diagram(object):
         radius *= scale
         self.radius = radius
 
-        # arrange bboxes vertically
+        # arrange words vertically, centre of each word
+        self.y = np.zeros(len(self.words))
         for polarity in unique_polarities:
             (idx,) = np.where(polarities == polarity)
-            order = self._argsort(self.fontsizes[idx])
-            heights = [self.bboxes[ii].height for ii in idx]
-            total = np.sum(heights)
+            order = idx[self._argsort(self.fontsizes[idx])]
+            total = np.sum(heights[idx])
+            self.y[order] = np.cumsum(heights[order]) - heights[order] - total / 2.0
 
-            current_height = 0.0
-            for ii in idx[order]:
-                self.bboxes[ii].y = current_height - total / 2.0
-                current_height += self.bboxes[ii].height
-
-        # arrange bboxes horizontally
+        # arrange words horizontally
         # NB: slightly cheeky use of polarity argument
-        for ii, _ in enumerate(self.bboxes):
-            self.bboxes[ii].x = polarities[ii] * self._get_shift(  # type: ignore
-                self.bboxes[ii].y, self.radius  # type: ignore
-            )
+        self.x = polarities * self._get_shift(self.y, self.radius)
 
         # draw
         self.fig, self.ax = self.draw()
@@ -120,10 +232,17 @@ class word_list_venn_diagram(object):
         Draws the Venn diagram.
         """
 
-        fig, ax = plt.subplots(1, 1, figsize=FIG_SIZE)
+        from matplotlib.figure import Figure
+        from matplotlib.patches import Circle
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        # not a pyplot figure, so it is freed once no longer referenced
+        fig = Figure(figsize=FIG_SIZE)
+        FigureCanvasAgg(fig)
+        ax = fig.subplots(1, 1)
 
         # draw circles
-        circle_left = plt.Circle(  # type: ignore
+        circle_left = Circle(
             (-0.5 * self.radius, 0),
             self.radius,
             alpha=self.alpha1,
@@ -132,7 +251,7 @@ class word_list_venn_diagram(object):
             axes=ax,
             linewidth=5,
         )
-        circle_right = plt.Circle(  # type: ignore
+        circle_right = Circle(
             (+0.5 * self.radius, 0),
             self.radius,
             alpha=self.alpha2,
@@ -145,17 +264,15 @@ class word_list_venn_diagram(object):
         ax.add_artist(circle_right)
 
         # draw words
-        for ii, (word, bb, fs) in enumerate(
-            zip(self.words, self.bboxes, self.fontsizes)
-        ):
+        for word, x, y, fs in zip(self.words, self.x, self.y, self.fontsizes):
             ax.text(
-                bb.x,  # type: ignore
-                bb.y,  # type: ignore
+                x,
+                y,
                 word,
                 horizontalalignment="center",
                 verticalalignment="center",
                 fontsize=fs,
-                fontfamily="monospace",
+                fontfamily=VENN_FONT_FAMILY,
                 bbox=dict(pad=0.0, facecolor="none", edgecolor="none"),
             )
 
@@ -170,29 +287,9 @@ class word_list_venn_diagram(object):
         ax.set_aspect("equal")
         ax.get_figure().set_facecolor("#F5F5F5")
         ax.set_frame_on(False)
-        ax.get_figure().canvas.draw()
 
         return fig, ax
 
-    def _get_bbox(self, word, fontsize):
-        """
-        Get the bounding box for each word.
-        Unfortunately, the bbox is dependent on the renderer,
-        so a figure has to be created.
-        """
-        fig = plt.figure(figsize=FIG_SIZE)
-        renderer = fig.canvas.get_renderer()  # type: ignore
-        text = plt.text(
-            0.5,
-            0.5,
-            word,
-            fontsize=fontsize,
-            bbox=dict(pad=0.0, facecolor="none", edgecolor="red"),
-        )
-        bbox = text.get_window_extent(renderer=renderer)
-        plt.close(fig)
-        return bbox
-
     def _argsort(self, arr):
         """
         Returns indices to create a sorted array.
@@ -0,0 +1,399 @@
+import numpy as np
+import pandas as pd
+import autosub
+import picks_builder
+import similarity
+import derived_metrics
+
+
+#################
+### Constants ###
+#################
+
+
+N_GWS = 38
+WHAT_IF_SUFFIX = " (what if)"
+### Managers per block when gathering points for every freeze gameweek
+FREEZE_CUBE_CHUNK_SIZE = 128
+freeze_summary_col_list = [
+    "Manager",
+    "Total Points",
+    "Best GW",
+    "Best Total Points",
+    "Best Rank",
+    "Worst GW",
+    "Worst Total Points",
+    "Worst Rank",
+]
+stat_col_list = [
+    "Total Points",
+    "Transfers",
+    "Transfer Costs",
+    "Total Transfers",
+    "Total Transfer Costs",
+]
+
+
+###############
+### Classes ###
+###############
+
+
+class WhatIfEngine(object):
+    def __init__(
+        self,
+        league_teams_df,
+        season_stats_df,
+        standings_df,
+        points_array,
+        minutes_array,
+        element_types,
+        max_gw,
+        n_gws=N_GWS,
+    ):
+        """
+        Arguments:
+        ----------
+            league_teams_df: pd.DataFrame
+                picks of the real managers, as built by picks_builder
+            season_stats_df: pd.DataFrame
+                season statistics of the real managers
+            standings_df: pd.DataFrame
+                league standings, for the team names
+            points_array: np.ndarray
+                (player_id, gw) total points, e.g. from a PlayerGameweekStore
+            minutes_array: np.ndarray
+                (player_id, gw) minutes played, for automatic substitutions
+            element_types: pd.Series
+                element_type (1-4) by player id, from bootstrap-static
+            max_gw: int
+                latest gameweek played
+            n_gws: int
+                number of gameweeks in the season
+
+        Returns:
+        --------
+            None
+
+        Picks are held as dense (manager, gw, slot) arrays, slot being the
+        pick position - 1 and element id 0 an empty slot, so freezing a team
+        at a gameweek is an index into the gw axis and its points a gather
+        from points_array, after automatic substitutions. Nothing here
+        modifies the frames passed in.
+        """
+        self.managers = list(np.sort(league_teams_df["Manager"].unique()))
+        self.max_gw = int(max_gw)
+        self.n_gws = int(n_gws)
+        n_managers = len(self.managers)
+        shape = (n_managers, self.n_gws + 1, picks_builder.PICKS_PER_TEAM)
+
+        ### Picks
+        manager_idx = self._get_manager_idx(league_teams_df["Manager"])
+        gw = league_teams_df["gw"].to_numpy()
+        slot = league_teams_df["position"].to_numpy() - 1
+        self.element_array = np.zeros(shape, dtype=np.int16)
+        self.multiplier_array = np.zeros(shape, dtype=np.int8)
+        self.status_array = np.zeros(shape, dtype=np.int8)
+        self.has_picks = np.zeros(shape[:2], dtype=np.bool_)
+        self.element_array[manager_idx, gw, slot] = league_teams_df["element"]
+        self.multiplier_array[manager_idx, gw, slot] = league_teams_df["multiplier"]
+        self.status_array[manager_idx, gw, slot] = league_teams_df["status"]
+        self.has_picks[manager_idx, gw] = True
+
+        ### Points and minutes, padded should a pick not be in the live data
+        n_players = max(int(self.element_array.max()) + 1, points_array.shape[0])
+        if n_players > points_array.shape[0]:
+            points_array = np.pad(
+                points_array, ((0, n_players - points_array.shape[0]), (0, 0))
+            )
+        if n_players > minutes_array.shape[0]:
+            minutes_array = np.pad(
+                minutes_array, ((0, n_players - minutes_array.shape[0]), (0, 0))
+            )
+        self.points_array = points_array
+        self.minutes_array = minutes_array
+        self.element_type_array = np.zeros(
+            max(n_players, int(element_types.index.max()) + 1), dtype=np.int8
+        )
+        self.element_type_array[element_types.index] = element_types
+
+        ### Season stats, forward filled across gameweeks without a row
+        stats_df = season_stats_df.loc[season_stats_df["Manager"].isin(self.managers)]
+        manager_idx = self._get_manager_idx(stats_df["Manager"])
+        gw = stats_df["GW"].to_numpy()
+        self.has_stats = np.zeros(shape[:2], dtype=np.bool_)
+        self.has_stats[manager_idx, gw] = True
+        self.stat_array_dict = {}
+        for stat_col in stat_col_list:
+            stat_array = np.full(shape[:2], np.nan)
+            stat_array[manager_idx, gw] = stats_df[stat_col]
+            self.stat_array_dict[stat_col] = (
+                pd.DataFrame(stat_array).ffill(axis=1).fillna(0).to_numpy(np.int64)
+            )
+        self.team_names = (
+            pd.Series(standings_df["Team Name"].values, index=standings_df["Manager"])
+            .reindex(self.managers)
+            .to_numpy()
+        )
+        self._freeze_cube = None
+
+    def get_season_stats_df(self, what_if_gw, columns=None) -> pd.DataFrame:
+        """
+        Season statistics of every manager had they kept their what_if_gw
+        team (and captaincy) for every later gameweek, one row per manager
+        and gameweek, ordered by manager then gameweek, in columns order.
+        Rank is the rank those totals would have in the real league.
+        """
+        gws = np.arange(self.n_gws + 1)
+        after = gws > what_if_gw
+        freeze_cube = self.get_freeze_cube()
+        what_if_gw = min(what_if_gw, self.n_gws)
+        has_row = freeze_cube["has_row"][:, what_if_gw]
+        points = freeze_cube["points"][:, what_if_gw]
+        bench_points = freeze_cube["bench_points"][:, what_if_gw]
+        total_points = freeze_cube["total_points"][:, what_if_gw]
+        rank = freeze_cube["rank"][:, what_if_gw]
+        row_mask = has_row.astype(np.int64)
+
+        ### Transfers stop after what_if_gw, their totals stay where they were
+        frozen_gws = np.minimum(gws, what_if_gw)
+        transfers = np.where(after, 0, self.stat_array_dict["Transfers"])
+        transfer_costs = np.where(after, 0, self.stat_array_dict["Transfer Costs"])
+        total_transfers = self.stat_array_dict["Total Transfers"][:, frozen_gws]
+        total_transfer_costs = self.stat_array_dict["Total Transfer Costs"][
+            :, frozen_gws
+        ]
+        total_bench_points = np.cumsum(bench_points, axis=1)
+
+        ### Form, mean points of the last FORM_WINDOW rows over FORM_DIVISOR
+        points_sum = _get_window_sum(points * row_mask, derived_metrics.FORM_WINDOW)
+        n_rows = _get_window_sum(row_mask, derived_metrics.FORM_WINDOW)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            form = points_sum / n_rows / derived_metrics.FORM_DIVISOR
+
+        manager_idx, gw_idx = np.nonzero(has_row)
+        what_if_season_stats_df = pd.DataFrame(
+            {
+                "GW": gw_idx,
+                "Points": points[manager_idx, gw_idx],
+                "Total Points": total_points[manager_idx, gw_idx],
+                "Transfers": transfers[manager_idx, gw_idx],
+                "Transfer Costs": transfer_costs[manager_idx, gw_idx],
+                "Points on Bench": bench_points[manager_idx, gw_idx],
+                "Manager": self.get_what_if_managers()[manager_idx],
+                "Rank": rank[manager_idx, gw_idx],
+                "Total Transfers": total_transfers[manager_idx, gw_idx],
+                "Total Transfer Costs": total_transfer_costs[manager_idx, gw_idx],
+                "Total Points on Bench": total_bench_points[manager_idx, gw_idx],
+                "Form": form[manager_idx, gw_idx],
+            }
+        )
+        if columns is not None:
+            what_if_season_stats_df = what_if_season_stats_df.reindex(columns=columns)
+        return what_if_season_stats_df
+
+    def get_standings_df(self, what_if_season_stats_df) -> pd.DataFrame:
+        """
+        Standings rows of the "what if" managers at the latest gameweek.
+        """
+        latest_df = what_if_season_stats_df.loc[
+            what_if_season_stats_df["GW"] == self.max_gw
+        ]
+        manager_idx = pd.Categorical(
+            latest_df["Manager"], categories=self.get_what_if_managers()
+        ).codes
+        return pd.DataFrame(
+            {
+                "Rank": latest_df["Rank"].astype(np.int64).values,
+                "Manager": latest_df["Manager"].values,
+                "Team Name": self.team_names[manager_idx],
+                "GW Total": latest_df["Points"].values,
+                "Total Points": latest_df["Total Points"].values,
+            }
+        )
+
+    def get_pick_codes(self, manager, gw, what_if_gw=None) -> np.ndarray:
+        """
+        Pick codes of a real or "what if" manager in a gameweek.
+        """
+        if manager.endswith(WHAT_IF_SUFFIX):
+            manager = manager[: -len(WHAT_IF_SUFFIX)]
+            gw = min(gw, what_if_gw)
+        manager_idx = self.managers.index(manager)
+        slots = self.element_array[manager_idx, gw] > 0
+        return picks_builder.get_pick_codes(
+            self.element_array[manager_idx, gw, slots],
+            self.status_array[manager_idx, gw, slots],
+        )
+
+    def get_similarity_tensor(self, similarity_tensor, what_if_gw):
+        """
+        similarity_tensor of the real managers extended with the "what if"
+        managers, who match their real selves up to what_if_gw.
+        """
+        all_managers = sorted(self.managers + list(self.get_what_if_managers()))
+        real_pos = np.searchsorted(all_managers, self.managers)
+        what_if_pos = np.searchsorted(all_managers, self.get_what_if_managers())
+        extended_tensor = similarity.SimilarityTensor(all_managers, self.n_gws)
+        pick_code_array = picks_builder.get_pick_codes(
+            self.element_array, self.status_array
+        )
+        for gw in sorted(similarity_tensor.gws):
+            if gw <= what_if_gw:
+                ### Copy the real counts into all four manager blocks
+                for row_pos in [real_pos, what_if_pos]:
+                    extended_tensor.pick_count_array[gw, row_pos] = (
+                        similarity_tensor.pick_count_array[gw]
+                    )
+                    for col_pos in [real_pos, what_if_pos]:
+                        extended_tensor.intersection_array[
+                            gw, row_pos[:, None], col_pos[None, :]
+                        ] = similarity_tensor.intersection_array[gw]
+                extended_tensor.gws.add(gw)
+                continue
+            pick_codes = np.concatenate(
+                [pick_code_array[:, gw], pick_code_array[:, what_if_gw]]
+            )
+            is_pick = (
+                np.concatenate(
+                    [self.element_array[:, gw], self.element_array[:, what_if_gw]]
+                )
+                > 0
+            )
+            manager_pos = np.broadcast_to(
+                np.concatenate([real_pos, what_if_pos])[:, None], pick_codes.shape
+            )
+            extended_tensor.add_gameweek(gw, manager_pos[is_pick], pick_codes[is_pick])
+        return extended_tensor
+
+    def get_what_if_managers(self) -> np.ndarray:
+        return np.array(
+            [manager + WHAT_IF_SUFFIX for manager in self.managers], dtype=object
+        )
+
+    def get_freeze_cube(self) -> dict:
+        """
+        Every "what if" at once: (manager, freeze gw, gw) arrays of "points",
+        "bench_points", "total_points" and real league "rank" with the team
+        frozen at each freeze gw, and "has_row" marking the rows that exist.
+        A freeze gw of max_gw or later is the real team.
+        Computed on first use, then cached for the life of the engine.
+        """
+        if self._freeze_cube is not None:
+            return self._freeze_cube
+        gws = np.arange(self.n_gws + 1)
+        n_managers = len(self.managers)
+
+        ### Points every selection would score in every later gameweek played,
+        ### [manager, team gw, gw], FPL's automatic substitutions applied
+        team_gw_idx, gw_idx = np.nonzero(
+            np.tril(np.ones((self.max_gw + 1, self.max_gw + 1), dtype=np.bool_)).T
+        )
+        team_points = np.zeros((n_managers, len(gws), len(gws)), dtype=np.int32)
+        team_bench_points = np.zeros_like(team_points)
+        for start in range(0, n_managers, FREEZE_CUBE_CHUNK_SIZE):
+            rows = slice(start, start + FREEZE_CUBE_CHUNK_SIZE)
+            element = self.element_array[rows][:, team_gw_idx]
+            player_points = self.points_array[element, gw_idx[None, :, None]]
+            multiplier = autosub.get_autosub_multipliers(
+                self.element_type_array[element],
+                self.multiplier_array[rows][:, team_gw_idx],
+                self.status_array[rows][:, team_gw_idx] == picks_builder.STATUS_V,
+                self.minutes_array[element, gw_idx[None, :, None]] > 0,
+            )
+            team_points[rows, team_gw_idx, gw_idx] = np.sum(
+                player_points * multiplier, axis=2
+            )
+            team_bench_points[rows, team_gw_idx, gw_idx] = np.where(
+                multiplier == 0, player_points, 0
+            ).sum(axis=2)
+
+        ### Gameweeks after the freeze gw reuse its team, [freeze gw, gw]
+        team_gws = np.minimum(gws[None, :], gws[:, None])
+        has_row = self.has_picks[:, team_gws] & (gws >= 1) & (gws <= self.max_gw)
+        points = np.where(has_row, team_points[:, team_gws, gws[None, :]], 0)
+        bench_points = np.where(
+            has_row, team_bench_points[:, team_gws, gws[None, :]], 0
+        )
+        total_points = (
+            np.cumsum(points, axis=2)
+            - self.stat_array_dict["Total Transfer Costs"][:, team_gws]
+        )
+        self._freeze_cube = {
+            "has_row": has_row,
+            "points": points,
+            "bench_points": bench_points,
+            "total_points": total_points,
+            "rank": self._get_real_league_rank(total_points, has_row),
+        }
+        return self._freeze_cube
+
+    def get_freeze_summary_df(self) -> pd.DataFrame:
+        """
+        Per manager, the best and worst gameweek to have stopped
+        transferring, by total points at the latest gameweek.
+        """
+        freeze_gws = np.arange(1, self.max_gw)
+        freeze_cube = self.get_freeze_cube()
+        has_row = freeze_cube["has_row"][:, freeze_gws, self.max_gw]
+        total_points = np.where(
+            has_row, freeze_cube["total_points"][:, freeze_gws, self.max_gw], np.nan
+        )
+        rank = freeze_cube["rank"][:, freeze_gws, self.max_gw]
+        has_summary = has_row.any(axis=1)
+        if not has_summary.any():
+            return pd.DataFrame(columns=freeze_summary_col_list)
+        manager_idx = np.nonzero(has_summary)[0]
+        best_idx = np.nanargmax(total_points[has_summary], axis=1)
+        worst_idx = np.nanargmin(total_points[has_summary], axis=1)
+        return pd.DataFrame(
+            {
+                "Manager": np.array(self.managers, dtype=object)[manager_idx],
+                "Total Points": self.stat_array_dict["Total Points"][
+                    manager_idx, self.max_gw
+                ],
+                "Best GW": freeze_gws[best_idx],
+                "Best Total Points": total_points[manager_idx, best_idx].astype(
+                    np.int64
+                ),
+                "Best Rank": rank[manager_idx, best_idx].astype(np.int64),
+                "Worst GW": freeze_gws[worst_idx],
+                "Worst Total Points": total_points[manager_idx, worst_idx].astype(
+                    np.int64
+                ),
+                "Worst Rank": rank[manager_idx, worst_idx].astype(np.int64),
+            }
+        )
+
+    def _get_real_league_rank(self, total_points, has_row) -> np.ndarray:
+        ### 1 + number of other real managers with more points, gw on the last axis
+        real_total_points = self.stat_array_dict["Total Points"]
+        extra_axes = (slice(None),) + (None,) * (total_points.ndim - 2)
+        rank = np.full(total_points.shape, np.nan)
+        for gw in np.nonzero(has_row.reshape(-1, has_row.shape[-1]).any(axis=0))[0]:
+            has_real = self.has_stats[:, gw]
+            sorted_real = np.sort(real_total_points[has_real, gw])
+            n_greater = len(sorted_real) - np.searchsorted(
+                sorted_real, total_points[..., gw], side="right"
+            )
+            n_greater -= has_real[extra_axes] & (
+                real_total_points[:, gw][extra_axes] > total_points[..., gw]
+            )
+            rank[..., gw] = np.where(has_row[..., gw], 1 + n_greater, np.nan)
+        return rank
+
+    def _get_manager_idx(self, manager_series) -> np.ndarray:
+        return pd.Categorical(manager_series, categories=self.managers).codes
+
+
+#################
+### Functions ###
+#################
+
+
+def _get_window_sum(array, window) -> np.ndarray:
+    ### Trailing sum over the last window entries of axis 1
+    cumsum = np.cumsum(array, axis=1)
+    window_sum = cumsum.copy()
+    window_sum[:, window:] -= cumsum[:, :-window]
+    return window_sum